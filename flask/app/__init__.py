@@ -16,15 +16,19 @@ from .config import (
     CSRF_PROTECTION,
     DATETIME_FORMAT,
     INIT_GENERATOR,
+    SESSION_BACKEND, SESSION_SQLITE_PATH, SESSION_SWEEP_INTERVAL, SESSION_SWEEP_BATCH_SIZE,
 )
 from .models import db, migrate
 from .generator import init_generator
+from .generator.cli import compact_sentences_command, generate_command, local_llm_command
 from .utils.admin import init_admin
+from .utils.cli import prune_login_events_command, repair_library_counts_command
 from .utils.secret import bcrypt
 from .utils.initialize import init_models
 from .utils.localization import babel, select_locale
 from .utils.login_manager import login_manager
 from .utils.rate_limiter import rate_limit_middleware
+from .utils.session_store import SqliteSessionInterface
 
 
 IS_MIGRATING = "db" in sys.argv and any(cmd in sys.argv for cmd in ["upgrade", "downgrade", "migrate"])
@@ -110,12 +114,46 @@ def init_db(app: Flask) -> None:
     __import__("app.models.words")
     __import__("app.models.libraries")
     __import__("app.models.sentences")
+    __import__("app.models.library_usage")
+    __import__("app.models.generation_queue")
+    __import__("app.models.generator_state")
+    __import__("app.models.generation_checkpoint")
+    __import__("app.models.lexemes")
+    __import__("app.models.login_events")
     
     db.init_app(app)
         
     log.info("Database initialized")
     
 
+def init_session(app: Flask) -> None:
+    """
+    Store the sessions with the backend of `session.backend`.
+    
+    Parameters
+    ----------
+    app: :class:`Flask`
+        The flask app.
+    """
+    
+    if SESSION_BACKEND == "sqlite":
+        app.session_interface = SqliteSessionInterface(
+            app, SESSION_SQLITE_PATH, SESSION_SWEEP_INTERVAL, SESSION_SWEEP_BATCH_SIZE,
+            key_prefix=app.config["SESSION_KEY_PREFIX"],
+            use_signer=app.config["SESSION_USE_SIGNER"],
+            permanent=app.config["SESSION_PERMANENT"],
+        )
+        log.info("Using a local SQLite file for session storage")
+        
+    elif SESSION_BACKEND == "sqlalchemy":
+        app.config["SESSION_SQLALCHEMY"] = db
+        Session(app)
+        log.info("Using SQLAlchemy for session storage")
+        
+    else:
+        raise ValueError(f"Unknown session backend: {SESSION_BACKEND}")
+    
+
 def create_app(config=None) -> Flask:
     """
     Returns
@@ -144,11 +182,9 @@ def create_app(config=None) -> Flask:
     # Initialize the migrations
     migrate.init_app(app, db)
     
-    # Initialize the sqlalchemy session
+    # Initialize the server-side session
     if not app.config["TESTING"]:
-        app.config["SESSION_SQLALCHEMY"] = db
-        Session(app)
-        log.info("Using SQLAlchemy for session storage")
+        init_session(app)
     
     # Initialize the login manager
     login_manager.init_app(app)
@@ -161,13 +197,26 @@ def create_app(config=None) -> Flask:
     
     # Initialize the CSRF protection
     if CSRF_PROTECTION:
+        from .views.api import api
+        
         csrf = CSRFProtect(app)
         csrf.init_app(app)
-        csrf.exempt("/api/*")  # Exempt API endpoints from CSRF
+        # The API changes state only with PUT and DELETE, which browsers do not send cross-site
+        # without a CORS preflight, and the app answers none; anonymous pages carry no token.
+        csrf.exempt(api)
         log.info("CSRF protection is enabled")
     
     # Load the blueprints
     app_load_blueprints(app)
+    
+    # Register the questions generator worker command
+    app.cli.add_command(generate_command)
+    app.cli.add_command(local_llm_command)
+    app.cli.add_command(compact_sentences_command)
+    
+    # Register the maintenance commands
+    app.cli.add_command(repair_library_counts_command)
+    app.cli.add_command(prune_login_events_command)
 
     # Initialize rate limiting middleware
     app.before_request(lambda: rate_limit_middleware())
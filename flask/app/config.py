@@ -38,6 +38,13 @@ try:
     PASSWORD_HASHING_ALGORITHM = SETTINGS["security"]["password_hashing_algorithm"]
     PASSWORD_HASHING_ROUNDS = SETTINGS["security"]["password_hashing_rounds"]
     RATE_LIMITING = SETTINGS["security"]["rate_limiting"]
+    LOGIN_HISTORY = SETTINGS["security"]["login_history"] # Login events are kept retention_days days, then counted per day if rollup
+
+    # Session Settings
+    SESSION_BACKEND = SETTINGS["session"]["backend"] # "sqlite" (a local file shared by the workers of the host) or "sqlalchemy" (the database)
+    SESSION_SQLITE = SETTINGS["session"]["sqlite"]
+    SESSION_SWEEP_INTERVAL = SETTINGS["session"]["sweep_interval"] # Seconds between two sweeps of expired sessions by a worker
+    SESSION_SWEEP_BATCH_SIZE = SETTINGS["session"]["sweep_batch_size"]
 
     # Logging Settings
     LOG_LEVEL = SETTINGS["logging"]["level"]
@@ -51,8 +58,30 @@ try:
     API_MODEL_NAME = SETTINGS["api"]["model_name"]
     API_RETRY_ATTEMPTS = SETTINGS["api"]["retry_attempts"]
     API_RETRY_DELAY = SETTINGS["api"]["retry_delay"]
+    API_MAX_RETRY_DELAY = SETTINGS["api"]["max_retry_delay"]
     API_GENERATION_DURATION = SETTINGS["api"]["generation_duration"]
+    API_FAST_PATH_INTERVAL = SETTINGS["api"]["fast_path_interval"] # Seconds between checks for newly enqueued words
+    API_FULL_SWEEP_INTERVAL = SETTINGS["api"]["full_sweep_interval"] # Seconds between sweeps over all words
+    API_CHECKPOINT = SETTINGS["api"]["checkpoint"] # Resumable sweeps; words failing deterministically wait deterministic_retry_after seconds
+    API_GENERATOR_LOCK_TTL = SETTINGS["api"]["generator_lock_ttl"]
     MAX_SENTENCES_PER_WORD = SETTINGS["api"]["max_sentences_per_word"]
+    API_DEDUPE = SETTINGS["api"]["dedupe"] # MinHash near-duplicate check of new sentences
+    API_MAX_IN_FLIGHT = SETTINGS["api"]["max_in_flight"]
+    API_MAX_IN_FLIGHT_PER_KEY = SETTINGS["api"]["max_in_flight_per_key"]
+    API_KEY_REQUESTS_PER_MINUTE = SETTINGS["api"]["key_requests_per_minute"]
+    API_MAX_IN_FLIGHT_PER_PROVIDER = SETTINGS["api"]["max_in_flight_per_provider"]
+    API_ADAPTIVE_LIMIT = SETTINGS["api"]["adaptive_limit"] # AIMD concurrency limit per provider, within max_in_flight_per_provider
+    API_BATCH_SIZE = SETTINGS["api"]["batch_size"]
+    API_CANDIDATES = SETTINGS["api"]["candidates"] # Sentences asked for per prompt, the best ones are kept
+    API_DB_POOL_SIZE = SETTINGS["api"]["db_pool_size"]
+    API_WRITE_BATCH_SIZE = SETTINGS["api"]["write_batch_size"]
+    API_WRITE_FLUSH_INTERVAL = SETTINGS["api"]["write_flush_interval"]
+    API_CACHE = SETTINGS["api"]["cache"] # "mode" is "off", "on" or "replay"
+    API_METRICS_INTERVAL = SETTINGS["api"]["metrics_interval"]
+    API_LOCAL_URL = SETTINGS["api"]["local_url"] # Chat-completions endpoint of the "local" provider
+    API_ROUTING = SETTINGS["api"]["routing"] # Spread requests over the providers in "models" when enabled
+    API_HTTP = SETTINGS["api"]["http"]
+    API_PRIORITY = SETTINGS["api"]["priority"]
 
     # SMTP Settings
     SMTP_SERVER = SETTINGS["smtp"]["server"]
@@ -101,6 +130,8 @@ load_dotenv(os.path.join(BASEDIR, ".env"), override=True)
 
 SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
 SQLITE_DATABASE_URI = "sqlite:///" + os.path.join(BASEDIR, DATABASE_SQLITE)
+SESSION_SQLITE_PATH = os.path.join(BASEDIR, SESSION_SQLITE)
+API_CACHE_DIRECTORY = os.path.join(BASEDIR, API_CACHE["directory"])
 
 # OAuth and API configuration
 REDIRECT_URI = os.getenv("REDIRECT_URI")
@@ -2,17 +2,33 @@ import asyncio
 import random
 import threading
 import logging
+import time
+from datetime import datetime
+from typing import Collection, Optional
 
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import func
+from sqlalchemy.orm import Session
 
-from ..config import APIKEYS, API_MODEL_TYPE, API_MODEL_NAME, API_GENERATION_DURATION, API_RETRY_ATTEMPTS, API_RETRY_DELAY
-from ..models import db
+from ..config import (
+    DATETIME_FORMAT, APIKEYS, API_MODEL_TYPE, API_MODEL_NAME, API_GENERATION_DURATION, API_GENERATOR_LOCK_TTL, API_RETRY_ATTEMPTS, API_RETRY_DELAY, API_MAX_RETRY_DELAY,
+    API_MAX_IN_FLIGHT, API_MAX_IN_FLIGHT_PER_KEY, API_KEY_REQUESTS_PER_MINUTE, API_MAX_IN_FLIGHT_PER_PROVIDER, API_BATCH_SIZE, API_HTTP,
+    API_WRITE_BATCH_SIZE, API_WRITE_FLUSH_INTERVAL, API_CACHE, API_CACHE_DIRECTORY, API_METRICS_INTERVAL, API_ROUTING,
+    API_FAST_PATH_INTERVAL, MAX_SENTENCES_PER_WORD, API_CANDIDATES, API_ADAPTIVE_LIMIT, API_CHECKPOINT,
+)
+from ..models.lexemes import Lexemes
 from ..models.words import Words
-from ..models.sentences import Sentences
-from ..models.libraries import Libraries
-from .english_helper import EnglishHelper
+from .english_helper import EnglishHelper, APIError
 from .api_key_manager import ApiKeyManager
 from .api_config import API_INFO
+from .cache import ResponseCache, variant
+from .checkpoint import PassCheckpoint, blocked_words
+from .limiter import AdaptiveLimiter
+from .lock import GeneratorLock
+from .metrics import metrics
+from .priority import prioritize, dequeue, stored_order
+from .router import ProviderRouter
+from .sweep import chunks, enqueued, mark_swept, sentence_counts, sweep_candidates
+from .writer import SentenceWriter, get_engine, get_sessionmaker
 
 
 log = logging.getLogger(__name__)
@@ -20,60 +36,487 @@ log = logging.getLogger(__name__)
 if API_MODEL_TYPE not in API_INFO:
     raise ValueError(f"Unsupported API model type: {API_MODEL_TYPE}")
 
-ai_helper_class = API_INFO[API_MODEL_TYPE]["helper_class"]
-ai_helper: EnglishHelper = ai_helper_class(
-    ApiKeyManager(APIKEYS, API_INFO[API_MODEL_TYPE]["prefix"]),
-    model_name=API_MODEL_NAME,
-    max_retry_attempts=API_RETRY_ATTEMPTS,
-    retry_delay=API_RETRY_DELAY,
-)
+response_cache = ResponseCache(API_CACHE_DIRECTORY, API_CACHE["max_bytes"], API_CACHE["mode"])
 
 
-async def generate() -> None:
-    MAX_SENTENCES_PER_WORD = 5
+def build_helper(model_type: str, model_name: str) -> EnglishHelper:
+    """Create the helper of one provider, using the keys of `APIKEYS` with its prefix."""
     
-    session = scoped_session(sessionmaker(bind=db.engine), scopefunc=threading.get_ident)
+    return API_INFO[model_type]["helper_class"](
+        ApiKeyManager(
+            APIKEYS, API_INFO[model_type]["prefix"],
+            max_in_flight_per_key=API_MAX_IN_FLIGHT_PER_KEY,
+            requests_per_minute=API_KEY_REQUESTS_PER_MINUTE,
+        ),
+        model_name=model_name,
+        max_retry_attempts=API_RETRY_ATTEMPTS,
+        retry_delay=API_RETRY_DELAY,
+        max_retry_delay=API_MAX_RETRY_DELAY,
+        http_options=API_HTTP,
+        cache=response_cache,
+        candidates=API_CANDIDATES,
+        max_in_flight=API_MAX_IN_FLIGHT_PER_PROVIDER,
+        limiter=AdaptiveLimiter(
+            initial=API_ADAPTIVE_LIMIT["initial"],
+            min_limit=API_ADAPTIVE_LIMIT["min"],
+            max_limit=API_ADAPTIVE_LIMIT["max"],
+            increase=API_ADAPTIVE_LIMIT["increase"],
+            decrease=API_ADAPTIVE_LIMIT["decrease"],
+            history=API_ADAPTIVE_LIMIT["history"],
+        ) if API_ADAPTIVE_LIMIT["enabled"] else None,
+    )
+
+
+if API_ROUTING["enabled"]:
+    _helpers = {
+        model_type: build_helper(model_type, model_name)
+        for model_type, model_name in API_ROUTING["models"].items()
+        if model_type in API_INFO
+    }
+    ai_helper: EnglishHelper | ProviderRouter = ProviderRouter(
+        {model_type: helper for model_type, helper in _helpers.items() if helper.api_key_manager.api_keys},
+        hedge=API_ROUTING["hedge"],
+        hedge_delay=API_ROUTING["hedge_delay"],
+        hedge_min_samples=API_ROUTING["hedge_min_samples"],
+        latency_alpha=API_ROUTING["latency_alpha"],
+        error_alpha=API_ROUTING["error_alpha"],
+        window=API_ROUTING["window"],
+    )
+else:
+    ai_helper = build_helper(API_MODEL_TYPE, API_MODEL_NAME)
+
+
+def provider_helpers() -> list[EnglishHelper]:
+    """The helper of every provider `ai_helper` sends requests to."""
     
-    libraries: list[Libraries] = session.query(Libraries).all()
+    return list(ai_helper.helpers.values()) if isinstance(ai_helper, ProviderRouter) else [ai_helper]
+
+
+def api_key_managers() -> list[ApiKeyManager]:
+    return [helper.api_key_manager for helper in provider_helpers() if hasattr(helper, "api_key_manager")]
+
+
+def limiters() -> dict[str, AdaptiveLimiter]:
+    return {
+        helper.PROVIDER: helper.limiter
+        for helper in provider_helpers() if getattr(helper, "limiter", None) is not None
+    }
+
+
+def word_deficits(session: Session, max_sentences: int = MAX_SENTENCES_PER_WORD, words: Optional[Collection[str]] = None) -> list[tuple[Words, int]]:
+    """
+    Find the words that still need sentences.
     
-    for library in libraries:
+    The sentence counts come from `GROUP BY` queries, and every lexeme is
+    returned once, through one of its words, even if several libraries
+    contain it or spell it with another case.
+    
+    Parameters
+    ----------
+    session: :class:`Session`
+        The session used for reading.
+    max_sentences: :type:`int`
+        The number of sentences a word should have.
+    words: :type:`Optional[Collection[str]]`
+        Only check these english words; all words if `None`.
+        
+    Returns
+    -------
+    :type:`list[tuple[Words, int]]`
+        The words in random order, each with the number of missing sentences.
+    """
+    
+    if words is not None and not words:
+        return []
+    
+    counts = sentence_counts(session, words)
+    
+    query = session.query(Words).filter(Words._library_id.isnot(None))
+    
+    if words is not None:
+        candidates = [word for chunk in chunks(words) for word in query.filter(Words.english.in_(chunk)).all()]
+        candidates.sort(key=lambda word: word.id)
+    else:
+        candidates = query.order_by(Words.id).all()
+    
+    deficits: dict[str, tuple[Words, int]] = {}
+    
+    for word in candidates:
+        lexeme = Lexemes.normalize(word.english)
+        
+        if lexeme in deficits:
+            continue
+        
+        count = counts.get(lexeme, 0)
+        
+        if count >= max_sentences:
+            log.debug(f"Word '{word.english}' already has {count} sentences, skipping...")
+            continue
         
-        words: list[Words] = session.query(Words).filter_by(library=library).all()
-        random.shuffle(words)
+        deficits[lexeme] = (word, max_sentences - count)
+        
+    result = list(deficits.values())
+    random.shuffle(result)
+    
+    return result
+
 
-        for word in words:
-            count = len(Sentences.query.filter_by(word_english=word.english).all())
+async def generate(max_in_flight: int = API_MAX_IN_FLIGHT, batch_size: int = API_BATCH_SIZE,
+                   words: Optional[Collection[str]] = None, checkpoint: Optional[PassCheckpoint] = None) -> None:
+    """
+    Generate all the missing sentences of the words that do not have enough
+    of them yet.
+    
+    Parameters
+    ----------
+    max_in_flight: :type:`int`
+        The number of `question()` calls kept running at the same time. The
+        per-key limit lives in the `ApiKeyManager`, the per-provider limit
+        (`API_MAX_IN_FLIGHT_PER_PROVIDER`) in the provider's helper.
+    batch_size: :type:`int`
+        The number of words sent in one prompt. With more than one word the
+        batched `questions()` is used instead of `question()`. Otherwise, if
+        `API_CANDIDATES` is more than one, `question_set()` asks for that many
+        candidates per prompt and keeps the best ones, up to the deficit.
+    words: :type:`Optional[Collection[str]]`
+        Only generate for these english words; all words if `None`.
+    checkpoint: :class:`Optional[PassCheckpoint]`
+        Persist the progress of the pass. A started checkpoint is resumed,
+        in its order; otherwise it is started over the words of this pass.
+        Either way, words blocked by a deterministic failure are skipped.
+    """
+    session_factory = get_sessionmaker()
+    
+    with session_factory() as session:
+        deficits = word_deficits(session, words=words)
+        
+        # A targeted pass must not drop the rest of the queue, which only full passes rebuild.
+        if words is None:
+            deficits = prioritize(session, deficits)
+        else:
+            deficits = stored_order(session, deficits)
             
-            if count > MAX_SENTENCES_PER_WORD:
-                log.debug(f"Library '{library.name}': Word '{word.english}' already has {count} sentences, skipping...")
-                continue
+        if checkpoint is not None:
+            blocked = blocked_words(session, datetime.now())
+            deficits = [(word, deficit) for word, deficit in deficits if word.english not in blocked]
+            
+    if checkpoint is not None:
+        if checkpoint.started:
+            order = {english: i for i, english in enumerate(checkpoint.words)}
+            deficits.sort(key=lambda item: order.get(item[0].english, len(order)))
+        else:
+            checkpoint.start([word.english for word, _ in deficits])
+    
+    queue: asyncio.Queue[tuple[Words, int]] = asyncio.Queue()
+    use_candidates = API_CANDIDATES > 1 and batch_size == 1
+    
+    # Queue items left per word, and why the word failed, to settle it in the checkpoint.
+    outstanding: dict[str, int] = {}
+    failures: dict[str, str] = {}
+    
+    if use_candidates:
+        # One item per word; a prompt can fill several of its missing sentences.
+        for word, deficit in deficits:
+            queue.put_nowait((word, deficit))
+            outstanding[word.english] = 1
+    else:
+        # One item per missing sentence, in rounds, so every word gets its
+        # first sentence before any word gets its second.
+        for missing in range(max((deficit for _, deficit in deficits), default=0)):
+            for word, deficit in deficits:
+                if deficit > missing:
+                    queue.put_nowait((word, deficit - missing))
+                    
+        outstanding = {word.english: deficit for word, deficit in deficits}
             
-            ai_helper.retry_attempts = 0
-            question = await ai_helper.question(word.english)
+    writer = SentenceWriter(session_factory, API_WRITE_BATCH_SIZE, API_WRITE_FLUSH_INTERVAL, checkpoint=checkpoint)
+    failed = 0
+    
+    def write(word: Words, question: dict[str, str]) -> None:
+        s_english, s_chinese = map(str.strip, question["sentence"].split("|", 1))
+        writer.add(word, s_english, s_chinese)
+        
+    def fail(word: Words, reason: Optional[str] = None) -> None:
+        nonlocal failed
+        
+        log.error(f"Failed to generate question for word: {word.english}, skipping...")
+        failed += 1
+        
+        if reason is None and (pop_failure := getattr(ai_helper, "pop_failure", None)) is not None:
+            reason = pop_failure(word.english)
             
-            if question is None:
-                log.error(f"Failed to generate question for word: {word.english}, skipping...")
+        failures[word.english] = reason or "other"
+        
+    def settle(word: Words) -> None:
+        outstanding[word.english] -= 1
+        
+        if outstanding[word.english] == 0:
+            if word.english in failures:
+                writer.failed(word, failures[word.english])
+            else:
+                writer.done(word)
+    
+    async def candidates_worker() -> None:
+        while not queue.empty():
+            word, deficit = queue.get_nowait()
+            reason = None
+            
+            try:
+                with variant(str(deficit)):
+                    questions = await ai_helper.question_set(word.english, deficit) or []
+                        
+            except APIError as e:
+                log.error(f"API error while generating questions for word: {word.english}, skipping... ({e})")
+                questions, reason = [], "api_error"
+                
+            if not questions:
+                fail(word, reason)
+                settle(word)
                 continue
             
-            s_english, s_chinese = map(str.strip, question["sentence"].split("|", 1))
+            for question in questions:
+                write(word, question)
+                
+            if len(questions) < deficit:
+                # The requeued item stands in for this one.
+                queue.put_nowait((word, deficit - len(questions)))
+            else:
+                settle(word)
+    
+    async def worker() -> None:
+        while not queue.empty():
+            items: list[tuple[Words, int]] = []
+            
+            while not queue.empty() and len(items) < batch_size:
+                item = queue.get_nowait()
+                
+                # A prompt asks for one sentence per word; leave the next one for a later batch.
+                if any(item[0].english == word.english for word, _ in items):
+                    queue.put_nowait(item)
+                    break
+                
+                items.append(item)
+                
+            batch = [word for word, _ in items]
+            reason = None
+            
+            try:
+                # The deficits tell apart the cached responses for each sentence of a word.
+                with variant(",".join(str(deficit) for _, deficit in items)):
+                    if len(batch) == 1:
+                        questions = {batch[0].english: await ai_helper.question(batch[0].english)}
+                    else:
+                        questions = await ai_helper.questions([word.english for word in batch])
+                    
+            except APIError as e:
+                log.error(f"API error while generating questions for words: {[word.english for word in batch]}, skipping... ({e})")
+                questions, reason = {}, "api_error"
             
-            db.session.add(Sentences(
-                chinese=s_chinese,
-                english=s_english,
-                word_chinese=word.chinese,
-                word_english=word.english
-            ))
+            for word in batch:
+                question = questions.get(word.english)
+                
+                if question is None:
+                    fail(word, reason)
+                else:
+                    write(word, question)
+                    
+                settle(word)
+                
+    async def publish_metrics() -> None:
+        while True:
+            await asyncio.sleep(API_METRICS_INTERVAL)
+            metrics.publish(session_factory, api_key_managers(), limiters())
+            
+    start = time.monotonic()
+    background = [asyncio.create_task(writer.autoflush()), asyncio.create_task(publish_metrics())]
+    
+    try:
+        run = candidates_worker if use_candidates else worker
+        await asyncio.gather(*(run() for _ in range(max(1, min(max_in_flight, queue.qsize())))))
+    finally:
+        for task in background:
+            task.cancel()
+        writer.flush()
+        
+    elapsed = time.monotonic() - start
+    generated = len(writer.written)
+    
+    with session_factory() as session:
+        dequeue(session, [word.english for word, _ in deficits])
+        
+    metrics.last_pass = {
+        "finished_at": datetime.now().strftime(DATETIME_FORMAT),
+        "words": len(deficits),
+        "sentences": generated,
+        "failures": writer.failed_words,
+        "failed_requests": failed,
+        "write_failures": writer.write_failures,
+        "near_duplicates": writer.duplicates,
+        "over_cap": writer.capped,
+        "seconds": round(elapsed, 3),
+        "write_transactions": writer.transactions,
+    }
+    metrics.publish(session_factory, api_key_managers(), limiters())
+    
+    log.info(
+        f"Generation pass finished: {generated} sentences, {writer.failed_words} words failed "
+        f"({failed} failed requests, {writer.write_failures} sentences lost to write errors), "
+        f"{writer.duplicates} near-duplicates rejected in {elapsed:.1f}s "
+        f"({generated / elapsed * 60 if elapsed > 0 else 0.0:.1f} sentences/minute, {writer.transactions} write transactions)"
+    )
+    
+    if (connection_stats := getattr(ai_helper, "connection_stats", None)) is not None:
+        log.info(f"HTTP connections: {connection_stats['created']} created, {connection_stats['reused']} reused")
+        
+    if (cache := getattr(ai_helper, "cache", response_cache)) is not None and cache.mode != "off":
+        log.info(f"Response cache ({cache.mode}): {cache.stats['hits']} hits, {cache.stats['misses']} misses, {cache.stats['writes']} writes")
+        
+    for provider, limiter in limiters().items():
+        log.info(f"Concurrency limit of {provider}: {int(limiter.limit)} ({limiter.stats['cuts']} cuts, {limiter.stats['overloads']} overloads)")
+        
+    if isinstance(ai_helper, ProviderRouter):
+        weights = ", ".join(f"{provider} {stats.weight:.2f}" for provider, stats in ai_helper.stats.items())
+        log.info(f"Provider routing: weights {weights}; {ai_helper.hedges['sent']} hedged requests, {ai_helper.hedges['won']} won by the hedge")
 
-            db.session.commit()
 
+async def sweep(full: bool = False) -> None:
+    """
+    Run a generation pass over the words that may need sentences: an
+    incremental sweep from the last sweep's marker, or a full one (see
+    `sweep_candidates()`).
+    """
+    
+    session_factory = get_sessionmaker()
+    checkpoint = PassCheckpoint.load(session_factory) if API_CHECKPOINT["enabled"] else None
+    
+    if checkpoint is not None:
+        # A restart in the middle of a pass: finish its remaining words first.
+        words = checkpoint.remaining()
+        last_word_id = checkpoint.meta["last_word_id"]
+        started_at = datetime.strptime(checkpoint.meta["started_at"], DATETIME_FORMAT)
+        full = checkpoint.meta["full"]
+        log.info(f"Resuming generation pass {checkpoint.pass_id}: {len(words)} of {len(checkpoint.words)} words left")
+        
+    else:
+        started_at = datetime.now()
+        
+        with session_factory() as session:
+            last_word_id = session.query(func.max(Words.id)).scalar() or 0
+            words = sweep_candidates(session, started_at, full)
+            
+        full = words is None
+        log.info(f"Starting a {'full' if full else 'incremental'} sweep" + ("" if full else f" over {len(words)} words"))
+        
+        if API_CHECKPOINT["enabled"]:
+            checkpoint = PassCheckpoint(session_factory, meta={
+                "last_word_id": last_word_id, "started_at": started_at.strftime(DATETIME_FORMAT), "full": full,
+            })
+            
+    await generate(words=words, checkpoint=checkpoint)
+    
+    with session_factory() as session:
+        mark_swept(session, last_word_id, started_at, full=full)
+        
+    if checkpoint is not None:
+        checkpoint.finish()
 
-def init_generator() -> None:
+
+async def fast_path() -> None:
+    """
+    Generate for the words enqueued (`priority.enqueue()`) that no pass has
+    handled yet, then settle them in the queue, including those that did
+    not need sentences after all.
+    """
+    
+    session_factory = get_sessionmaker()
     
-    async def _generate() -> None:
+    with session_factory() as session:
+        words = enqueued(session)
+        
+    if words:
+        log.info(f"Fast path: generating for {len(words)} newly enqueued words")
+        await generate(words=words)
+        
+        with session_factory() as session:
+            dequeue(session, words)
+
+
+async def _run_locked(lock: GeneratorLock, once: bool) -> None:
+    
+    async def _passes() -> None:
+        while True:
+            await sweep()
+            
+            if once:
+                return
+            
+            log.info(f"Questions generated successfully, next sweep in {API_GENERATION_DURATION} seconds")
+            next_sweep = time.monotonic() + API_GENERATION_DURATION
+            
+            while (remaining := next_sweep - time.monotonic()) > 0:
+                await asyncio.sleep(min(API_FAST_PATH_INTERVAL, remaining))
+                await fast_path()
+    
+    passes = asyncio.create_task(_passes())
+    keep_alive = asyncio.create_task(lock.keep_alive())
+    
+    try:
+        await asyncio.wait({passes, keep_alive}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (passes, keep_alive):
+            task.cancel()
+        await asyncio.gather(passes, keep_alive, return_exceptions=True)
+        
+    if passes.done() and not passes.cancelled() and passes.exception() is not None:
+        raise passes.exception()
+
+
+async def run_generator(once: bool = False) -> None:
+    """
+    Run the questions generator while holding the generator lock, so only
+    one generator is active across all processes.
+    
+    Parameters
+    ----------
+    once: :type:`bool`
+        Run a single pass and return instead of running forever. If another
+        generator holds the lock, return without generating.
+    """
+    
+    engine = get_engine()
+    lock = GeneratorLock(engine, ttl=API_GENERATOR_LOCK_TTL)
+    
+    try:
         while True:
-            await generate()
-            log.info(f"Questions generated successfully, waiting for the next interval...({API_GENERATION_DURATION} seconds)")
-            await asyncio.sleep(API_GENERATION_DURATION)
+            if lock.acquire():
+                await _run_locked(lock, once)
+                
+                if once:
+                    return
+                
+            elif once:
+                log.warning("Another questions generator is running, skipping this pass")
+                return
+            
+            else:
+                log.info(f"Another questions generator is running, retrying in {lock.ttl} seconds...")
+                
+            await asyncio.sleep(lock.ttl)
+                
+    finally:
+        lock.release()
+        await ai_helper.close()
+        engine.dispose()
+        log.info("Questions generator stopped")
+
+
+def init_generator() -> None:
+    """
+    Run the questions generator in a background thread of this process.
+    
+    Prefer the dedicated worker (`flask generate`); this is only used when
+    `development.init_generator` is enabled.
+    """
             
     def _start_event_loop(loop: asyncio.AbstractEventLoop) -> None:
         asyncio.set_event_loop(loop)
@@ -84,7 +527,6 @@ def init_generator() -> None:
     t = threading.Thread(target=_start_event_loop, args=(_loop,), daemon=True)
     t.start()
     
-    _loop.call_soon_threadsafe(asyncio.create_task, _generate())
+    _loop.call_soon_threadsafe(asyncio.create_task, run_generator())
     
     log.info("Questions generator initialized")
-    
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .english_helper import GroqEnglishHelper, GeminiEnglishHelper, MistralEnglishHelper
+from .english_helper import GroqEnglishHelper, GeminiEnglishHelper, MistralEnglishHelper, LocalEnglishHelper
 
 API_INFO = {
     "groq": {
@@ -12,5 +12,9 @@ API_INFO = {
     "mistral": {
         "helper_class": MistralEnglishHelper,
         "prefix": None
+    },
+    "local": {
+        "helper_class": LocalEnglishHelper,
+        "prefix": "local_"
     }
 }
\ No newline at end of file
@@ -1,57 +1,264 @@
 import asyncio
+import heapq
+import itertools
 import logging
 import time
-import threading
 from collections import deque
-from typing import Callable, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
 from .api_config import API_INFO
+from .english_helper import APIError
 
 log = logging.getLogger(__name__)
 
 
+class TokenBucket:
+    """
+    A token bucket refilled lazily: `rate` tokens per second, at most
+    `capacity` tokens stored.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available, 0 if there is one already."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
 class ApiKeyManager:
-    
-    def __init__(self, api_keys: list[str], prefix: Optional[str]):
+    """
+    An asyncio-native pool of API keys.
+
+    Every key has a token bucket (`requests_per_minute`), a cooldown deadline
+    set after rate limits, and an in-flight counter (`max_in_flight_per_key`).
+    Coroutines waiting for a key sleep on a future: a release wakes the next
+    waiter in line, and one timer set for the earliest cooldown/refill
+    deadline wakes one waiter per key slot, so nothing polls and nothing
+    blocks the event loop. Keys that are rejected as invalid are quarantined
+    and never handed out again.
+    """
+
+    def __init__(self, api_keys: list[str], prefix: Optional[str],
+                 max_in_flight_per_key: Optional[int] = None, requests_per_minute: Optional[float] = None):
         if prefix is None:
             prefix_list = [info["prefix"] for info in API_INFO.values() if info["prefix"] is not None]
             self.api_keys = deque([key for key in api_keys if all(not key.startswith(p) for p in prefix_list)])
         else:
             self.api_keys = deque([key for key in api_keys if key.startswith(prefix)])
-        self.available = {key: True for key in api_keys}
-            
 
-    async def get_available_api_key(self) -> str:
+        self.max_in_flight_per_key = max_in_flight_per_key
+        self.requests_per_minute = requests_per_minute
+        self.in_flight = {key: 0 for key in self.api_keys}
+        self.cooldown_until = {key: 0.0 for key in self.api_keys}
+        self.quarantined: dict[str, str] = {}
+        self.waits = {key: {"count": 0, "seconds": 0.0} for key in self.api_keys}
+        self.acquire_waits = {"count": 0, "seconds": 0.0}  # Time callers spent in `acquire()` without a key
+        self.uses = {key: 0 for key in self.api_keys}
+        self.buckets = {
+            key: TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+            for key in self.api_keys
+        } if requests_per_minute else {}
+
+        # (ticket, future) heap: waiters are served in the order they first asked for a key.
+        self._waiters: list[tuple[int, asyncio.Future]] = []
+        self._woken: set[int] = set()  # Tickets of the waiters woken that have not run yet
+        self._tickets = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_deadline = float("inf")
+
+
+    def _try_acquire(self, now: float) -> tuple[Optional[str], Optional[float]]:
+        """
+        Take the next usable key in rotation.
+
+        Returns the key, or `None` and the number of seconds until a key may
+        become usable (`None` if only a release can free one).
+        """
+
+        wait: Optional[float] = None
+
         for _ in range(len(self.api_keys)):
             key = self.api_keys[0]
-            
-            if self.available[key]:
-                self.api_keys.rotate(1)
+            self.api_keys.rotate(-1)
+
+            if self.max_in_flight_per_key is not None and self.in_flight[key] >= self.max_in_flight_per_key:
+                continue
+
+            key_wait = max(0.0, self.cooldown_until[key] - now)
+
+            if key in self.buckets:
+                key_wait = max(key_wait, self.buckets[key].wait_time(now))
+
+            if key_wait > 0:
+                wait = key_wait if wait is None else min(wait, key_wait)
+                continue
+
+            if key in self.buckets:
+                self.buckets[key].take(now)
+
+            self.in_flight[key] += 1
+            self.uses[key] += 1
+            return key, None
+
+        return None, wait
+
+
+    def _wake_one(self) -> None:
+        while self._waiters:
+            ticket, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self._woken.add(ticket)
+                waiter.set_result(None)
+                return
+
+
+    def _wake_waiters(self) -> None:
+        waiters, self._waiters = self._waiters, []
+
+        for ticket, waiter in sorted(waiters, key=lambda item: item[0]):
+            if not waiter.done():
+                self._woken.add(ticket)
+                waiter.set_result(None)
+
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._timer_deadline = float("inf")
+
+        # At most one waiter per free slot can get a key; the rest stay asleep
+        # instead of all rescanning the keys at once.
+        per_key = self.max_in_flight_per_key or 1
+        for _ in range(len(self.api_keys) * per_key):
+            self._wake_one()
+
+
+    def _schedule_wakeup(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        deadline = time.monotonic() + delay
+
+        if self._timer is not None and self._timer_deadline <= deadline:
+            return
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._timer = loop.call_later(delay, self._on_timer)
+        self._timer_deadline = deadline
+
+
+    async def acquire(self) -> str:
+        """
+        Wait for a usable key and count it as in flight. Every call must be
+        paired with `release()`; prefer `lease()`.
+        """
+
+        loop = asyncio.get_running_loop()
+        ticket = next(self._tickets)
+        woken = False
+        start = time.monotonic()
+
+        while True:
+            if not self.api_keys:
+                raise APIError("No usable API keys left" if self.quarantined else "No API keys configured")
+
+            older_woken = any(other < ticket for other in self._woken)
+
+            if woken and (older_woken or (self._waiters and self._waiters[0][0] < ticket)):
+                # An older waiter is back in line: it goes first, with this
+                # wake-up unless it already has one.
+                if not older_woken:
+                    self._wake_one()
+                key, wait = None, None
+            else:
+                key, wait = self._try_acquire(time.monotonic())
+
+            if key is not None:
+                if woken:
+                    self.acquire_waits["count"] += 1
+                    self.acquire_waits["seconds"] += time.monotonic() - start
                 return key
-            
-        log.debug("No available API keys found. Retrying...")
-        
-        while not any(self.available.values()):
-            await asyncio.sleep(3)
-        
-        return await self.get_available_api_key()
-    
-    
-    def wait_for_any_key(self):
-        while not any(self.available.values()):
-            time.sleep(3)
-    
-    
-    @staticmethod
-    def _cooldown_thread(key: str, retry_delay: int, available: Callable):
-        time.sleep(retry_delay)
-        is_kay_available: dict[str, bool] = available()
-        if not is_kay_available[key]:
-            is_kay_available.update({key: True})
-    
-    
-    async def update_retry_delay(self, retry_delay):
-        key = self.api_keys[0]
-        self.available[key] = False
-        thread = threading.Thread(target=self._cooldown_thread, args=(key, retry_delay, lambda: self.available), daemon=True)
-        thread.start()
\ No newline at end of file
+
+            waiter = loop.create_future()
+
+            # A waiter that was woken but still found nothing keeps its place in line.
+            heapq.heappush(self._waiters, (ticket, waiter))
+
+            if wait is not None:
+                self._schedule_wakeup(loop, wait)
+
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass a wake-up we can no longer use on to the next waiter.
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_one()
+                raise
+            finally:
+                self._woken.discard(ticket)
+
+            woken = True
+
+
+    def release(self, key: str) -> None:
+        if key in self.in_flight:
+            self.in_flight[key] -= 1
+
+        # One slot was freed, so one waiter can use it.
+        self._wake_one()
+
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[str]:
+        """
+        Hold an API key for the duration of one request, so that no key
+        has more than `max_in_flight_per_key` requests running at once.
+        """
+
+        key = await self.acquire()
+
+        try:
+            yield key
+        finally:
+            self.release(key)
+
+
+    def cool_down(self, key: str, seconds: float) -> None:
+        """Do not hand out `key` for the next `seconds` seconds."""
+
+        if key not in self.cooldown_until:
+            return
+
+        self.cooldown_until[key] = max(self.cooldown_until[key], time.monotonic() + seconds)
+        self.waits[key]["count"] += 1
+        self.waits[key]["seconds"] += seconds
+        log.debug(f"API key ...{key[-4:]} cooling down for {seconds:.1f}s")
+
+
+    def quarantine(self, key: str, reason: str) -> None:
+        """Take `key` out of rotation for good, e.g. after a 401."""
+
+        if key in self.quarantined or key not in self.api_keys:
+            return
+
+        self.api_keys.remove(key)
+        self.quarantined[key] = reason
+        log.error(f"API key ...{key[-4:]} quarantined: {reason}")
+
+        # Waiters re-check and fail fast if no keys are left.
+        self._wake_waiters()
@@ -0,0 +1,94 @@
+import logging
+import random
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+
+log = logging.getLogger(__name__)
+
+# Headers providers send with 429 responses, most specific first.
+# Groq: `retry-after`, `x-ratelimit-reset-requests`, `x-ratelimit-reset-tokens` ("2m59.56s", "7.66s").
+# Mistral: `retry-after`, `ratelimitbysize-reset` / `x-ratelimit-reset` (seconds).
+RETRY_HEADERS = [
+    "retry-after",
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+    "x-ratelimit-reset",
+    "ratelimit-reset",
+    "ratelimitbysize-reset",
+]
+
+DURATION_PATTERN = re.compile(r"(?P<value>\d+(?:\.\d+)?)(?P<unit>ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Parse a reset hint into seconds.
+
+    Accepts plain seconds (`"12"`, `"0.5"`), Go-style durations (`"1m30.5s"`,
+    `"250ms"`) and HTTP dates. Returns `None` if the value is not understood.
+    """
+
+    value = value.strip()
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    if (parts := DURATION_PATTERN.findall(value)) and DURATION_PATTERN.sub("", value) == "":
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Read how long to wait from a rate-limited response's headers.
+
+    Returns the hint of the first known header present, or `None`.
+    """
+
+    lowered = {name.lower(): value for name, value in headers.items()}
+
+    for name in RETRY_HEADERS:
+        if name in lowered and (seconds := parse_duration(lowered[name])) is not None:
+            return seconds
+
+    return None
+
+
+class BackoffPolicy:
+    """
+    One backoff policy for all providers.
+
+    A server hint (`Retry-After` and friends) is used when present, with a
+    little jitter so that waiters do not come back all at once. Otherwise
+    the delay grows exponentially from `base` with "equal jitter" (half
+    fixed, half random), never above `cap`.
+    """
+
+    HINT_JITTER = 0.1
+
+    def __init__(self, base: float, cap: float):
+        self.base = base
+        self.cap = cap
+
+
+    def delay(self, attempt: int, hint: Optional[float] = None) -> float:
+        if hint is not None:
+            return min(self.cap, hint * (1 + random.uniform(0, self.HINT_JITTER)))
+
+        ceiling = min(self.cap, self.base * 2 ** max(0, attempt - 1))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+log = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "on", "replay")
+
+# Set by `EnglishHelper.retry`, so that every retry of a prompt has its own entry.
+attempt: ContextVar[int] = ContextVar("response_attempt", default=1)
+
+# Set by the caller to tell apart requests with the same prompt, e.g. the
+# third and the fourth sentence asked for the same word.
+_variant: ContextVar[str] = ContextVar("response_variant", default="")
+
+
+@contextmanager
+def variant(value: str) -> Iterator[None]:
+    token = _variant.set(value)
+    try:
+        yield
+    finally:
+        _variant.reset(token)
+
+
+class ResponseCache:
+    """
+    An on-disk, content-addressed cache of LLM responses.
+
+    Entries are JSON files named by the SHA-256 of (provider, model, prompt,
+    variant, attempt). When the cache grows over `max_bytes`, the least
+    recently used entries are removed.
+
+    Modes
+    -----
+    - `"off"`: never read or write.
+    - `"on"`: serve cached responses and record new ones.
+    - `"replay"`: serve cached responses only; the helper raises
+      `CacheMissError` on a miss instead of calling the API.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, mode: str = "off"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported cache mode: {mode}")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._sizes: Optional[dict[str, int]] = None
+        self._total = 0
+
+
+    @staticmethod
+    def key(provider: str, model: str, prompt: str) -> str:
+        payload = json.dumps([provider, model, prompt, _variant.get(), attempt.get()], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+
+    def _index(self) -> dict[str, int]:
+        """Sizes of all entries on disk, read once."""
+
+        if self._sizes is None:
+            self._sizes = {}
+
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".json"):
+                        self._sizes[name[:-5]] = os.path.getsize(os.path.join(root, name))
+
+            self._total = sum(self._sizes.values())
+
+        return self._sizes
+
+
+    def get(self, key: str) -> Optional[str]:
+        if self.mode == "off":
+            return None
+
+        path = self._path(key)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            self.stats["misses"] += 1
+            return None
+
+        # The access time drives eviction; filesystems mounted with noatime do not update it.
+        now = time.time()
+        os.utime(path, (now, now))
+        self.stats["hits"] += 1
+
+        return response
+
+
+    def put(self, key: str, provider: str, model: str, prompt: str, response: str) -> None:
+        if self.mode != "on":
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        data = json.dumps({
+            "provider": provider,
+            "model": model,
+            "prompt": prompt,
+            "variant": _variant.get(),
+            "attempt": attempt.get(),
+            "response": response,
+            "created_at": time.time(),
+        }, ensure_ascii=False)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        sizes = self._index()
+        self._total += len(data.encode("utf-8")) - sizes.get(key, 0)
+        sizes[key] = len(data.encode("utf-8"))
+        self.stats["writes"] += 1
+
+        if self._total > self.max_bytes:
+            self.evict()
+
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache is at 90% of `max_bytes`."""
+
+        sizes = self._index()
+        target = self.max_bytes * 0.9
+
+        def last_used(key: str) -> float:
+            try:
+                return os.stat(self._path(key)).st_atime
+            except OSError:
+                return 0.0
+
+        for key in sorted(sizes, key=last_used):
+            if self._total <= target:
+                break
+
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+            self._total -= sizes.pop(key)
+            self.stats["evictions"] += 1
+
+        log.debug(f"Response cache evicted down to {self._total} bytes")
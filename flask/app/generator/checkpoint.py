@@ -0,0 +1,149 @@
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, or_
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import API_CHECKPOINT
+from ..models.generation_checkpoint import GenerationCheckpoint
+from ..models.generator_state import GeneratorState
+
+
+log = logging.getLogger(__name__)
+
+PASS_STATE = "pass"
+
+# Failures that asking again soon would most likely repeat: the model keeps
+# answering the phrase in a way the checks reject.
+DETERMINISTIC_REASONS = frozenset({
+    "low_similarity", "missing_separator", "non_ascii", "underscore", "no_match", "no_valid_candidate",
+})
+
+
+def blocked_words(session: Session, now: datetime) -> set[str]:
+    """The words that failed for a deterministic reason and must not be retried yet."""
+
+    rows = session.query(GenerationCheckpoint.word_english).filter(
+        GenerationCheckpoint.status == "failed", GenerationCheckpoint.retry_at > now,
+    )
+    return {english for (english,) in rows.all()}
+
+
+class PassCheckpoint:
+    """
+    The progress of a generation pass, persisted so a restarted generator
+    resumes the pass instead of starting over.
+
+    The pass itself (its ID, the words in the order they are generated and
+    the caller's `meta`) is the `pass` row of the `generator_state` table.
+    Every finished or failed word is a `GenerationCheckpoint` row, written by
+    the `SentenceWriter` in the same transaction as the word's sentences.
+    Failures for a reason in `DETERMINISTIC_REASONS` also get a `retry_at`,
+    and the word is skipped by every pass until then.
+    """
+
+    def __init__(self, session_factory: sessionmaker, meta: Optional[dict] = None,
+                 pass_id: Optional[str] = None, words: Optional[list[str]] = None):
+        self.session_factory = session_factory
+        self.meta = meta or {}
+        self.pass_id = pass_id
+        self.words = words
+        self.pending: list[dict] = []
+
+
+    @classmethod
+    def load(cls, session_factory: sessionmaker) -> Optional["PassCheckpoint"]:
+        """The pass that was interrupted, if any."""
+
+        with session_factory() as session:
+            state = session.get(GeneratorState, PASS_STATE)
+
+            if state is None or not state.payload or state.payload.get("finished", True):
+                return None
+
+            payload = state.payload
+
+        return cls(session_factory, payload.get("meta"), payload["pass_id"], payload["words"])
+
+
+    @property
+    def started(self) -> bool:
+        return self.pass_id is not None
+
+
+    def _save(self, finished: bool) -> None:
+        payload = {"pass_id": self.pass_id, "words": self.words, "meta": self.meta, "finished": finished}
+
+        with self.session_factory() as session, session.begin():
+            state = session.get(GeneratorState, PASS_STATE)
+
+            if state is None:
+                session.add(GeneratorState(PASS_STATE, payload=payload))
+            else:
+                state.payload = payload
+                state.heartbeat_at = datetime.now()
+
+
+    def start(self, words: list[str]) -> None:
+        """Persist a new pass over `words`, in the order they will be generated."""
+
+        self.pass_id = uuid.uuid4().hex
+        self.words = words
+        self._save(finished=False)
+        log.debug(f"Generation pass {self.pass_id} started over {len(words)} words")
+
+
+    def remaining(self) -> list[str]:
+        """The words of the pass that are neither finished nor failed, in order."""
+
+        with self.session_factory() as session:
+            rows = session.query(GenerationCheckpoint.word_english).filter(GenerationCheckpoint.pass_id == self.pass_id)
+            settled = {english for (english,) in rows.all()}
+
+        return [english for english in self.words or [] if english not in settled]
+
+
+    def done(self, word: str) -> None:
+        self.pending.append({"word_english": word, "status": "done", "reason": None, "retry_at": None})
+
+
+    def failed(self, word: str, reason: str) -> None:
+        retry_at = None
+
+        if reason in DETERMINISTIC_REASONS:
+            retry_at = datetime.now() + timedelta(seconds=API_CHECKPOINT["deterministic_retry_after"])
+
+        self.pending.append({"word_english": word, "status": "failed", "reason": reason, "retry_at": retry_at})
+
+
+    def write(self, session: Session) -> int:
+        """Insert the pending marks in the caller's transaction. Returns how many."""
+
+        marks, self.pending = self.pending, []
+
+        if marks:
+            now = datetime.now()
+            session.execute(insert(GenerationCheckpoint), [
+                {"pass_id": self.pass_id, "updated_at": now, **mark} for mark in marks
+            ])
+
+        return len(marks)
+
+
+    def finish(self) -> None:
+        """
+        Mark the pass finished and drop its marks, except the failures that
+        still block their word, and the expired failures of older passes.
+        """
+
+        now = datetime.now()
+
+        with self.session_factory() as session, session.begin():
+            session.execute(delete(GenerationCheckpoint).where(
+                or_(GenerationCheckpoint.retry_at.is_(None), GenerationCheckpoint.retry_at <= now),
+            ))
+
+        self._save(finished=True)
+        log.debug(f"Generation pass {self.pass_id} finished")
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+
+import click
+from flask.cli import with_appcontext
+
+from ..config import API_LOCAL_URL
+
+
+log = logging.getLogger(__name__)
+
+
+@click.command("generate")
+@click.option("--once", is_flag=True, help="Run a single generation pass and exit.")
+@click.option("--replay", is_flag=True, help="Only use recorded responses from the response cache; never call the API.")
+@with_appcontext
+def generate_command(once: bool, replay: bool) -> None:
+    """Run the questions generator as a dedicated worker."""
+    
+    from . import response_cache, run_generator
+    
+    if replay:
+        response_cache.mode = "replay"
+    
+    log.info(f"Starting questions generator worker ({'one-shot' if once else 'long-running'})")
+    asyncio.run(run_generator(once=once))
+
+
+@click.command("compact-sentences")
+@click.option("--dry-run", is_flag=True, help="Only report what would be deleted.")
+@with_appcontext
+def compact_sentences_command(dry_run: bool) -> None:
+    """Delete near-duplicate sentences and sentences over `api.max_sentences_per_word`."""
+    
+    from .dedupe import compact_sentences
+    from .writer import get_sessionmaker
+    
+    with get_sessionmaker()() as session:
+        stats = compact_sentences(session, dry_run=dry_run)
+        
+    click.echo(
+        f"{stats['words']} words checked: {stats['duplicates']} near-duplicates and {stats['excess']} excess sentences "
+        f"{'would be deleted' if dry_run else 'deleted'}"
+    )
+
+
+@click.command("local-llm")
+@click.option("--host", default=urlsplit(API_LOCAL_URL).hostname, show_default=True)
+@click.option("--port", default=urlsplit(API_LOCAL_URL).port, type=int, show_default=True)
+@click.option("--latency", default=0.2, show_default=True, help="Seconds per response.")
+@click.option("--jitter", default=0.05, show_default=True, help="Random +/- seconds added to the latency.")
+@click.option("--rate-limit-rate", default=0.0, show_default=True, help="Share of requests answered with a 429.")
+@click.option("--malformed-rate", default=0.0, show_default=True, help="Share of responses with unusable text.")
+@click.option("--capacity", default=None, type=int, help="Requests served at once; more get a 429.")
+def local_llm_command(host: str, port: int, latency: float, jitter: float, rate_limit_rate: float, malformed_rate: float,
+                      capacity: Optional[int]) -> None:
+    """Serve a stand-in LLM for the "local" provider (`api.model_type`)."""
+    
+    from aiohttp import web
+    from .local_llm import LocalLLM
+    
+    llm = LocalLLM(latency=latency, jitter=jitter, rate_limit_rate=rate_limit_rate, malformed_rate=malformed_rate, capacity=capacity)
+    web.run_app(llm.app(), host=host, port=port)
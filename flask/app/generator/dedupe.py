@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import random
+import re
+from collections import defaultdict
+from itertools import groupby
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from ..config import API_DEDUPE, MAX_SENTENCES_PER_WORD
+from ..models.lexemes import Lexemes
+from ..models.sentences import Sentences
+from .sweep import chunks
+
+
+log = logging.getLogger(__name__)
+
+TOKEN = re.compile(r"[a-z0-9']+")
+
+# A Mersenne prime larger than the 64-bit shingle hashes.
+PRIME = (1 << 61) - 1
+
+
+def shingles(text: str, size: int = 2) -> set[str]:
+    """The `size`-word shingles of `text`, ignoring case and punctuation."""
+
+    tokens = TOKEN.findall(text.lower())
+
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures: for each of `num_perm` random hash functions, the
+    smallest hash of any shingle. The share of equal positions in two
+    signatures estimates the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_perm)]
+
+
+    def signature(self, shingle_set: set[str]) -> tuple[int, ...]:
+        if not shingle_set:
+            return (PRIME,) * len(self.params)
+
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            for shingle in shingle_set
+        ]
+
+        return tuple(min((a * h + b) % PRIME for h in hashes) for a, b in self.params)
+
+
+    @staticmethod
+    def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+class SimilarityIndex:
+    """
+    The MinHash signatures of the sentences of each lexeme, to reject a new
+    sentence that nearly copies one the lexeme already has.
+
+    Parameters
+    ----------
+    threshold: :type:`float`
+        The estimated Jaccard similarity at which a sentence is a near-duplicate.
+    shingle_size: :type:`int`
+        The number of words per shingle.
+    num_perm: :type:`int`
+        The signature length; longer signatures give closer estimates.
+    """
+
+    def __init__(self, threshold: float = API_DEDUPE["threshold"], shingle_size: int = API_DEDUPE["shingle_size"],
+                 num_perm: int = API_DEDUPE["num_perm"]):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.signatures: dict[int, list[tuple[int, ...]]] = defaultdict(list)
+
+
+    def signature(self, text: str) -> tuple[int, ...]:
+        return self.hasher.signature(shingles(text, self.shingle_size))
+
+
+    def add(self, lexeme_id: int, text: str) -> None:
+        self.signatures[lexeme_id].append(self.signature(text))
+
+
+    def find_duplicate(self, lexeme_id: int, text: str) -> Optional[float]:
+        """The similarity to the closest sentence of the lexeme if it is a near-duplicate, else `None`."""
+
+        signature = self.signature(text)
+        best = max((self.hasher.similarity(signature, other) for other in self.signatures.get(lexeme_id, [])), default=0.0)
+
+        return best if best >= self.threshold else None
+
+
+    def check_and_add(self, lexeme_id: int, text: str) -> bool:
+        """Add the sentence unless it is a near-duplicate. Returns whether it was added."""
+
+        if self.find_duplicate(lexeme_id, text) is not None:
+            return False
+
+        self.add(lexeme_id, text)
+        return True
+
+
+def compact_sentences(session: Session, max_sentences: int = MAX_SENTENCES_PER_WORD, dry_run: bool = False) -> dict[str, int]:
+    """
+    Prune the sentences table: for every lexeme, drop sentences that nearly
+    copy an older sentence of the lexeme, then the newest sentences over
+    `max_sentences`. Sentences without a lexeme get theirs first.
+
+    Parameters
+    ----------
+    session: :class:`Session`
+        The session used for reading and deleting.
+    max_sentences: :type:`int`
+        The number of sentences a lexeme may keep.
+    dry_run: :type:`bool`
+        Only count the rows that would be deleted, and roll back.
+
+    Returns
+    -------
+    :type:`dict[str, int]`
+        The number of words (lexemes) checked and of near-duplicate and excess rows.
+    """
+
+    stats = {"words": 0, "duplicates": 0, "excess": 0}
+    doomed: list[int] = []
+
+    unlinked = session.query(Sentences.word_english).filter(Sentences.lexeme_id.is_(None)).distinct()
+    for english, lexeme_id in Lexemes.resolve(session, [english for (english,) in unlinked]).items():
+        session.execute(
+            update(Sentences).where(Sentences.lexeme_id.is_(None), Sentences.word_english == english).values(lexeme_id=lexeme_id)
+        )
+
+    rows = (
+        session.query(Sentences.id, Sentences.lexeme_id, Sentences.english)
+        .order_by(Sentences.lexeme_id, Sentences.id)
+        .yield_per(1000)
+    )
+
+    for lexeme_id, sentences in groupby(rows, key=lambda row: row.lexeme_id):
+        index = SimilarityIndex()
+        kept = 0
+        stats["words"] += 1
+
+        for sentence in sentences:
+            if index.find_duplicate(lexeme_id, sentence.english) is not None:
+                stats["duplicates"] += 1
+                doomed.append(sentence.id)
+            elif kept >= max_sentences:
+                stats["excess"] += 1
+                doomed.append(sentence.id)
+            else:
+                index.add(lexeme_id, sentence.english)
+                kept += 1
+
+    if dry_run:
+        session.rollback()
+    else:
+        for chunk in chunks(doomed):
+            session.execute(delete(Sentences).where(Sentences.id.in_(chunk)))
+        session.commit()
+
+    log.info(
+        f"Sentence compaction{' (dry run)' if dry_run else ''}: {stats['words']} words, "
+        f"{stats['duplicates']} near-duplicates and {stats['excess']} excess sentences {'found' if dry_run else 'deleted'}"
+    )
+
+    return stats
@@ -1,42 +1,153 @@
 import asyncio
 import logging
 import json
-from difflib import SequenceMatcher
+import re
+import time
+from contextlib import nullcontext
 from functools import wraps
 from typing import Callable, Optional, overload, TYPE_CHECKING
 from opencc import OpenCC
 
 import aiohttp
-import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.ai.generativelanguage import GenerativeServiceAsyncClient
 from google.api_core import exceptions
-from google.rpc.error_details_pb2 import RetryInfo
+from google.rpc.error_details_pb2 import QuotaFailure, RetryInfo
+
+from ..config import API_LOCAL_URL
+from . import matcher
+from .backoff import BackoffPolicy, parse_retry_after
+from .cache import ResponseCache, attempt as response_attempt
+from .metrics import metrics
 
 if TYPE_CHECKING:
     from .api_key_manager import ApiKeyManager
+    from .limiter import AdaptiveLimiter
     
 
 log = logging.getLogger(__name__)
 
+# A numbering or bullet in front of a candidate sentence.
+CANDIDATE_PREFIX = re.compile(r"^\s*(?:\d+[.)]|[-*\u2022])\s*")
+
 
 class APIError(Exception):
     pass
 
 class GenerationError(Exception):
-    pass
+    
+    def __init__(self, message: str, *, reason: str = "other"):
+        super().__init__(message)
+        self.reason = reason  # A short code for metrics, e.g. "low_similarity"
 
 class RateLimitError(GenerationError):
+    
+    def __init__(self, message: str, *, retry_after: Optional[float] = None, key: Optional[str] = None):
+        super().__init__(message, reason="rate_limited")
+        self.retry_after = retry_after  # Seconds, from the provider's hint
+        self.key = key
+
+class KeyRejectedError(GenerationError):
+    
+    def __init__(self, message: str):
+        super().__init__(message, reason="key_rejected")
+
+class CacheMissError(APIError):
     pass
 
 class EnglishHelper:
+    PROVIDER = "base"
+    on_call: Optional[Callable[[str, float], None]] = None  # Called with the outcome and seconds of every API call
 
     def __init__(self, api_key_manager: "ApiKeyManager", *, model_name: str,
-                 max_retry_attempts: int = 5, retry_delay: int = 1):
+                 max_retry_attempts: int = 5, retry_delay: int = 1, max_retry_delay: int = 60,
+                 http_options: Optional[dict] = None, cache: Optional[ResponseCache] = None, candidates: int = 1,
+                 limiter: Optional["AdaptiveLimiter"] = None, max_in_flight: Optional[int] = None):
         self.api_key_manager = api_key_manager
+        self.cache = cache
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight  # Requests sent to this provider at the same time, unlimited if `None`
         self.model_name = model_name
+        self.candidates = candidates  # Sentences asked for per `question_set()` call
         self.max_retry_attempts = max_retry_attempts
         self.retry_delay = retry_delay  # Seconds
+        self.backoff = BackoffPolicy(retry_delay, max_retry_delay)
         self.retry_attempts = 0
+        self.failures: dict[str, str] = {}  # Reason of the last attempt, by phrase, for calls that gave up
         self.cc = OpenCC("s2t")  # Simplified to Traditional Chinese
+        
+        self.http_options = http_options or {}
+        self.connection_stats = {"created": 0, "reused": 0}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        
+    def slots(self) -> asyncio.Semaphore | nullcontext:
+        """The `max_in_flight` slots of the provider, one semaphore per event loop like the HTTP session."""
+        
+        if self.max_in_flight is None:
+            return nullcontext()
+        
+        loop = asyncio.get_running_loop()
+        
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._slots_loop = loop
+            
+        return self._slots
+        
+        
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the helper's long-lived HTTP session, creating it on first use.
+        
+        The session keeps connections alive between prompts, so requests after
+        the first one skip the TCP/TLS handshake and the DNS lookup.
+        """
+        loop = asyncio.get_running_loop()
+        
+        if self._session is not None and not self._session.closed and self._session_loop is loop:
+            return self._session
+        
+        async def on_connection_create_end(*_) -> None:
+            self.connection_stats["created"] += 1
+            
+        async def on_connection_reuseconn(*_) -> None:
+            self.connection_stats["reused"] += 1
+        
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        
+        connector = aiohttp.TCPConnector(
+            limit=self.http_options.get("limit", 32),
+            limit_per_host=self.http_options.get("limit_per_host", 8),
+            keepalive_timeout=self.http_options.get("keepalive_timeout", 60),
+            ttl_dns_cache=self.http_options.get("dns_cache_ttl", 300),
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.http_options.get("total_timeout", 60),
+            connect=self.http_options.get("connect_timeout", 10),
+        )
+        
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[trace_config])
+        self._session_loop = loop
+        log.debug(f"Created HTTP session for {type(self).__name__}")
+        
+        return self._session
+    
+    
+    async def close(self) -> None:
+        """Close the HTTP session and its pooled connections."""
+        
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            log.info(f"Closed HTTP session for {type(self).__name__} (connections: {self.connection_stats})")
+            
+        self._session = None
+        self._session_loop = None
 
 
     prepositions = [
@@ -74,28 +185,134 @@ class EnglishHelper:
     def retry(func: Callable):
         @wraps(func)
         async def wrapper(self: "EnglishHelper", *args, **kwargs):
+            reason = "other"
+            
             for attempt in range(1, self.max_retry_attempts + 1):
+                response_attempt.set(attempt)
+                
                 try:
                     return await func(self, *args, **kwargs)
                 
-                except RateLimitError:
-                    log.debug(f"Rate limited (attempt {attempt}), retrying in {self.retry_delay}s...")
-                    self.api_key_manager.wait_for_any_key()
-                    await asyncio.sleep(self.retry_delay)
+                except RateLimitError as e:
+                    reason = e.reason
+                    delay = self.backoff.delay(attempt, e.retry_after)
+                    
+                    if e.key is not None:
+                        # Only this key is throttled: park it and let the next attempt pick another one.
+                        log.debug(f"Rate limited (attempt {attempt}), cooling key down for {delay:.1f}s (hint: {e.retry_after})...")
+                        self.api_key_manager.cool_down(e.key, delay)
+                    else:
+                        log.debug(f"Rate limited (attempt {attempt}), retrying in {delay:.1f}s...")
+                        await asyncio.sleep(delay)
+                    continue
+                
+                except KeyRejectedError as e:
+                    reason = e.reason
+                    log.debug(f"API key rejected in {func.__name__} attempt {attempt}: {e}, retrying with another key...")
                     continue
                 
                 except GenerationError as e:
-                    log.debug(f"Generation error in {func.__name__} attempt {attempt}: {e}", exc_info=True)
-                    self.api_key_manager.wait_for_any_key()
-                    await asyncio.sleep(self.retry_delay)
+                    reason = e.reason
+                    delay = self.backoff.delay(attempt)
+                    log.debug(f"Generation error in {func.__name__} attempt {attempt}: {e}, retrying in {delay:.1f}s", exc_info=True)
+                    await asyncio.sleep(delay)
                     
             log.debug(f"Max retry attempts reached for {func.__name__}")
+            
+            if args and isinstance(args[0], str):
+                self.failures[args[0]] = reason
+                
             return None
         return wrapper
     
     
+    def pop_failure(self, phrase: str) -> Optional[str]:
+        """The reason of the last attempt of the last call for `phrase` that gave up, if any."""
+        return self.failures.pop(phrase, None)
+    
+    
     @overload
     async def request_api(self, prompt: str) -> str: ...
+    
+    
+    async def cached_request_api(self, prompt: str) -> str:
+        """
+        `request_api()` behind the response cache, if there is one.
+        
+        In replay mode nothing is sent: a prompt that was not recorded
+        raises `CacheMissError`.
+        """
+        if self.cache is None or self.cache.mode == "off":
+            return await self.timed_request_api(prompt)
+        
+        key = self.cache.key(self.PROVIDER, self.model_name, prompt)
+        
+        if (response := self.cache.get(key)) is not None:
+            metrics.call(self.PROVIDER, "cached")
+            return response
+        
+        if self.cache.mode == "replay":
+            raise CacheMissError(f"No recorded response for prompt (key {key[:12]})")
+        
+        response = await self.timed_request_api(prompt)
+        self.cache.put(key, self.PROVIDER, self.model_name, prompt, response)
+        
+        return response
+    
+    
+    async def timed_request_api(self, prompt: str) -> str:
+        """
+        `request_api()`, counted and timed (including the wait for a key) in
+        `metrics`, within the provider's `max_in_flight` and its adaptive
+        concurrency limit, if there is one.
+        """
+        async with self.slots():
+            return await self._limited_request_api(prompt)
+    
+    
+    async def _limited_request_api(self, prompt: str) -> str:
+        if self.limiter is None:
+            return await self._timed_request_api(prompt)
+        
+        async with self.limiter.slot() as ticket:
+            try:
+                response = await self._timed_request_api(prompt)
+                
+            except GenerationError as e:
+                if e.reason in ("rate_limited", "connection_error"):
+                    self.limiter.overload(ticket, e.reason)
+                raise
+            
+            self.limiter.success()
+            return response
+    
+    
+    async def _timed_request_api(self, prompt: str) -> str:
+        start = time.monotonic()
+        
+        try:
+            response = await self.request_api(prompt)
+            
+        except GenerationError as e:
+            self.record_call(e.reason, time.monotonic() - start)
+            
+            if isinstance(e, RateLimitError):
+                metrics.rate_limited(e.key)
+            raise
+        
+        except APIError:
+            self.record_call("api_error", time.monotonic() - start)
+            raise
+        
+        self.record_call("ok", time.monotonic() - start)
+        return response
+    
+    
+    def record_call(self, outcome: str, seconds: float) -> None:
+        metrics.call(self.PROVIDER, outcome, seconds)
+        
+        if self.on_call is not None:
+            self.on_call(outcome, seconds)
                 
 
     async def get_sentence(self, phrase: str) -> str:
@@ -106,16 +323,36 @@ class EnglishHelper:
             f"You MUST use Traditional Chinese characters for the translation, not Simplified Chinese. "
             f"Use `|` to separate the English sentence and the Chinese translation."
         )
-        response = await self.request_api(prompt)
+        response = await self.cached_request_api(prompt)
         return self.trim_empty_lines(response)
     
 
+    async def get_candidates(self, phrase: str, k: int) -> list[str]:
+        """Ask for `k` different sentences for `phrase` in one request. Returns the `english | chinese` lines."""
+        prompt = (
+            f"You are a sentence-making tool. Make *{k}* different short sentences. Every sentence must use `{phrase}`. "
+            f"Do not use other hard words and do not use Markdown. The sentences should look like vocabulary test sentences. "
+            f"After each sentence, give a **whole** sentence **Traditional Chinese** translation. "
+            f"You MUST use Traditional Chinese characters for the translation, not Simplified Chinese. "
+            f"Use `|` to separate the English sentence and the Chinese translation. "
+            f"Put every sentence and its translation on its own line, without numbering."
+        )
+        response = await self.cached_request_api(prompt)
+        
+        # Lines without a separator are the model talking about its answer, not candidates.
+        return [
+            CANDIDATE_PREFIX.sub("", line).strip()
+            for line in self.trim_empty_lines(response).splitlines()
+            if "|" in line
+        ]
+    
+
     async def check(self, sentence: str, phrase: str, similarity: float) -> Optional[dict[str, str]]:
         if similarity < 0.5:
-            raise GenerationError(f"Sentence: '{sentence}' - Similarity too low: {similarity:.2f}")
+            raise GenerationError(f"Sentence: '{sentence}' - Similarity too low: {similarity:.2f}", reason="low_similarity")
 
         if "|" not in sentence:
-            raise GenerationError(f"Sentence: '{sentence}' - No '|' found in response")
+            raise GenerationError(f"Sentence: '{sentence}' - No '|' found in response", reason="missing_separator")
 
         english, chinese = sentence.split("|", 1)
         english = english.strip()
@@ -124,10 +361,10 @@ class EnglishHelper:
         chinese = self.cc.convert(chinese)
 
         if not english.isascii():
-            raise GenerationError(f"Sentence: '{sentence}' - English part contains non-ASCII characters: '{english}'")
+            raise GenerationError(f"Sentence: '{sentence}' - English part contains non-ASCII characters: '{english}'", reason="non_ascii")
 
         elif "_" in chinese:
-            raise GenerationError(f"Sentence: '{sentence}' - Chinese part contains underscores: '{chinese}'")
+            raise GenerationError(f"Sentence: '{sentence}' - Chinese part contains underscores: '{chinese}'", reason="underscore")
 
         return {
             "sentence": f"{english}|{chinese}",
@@ -135,13 +372,137 @@ class EnglishHelper:
         }
         
 
+    @retry
+    async def get_sentences(self, phrases: list[str]) -> dict[str, str]:
+        """
+        Ask for one sentence per phrase in a single request.
+        
+        Returns the raw `english | chinese` text for every phrase the model
+        answered. Phrases missing from the response are left out.
+        """
+        prompt = (
+            f"You are a sentence-making tool. For *each* phrase in this JSON array, make *1* short sentence that uses the phrase: "
+            f"{json.dumps(phrases, ensure_ascii=False)}. "
+            f"Do not use other hard words and do not use Markdown. Each sentence should look like a vocabulary test sentence. "
+            f"After each sentence, give a **whole** sentence **Traditional Chinese** translation. "
+            f"You MUST use Traditional Chinese characters for the translation, not Simplified Chinese. "
+            f"Use `|` to separate the English sentence and the Chinese translation. "
+            f'Answer with a JSON array only, one object per phrase, like [{{"phrase": "...", "sentence": "English sentence | 中文翻譯"}}].'
+        )
+        response = await self.cached_request_api(prompt)
+        return self.parse_batch(response, phrases)
+    
+    
+    def parse_batch(self, response: str, phrases: list[str]) -> dict[str, str]:
+        start, end = response.find("["), response.rfind("]")
+        
+        if start == -1 or end < start:
+            raise GenerationError(f"No JSON array found in batch response: '{response}'", reason="malformed_batch")
+        
+        try:
+            items = json.loads(response[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise GenerationError(f"Invalid JSON in batch response: {e}", reason="malformed_batch")
+        
+        if not isinstance(items, list):
+            raise GenerationError(f"Batch response is not a JSON array: '{response}'", reason="malformed_batch")
+        
+        wanted = {phrase.lower(): phrase for phrase in phrases}
+        texts: dict[str, str] = {}
+        
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("sentence"), str):
+                log.debug(f"Skipping malformed batch item: {item}")
+                continue
+            
+            phrase = wanted.get(str(item.get("phrase", "")).strip().lower())
+            
+            if phrase is None or phrase in texts:
+                log.debug(f"Skipping batch item for unexpected phrase: {item}")
+                continue
+            
+            texts[phrase] = self.trim_empty_lines(item["sentence"])
+            
+        return texts
+    
+    
+    async def questions(self, phrases: list[str]) -> dict[str, Optional[dict[str, str]]]:
+        """
+        Batched `question()`: one request for all phrases. Every item is
+        checked on its own, so a bad item only drops that phrase.
+        """
+        results: dict[str, Optional[dict[str, str]]] = {phrase: None for phrase in phrases}
+        texts: Optional[dict[str, str]] = await self.get_sentences(phrases)
+        
+        if texts is None:
+            return results
+        
+        for phrase, text in texts.items():
+            try:
+                results[phrase] = await self.build_question(text, phrase)
+            except GenerationError as e:
+                log.debug(f"Batch item rejected for phrase '{phrase}': {e}")
+                
+        return results
+        
+
     @retry
     async def question(self, phrase: str) -> Optional[dict[str, str]]:
         text: Optional[str] = await self.get_sentence(phrase)
 
         if text is None:
-            raise GenerationError(f"Failed to get sentence from API for phrase: '{phrase}'")
+            raise GenerationError(f"Failed to get sentence from API for phrase: '{phrase}'", reason="empty_response")
 
+        return await self.build_question(text, phrase)
+    
+    
+    @retry
+    async def question_set(self, phrase: str, limit: int) -> list[dict[str, str]]:
+        """
+        Multi-candidate `question()`: ask for `candidates` sentences in one
+        request, check each of them and keep the best `limit` valid ones,
+        highest similarity to `phrase` first.
+        """
+        texts = await self.get_candidates(phrase, max(self.candidates, limit))
+        
+        if not texts:
+            raise GenerationError(f"No candidate sentences in response for phrase: '{phrase}'", reason="missing_separator")
+        
+        scored: list[tuple[dict[str, str], float]] = []
+        
+        for text in texts:
+            try:
+                scored.append(await self.scored_question(text, phrase))
+            except GenerationError as e:
+                log.debug(f"Candidate rejected for phrase '{phrase}': {e}")
+                
+        if not scored:
+            raise GenerationError(f"All {len(texts)} candidates rejected for phrase: '{phrase}'", reason="no_valid_candidate")
+        
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [question for question, _ in scored[:limit]]
+    
+    
+    async def build_question(self, text: str, phrase: str) -> Optional[dict[str, str]]:
+        question, _ = await self.scored_question(text, phrase)
+        return question
+    
+    
+    async def scored_question(self, text: str, phrase: str) -> tuple[dict[str, str], float]:
+        """`build_question()` that also returns the similarity of the matched phrase."""
+        try:
+            sentence_with_blank, similarity = self.blank_out(text, phrase)
+            question = await self.check(sentence_with_blank, phrase, similarity)
+            
+        except GenerationError as e:
+            metrics.rejected(self.PROVIDER, e.reason)
+            raise
+        
+        metrics.accepted(self.PROVIDER)
+        return question, similarity
+    
+    
+    def blank_out(self, text: str, phrase: str) -> tuple[str, float]:
         sentence_words = text.split()
         best_phrase, similarity, best_match_positions = self.best_match(text, phrase)
 
@@ -149,169 +510,220 @@ class EnglishHelper:
             if i < len(sentence_words):
                 sentence_words[i] = self.blankify(best_word)
             else:
-                raise GenerationError(f"Index {i} out of range for sentence: '{text}'")
+                raise GenerationError(f"Index {i} out of range for sentence: '{text}'", reason="no_match")
 
-        sentence_with_blank = " ".join(sentence_words).strip()
-        return await self.check(sentence_with_blank, phrase, similarity)
+        return " ".join(sentence_words).strip(), similarity
         
 
     def best_match(self, text: str, target_phrase: str) -> tuple[str, float, list[int]]:
-        words = text.split()
-        target_words = target_phrase.split()
-        target_len = len(target_words)
-
-        best_similarity = 0.0
-        best_match = ""
-        best_positions = []
-
         try:
-            if target_len == 1:
-                for i, word in enumerate(words):
-                    clean_word = word.strip(".,!?;:。，！？；：")
-                    sim = self.check_similarity(clean_word, target_phrase)
-                    if sim > best_similarity:
-                        best_similarity = sim
-                        best_match = clean_word
-                        best_positions = [i]
-            else:
-                for i in range(len(words) - target_len + 1):
-                    chunk = " ".join(words[i:i + target_len])
-                    sim = self.check_similarity(chunk, target_phrase)
-                    if sim > best_similarity:
-                        best_similarity = sim
-                        best_match = chunk
-                        best_positions = list(range(i, i + target_len))
-                        
+            return matcher.best_match(text, target_phrase)
         except Exception as e:
-            raise GenerationError(f"Error during best_match calculation: {e}")
-
-        return best_match, best_similarity, best_positions
+            raise GenerationError(f"Error during best_match calculation: {e}", reason="no_match")
     
 
     def check_similarity(self, phrase1: str, phrase2: str) -> float:
         try:
-            return SequenceMatcher(None, phrase1.lower(), phrase2.lower()).ratio()
+            return matcher.similarity(phrase1, phrase2)
         except Exception as e:
             log.error(f"Error calculating similarity between '{phrase1}' and '{phrase2}': {e}", exc_info=True)
             return 0.0
 
 
 class GroqEnglishHelper(EnglishHelper):
+    PROVIDER = "groq"
     API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
     async def request_api(self, prompt) -> str:
         
-        api_key = await self.api_key_manager.get_available_api_key()
-        payload = {"model": self.model_name, "messages":[{"role": "user", "content": prompt}]}
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        async with self.api_key_manager.lease() as api_key:
+            payload = {"model": self.model_name, "messages":[{"role": "user", "content": prompt}]}
+            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.API_URL, headers=headers, json=payload) as resp:
-                if resp.status == 429:
-                    raise RateLimitError("Rate limit exceeded")
-                
-                elif resp.status == 401:
-                    log.error("Unauthorized: Invalid API key")
-                    raise APIError("Unauthorized: Invalid API key")
-                
-                elif resp.status != 200:
-                    error_text = await resp.text()
-                    log.error(f"Groq API error: status={resp.status}, body={error_text}")
-                    raise GenerationError(f"Groq API error: {resp.status} - {error_text}")
+            session = await self.get_session()
 
-                data = await resp.json()
-                try:
-                    return data["choices"][0]["message"]["content"]
-                except (KeyError, IndexError):
-                    log.debug(f"Unexpected response: {json.dumps(data, ensure_ascii=False)}")
-                    raise GenerationError("Unexpected response format")
+            try:
+                async with session.post(self.API_URL, headers=headers, json=payload) as resp:
+                    if resp.status == 429:
+                        raise RateLimitError("Rate limit exceeded", retry_after=parse_retry_after(resp.headers), key=api_key)
+                    
+                    elif resp.status == 401:
+                        self.api_key_manager.quarantine(api_key, "Unauthorized: Invalid API key")
+                        raise KeyRejectedError("Unauthorized: Invalid API key")
+                    
+                    elif resp.status != 200:
+                        error_text = await resp.text()
+                        log.error(f"{self.PROVIDER.capitalize()} API error: status={resp.status}, body={error_text}")
+                        raise GenerationError(f"{self.PROVIDER.capitalize()} API error: {resp.status} - {error_text}", reason="http_error")
+
+                    data = await resp.json()
+                    try:
+                        return data["choices"][0]["message"]["content"]
+                    except (KeyError, IndexError):
+                        log.debug(f"Unexpected response: {json.dumps(data, ensure_ascii=False)}")
+                        raise GenerationError("Unexpected response format", reason="bad_response")
+                    
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise GenerationError(f"{self.PROVIDER.capitalize()} API connection error: {e!r}", reason="connection_error")
                 
                 
 class GeminiEnglishHelper(EnglishHelper):
-    GENERATION_CONFIG = {
-        "temperature": 0.9,
-        "top_p": 1,
-        "top_k": 1,
-        "max_output_tokens": 2048,
-    }
+    PROVIDER = "gemini"
+    GENERATION_CONFIG = glm.GenerationConfig(
+        temperature=0.9,
+        top_p=1,
+        top_k=1,
+        max_output_tokens=2048,
+    )
 
     SAFETY_SETTINGS = [
-        {
-            "category": "HARM_CATEGORY_HARASSMENT",
-            "threshold": "block_none"
-        },
-        {
-            "category": "HARM_CATEGORY_HATE_SPEECH",
-            "threshold": "block_none"
-        },
-        {
-            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-            "threshold": "block_none"
-        },
-        {
-            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-            "threshold": "block_none"
-        },
+        glm.SafetySetting(category=category, threshold=glm.SafetySetting.HarmBlockThreshold.BLOCK_NONE)
+        for category in (
+            glm.HarmCategory.HARM_CATEGORY_HARASSMENT,
+            glm.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+            glm.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+            glm.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+        )
     ]
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.gemini_model = genai.GenerativeModel(self.model_name, safety_settings=self.SAFETY_SETTINGS)
+        self.key_quota: dict[str, dict] = {}  # Rate limits seen per key, from the error details
+        self._clients: dict[str, GenerativeServiceAsyncClient] = {}
+        self._clients_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        
+    def get_client(self, api_key: str) -> GenerativeServiceAsyncClient:
+        """
+        Return the client bound to `api_key`, building it on first use.
+        
+        Every key has its own client instead of the process-global one set
+        by `genai.configure()`, so concurrent requests never race on which
+        key is active. The clients are gRPC channels tied to the running
+        event loop, so they are rebuilt when the loop changes.
+        """
+        loop = asyncio.get_running_loop()
+        
+        if self._clients_loop is not loop:
+            self._clients = {}
+            self._clients_loop = loop
+        
+        if (client := self._clients.get(api_key)) is None:
+            client = self._clients[api_key] = GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+            
+        return client
     
-    async def request_api(self, prompt) -> str:
-        genai.configure(api_key=await self.api_key_manager.get_available_api_key())
+    
+    def note_quota(self, api_key: str, error: exceptions.TooManyRequests) -> Optional[float]:
+        """
+        Record a rate limit of `api_key` from the `RetryInfo` and
+        `QuotaFailure` details of `error`. Returns the retry delay, if any.
+        """
+        quota = self.key_quota.setdefault(api_key, {"rate_limited": 0, "retry_after": None, "limited_until": None, "violations": {}})
+        quota["rate_limited"] += 1
+        retry_after = None
         
-        try:
-            response = await self.gemini_model.generate_content_async(
-                prompt,
-                generation_config=self.GENERATION_CONFIG
-            )
-        
-        except exceptions.TooManyRequests as e:
-            for detail in e.details:
-                if isinstance(detail, RetryInfo):
-                    retry_delay = detail.retry_delay.seconds
-                    await self.api_key_manager.update_retry_delay(retry_delay)
+        for detail in error.details or []:
+            if isinstance(detail, RetryInfo):
+                retry_after = detail.retry_delay.seconds + detail.retry_delay.nanos / 1e9
+                
+            elif isinstance(detail, QuotaFailure):
+                for violation in detail.violations:
+                    name = violation.quota_id or violation.quota_metric or violation.subject or "unknown"
+                    quota["violations"][name] = quota["violations"].get(name, 0) + 1
                     
-            raise RateLimitError("Rate limit exceeded")
+        quota["retry_after"] = retry_after
+        quota["limited_until"] = time.time() + retry_after if retry_after is not None else None
+        
+        return retry_after
+    
+    
+    async def request_api(self, prompt) -> str:
+        async with self.api_key_manager.lease() as api_key:
+            try:
+                response = await self.get_client(api_key).generate_content(glm.GenerateContentRequest(
+                    model=f"models/{self.model_name}",
+                    contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+                    generation_config=self.GENERATION_CONFIG,
+                    safety_settings=self.SAFETY_SETTINGS,
+                ))
+            
+            except exceptions.TooManyRequests as e:
+                retry_after = self.note_quota(api_key, e)
+                raise RateLimitError("Rate limit exceeded", retry_after=retry_after, key=api_key)
+            
+            except (exceptions.Unauthenticated, exceptions.PermissionDenied) as e:
+                self.api_key_manager.quarantine(api_key, f"Gemini rejected the key: {e}")
+                raise KeyRejectedError(f"Gemini rejected the key: {e}")
+            
+            except exceptions.GoogleAPICallError as e:
+                log.error(f"Gemini API call error: {e}", exc_info=True)
+                raise APIError(f"Gemini API call error: {e}")
         
-        except exceptions.GoogleAPICallError as e:
-            log.error(f"Gemini API call error: {e}", exc_info=True)
-            raise APIError(f"Gemini API call error: {e}")
+        if not response.candidates:
+            raise GenerationError(f"Gemini returned no candidates: {response.prompt_feedback}", reason="bad_response")
         
-        return self.trim_empty_lines(response.text)
+        return self.trim_empty_lines("".join(part.text for part in response.candidates[0].content.parts))
+    
+    
+    async def close(self) -> None:
+        """Close the per-key gRPC clients."""
+        
+        await super().close()
+        
+        if self._clients_loop is asyncio.get_running_loop():
+            for client in self._clients.values():
+                await client.transport.close()
+            
+        self._clients = {}
+        self._clients_loop = None
     
 
 class MistralEnglishHelper(EnglishHelper):
+    PROVIDER = "mistral"
     API_URL = "https://api.mistral.ai/v1/chat/completions"
 
     async def request_api(self, prompt) -> str:
-        api_key = await self.api_key_manager.get_available_api_key()
-        payload = {
-            "model": self.model_name or "mistral-small-latest",
-            "messages": [{"role": "user", "content": prompt}],
-        }
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.API_URL, headers=headers, json=payload) as resp:
-                if resp.status == 429:
-                    raise RateLimitError("Rate limit exceeded")
-                elif resp.status == 401:
-                    log.error("Unauthorized: Invalid API key")
-                    raise APIError("Unauthorized: Invalid API key")
-                elif resp.status != 200:
-                    error_text = await resp.text()
-                    log.error(f"Mistral API error: status={resp.status}, body={error_text}")
-                    raise GenerationError(f"Mistral API error: {resp.status} - {error_text}")
-
-                data = await resp.json()
-                try:
-                    return data["choices"][0]["message"]["content"]
-                except (KeyError, IndexError):
-                    log.debug(f"Unexpected response: {json.dumps(data, ensure_ascii=False)}")
-                    raise GenerationError("Unexpected response format")
\ No newline at end of file
+        async with self.api_key_manager.lease() as api_key:
+            payload = {
+                "model": self.model_name or "mistral-small-latest",
+                "messages": [{"role": "user", "content": prompt}],
+            }
+            headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+            }
+
+            session = await self.get_session()
+
+            try:
+                async with session.post(self.API_URL, headers=headers, json=payload) as resp:
+                    if resp.status == 429:
+                        raise RateLimitError("Rate limit exceeded", retry_after=parse_retry_after(resp.headers), key=api_key)
+                    elif resp.status == 401:
+                        self.api_key_manager.quarantine(api_key, "Unauthorized: Invalid API key")
+                        raise KeyRejectedError("Unauthorized: Invalid API key")
+                    elif resp.status != 200:
+                        error_text = await resp.text()
+                        log.error(f"Mistral API error: status={resp.status}, body={error_text}")
+                        raise GenerationError(f"Mistral API error: {resp.status} - {error_text}", reason="http_error")
+
+                    data = await resp.json()
+                    try:
+                        return data["choices"][0]["message"]["content"]
+                    except (KeyError, IndexError):
+                        log.debug(f"Unexpected response: {json.dumps(data, ensure_ascii=False)}")
+                        raise GenerationError("Unexpected response format", reason="bad_response")
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise GenerationError(f"Mistral API connection error: {e!r}", reason="connection_error")
+
+
+class LocalEnglishHelper(GroqEnglishHelper):
+    """
+    A stand-in provider speaking the same chat-completions shape as Groq,
+    served by `flask local-llm` (see `local_llm.py`). Used for load tests.
+    """
+    PROVIDER = "local"
+    API_URL = API_LOCAL_URL
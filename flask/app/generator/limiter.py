@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+log = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    An AIMD concurrency limit for the calls to one provider.
+
+    Every successful call raises the limit by `increase / limit`, i.e. by
+    about `increase` per round of calls, and a rate limit or a timeout cuts
+    it to `limit * decrease`. Only calls that started after the last cut can
+    cut it again, so a burst of 429s from calls that were already in flight
+    counts once. The limit stays between `min_limit` and `max_limit`, and
+    every change of its integer part is kept in `history`.
+
+    Coroutines over the limit wait on a future, like `ApiKeyManager`: a
+    release or a raised limit wakes as many waiters as there are free slots.
+    """
+
+    def __init__(self, initial: float = 2, min_limit: float = 1, max_limit: float = 32,
+                 increase: float = 1.0, decrease: float = 0.5, history: int = 200):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.history: deque[dict] = deque(maxlen=history)
+        self.stats = {"successes": 0, "overloads": 0, "cuts": 0}
+
+        self._started = 0  # Calls started so far, numbering the tickets
+        self._cut_at = 0  # Ticket count at the last cut
+        self._waiters: deque[asyncio.Future] = deque()
+        self._record("initial")
+
+
+    def _record(self, reason: str) -> None:
+        self.history.append({"at": round(time.time(), 3), "limit": int(self.limit), "reason": reason})
+
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+    async def acquire(self) -> int:
+        """Wait for a slot. Returns the call's ticket for `overload()`."""
+
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken but cancelled before taking the slot: pass it on.
+                    self._wake()
+                raise
+
+        self.in_flight += 1
+        self._started += 1
+
+        return self._started
+
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[int]:
+        ticket = await self.acquire()
+
+        try:
+            yield ticket
+        finally:
+            self.release()
+
+
+    def success(self) -> None:
+        before = int(self.limit)
+        self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+        self.stats["successes"] += 1
+
+        if int(self.limit) != before:
+            self._record("increase")
+            self._wake()
+
+
+    def overload(self, ticket: int, reason: str = "rate_limited") -> None:
+        """Cut the limit after a rate limit or a timeout of the call with `ticket`."""
+
+        self.stats["overloads"] += 1
+
+        if ticket <= self._cut_at:
+            return
+
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+        self._cut_at = self._started
+        self.stats["cuts"] += 1
+        self._record(reason)
+        log.debug(f"Concurrency limit cut to {int(self.limit)} ({reason})")
+
+
+    def to_dict(self, history: int = 50) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": sum(not waiter.done() for waiter in self._waiters),
+            **self.stats,
+            "history": list(self.history)[-history:],
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import random
+import re
+from typing import Optional
+
+from aiohttp import web
+
+
+log = logging.getLogger(__name__)
+
+SINGLE_PHRASE = re.compile(r"must use `(?P<phrase>[^`]*)`")
+CANDIDATES = re.compile(r"Make \*(?P<count>\d+)\* different")
+BATCH_PHRASES = re.compile(r"uses the phrase: (?P<phrases>\[.*?\])\. ", re.DOTALL)
+
+TEMPLATES = [
+    "We talked about the word {} in class today. | 我們今天在課堂上談到了這個字。",
+    "My teacher used {} in a short story. | 我的老師在一個短篇故事裡用了這個字。",
+    "Can you use {} in a sentence? | 你能用這個字造一個句子嗎？",
+]
+
+
+class LocalLLM:
+    """
+    A stand-in LLM served over HTTP with the OpenAI-style chat-completions
+    shape used by Groq and Mistral, so the generator can be load-tested
+    without the network or real keys.
+
+    Every request waits `latency` seconds (± `jitter`), then is answered
+    with a 429 with probability `rate_limit_rate`, with unusable text with
+    probability `malformed_rate`, or with a valid sentence. With a
+    `capacity`, requests over that many at once get a 429 straight away,
+    like a provider's concurrency limit.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, rate_limit_rate: float = 0.0,
+                 malformed_rate: float = 0.0, retry_after: float = 1.0, seed: Optional[int] = None,
+                 capacity: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.capacity = capacity
+        self.in_flight = 0
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "malformed": 0, "phrases": 0, "peak_in_flight": 0}
+
+        self._runner: Optional[web.AppRunner] = None
+
+
+    @staticmethod
+    def phrases(prompt: str) -> Optional[list[str]]:
+        """The phrases of a batched prompt, or `None` for a single-phrase prompt."""
+
+        if (match := BATCH_PHRASES.search(prompt)) is not None:
+            return json.loads(match["phrases"])
+
+        return None
+
+
+    def sentence_count(self, prompt: str) -> int:
+        """The number of sentences `prompt` asks for."""
+
+        if (phrases := self.phrases(prompt)) is not None:
+            return len(phrases)
+
+        if (match := CANDIDATES.search(prompt)) is not None:
+            return int(match["count"])
+
+        return 1
+
+
+    def answer(self, prompt: str) -> str:
+        if (phrases := self.phrases(prompt)) is not None:
+            return json.dumps([
+                {"phrase": phrase, "sentence": self.random.choice(TEMPLATES).format(phrase)}
+                for phrase in phrases
+            ], ensure_ascii=False)
+
+        phrase = match["phrase"] if (match := SINGLE_PHRASE.search(prompt)) is not None else "word"
+
+        if (match := CANDIDATES.search(prompt)) is not None:
+            count = int(match["count"])
+            return "\n".join(TEMPLATES[i % len(TEMPLATES)].format(phrase) for i in range(count))
+
+        return self.random.choice(TEMPLATES).format(phrase)
+
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+
+        if self.capacity is not None and self.in_flight >= self.capacity:
+            return self.rate_limited()
+
+        self.in_flight += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+
+        try:
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        finally:
+            self.in_flight -= 1
+
+        if self.random.random() < self.rate_limit_rate:
+            return self.rate_limited()
+
+        self.stats["phrases"] += self.sentence_count(prompt)
+
+        if self.random.random() < self.malformed_rate:
+            self.stats["malformed"] += 1
+            content = "Sorry, I cannot help with that."
+        else:
+            self.stats["ok"] += 1
+            content = self.answer(prompt)
+
+        return web.json_response({
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        })
+
+
+    def rate_limited(self) -> web.Response:
+        self.stats["rate_limited"] += 1
+        return web.json_response(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+            status=429, headers={"retry-after": str(self.retry_after)},
+        )
+
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        return app
+
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on the running loop. Returns the chat-completions URL."""
+
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        port = self._runner.addresses[0][1]
+        log.info(f"Local LLM listening on {host}:{port}")
+
+        return f"http://{host}:{port}/v1/chat/completions"
+
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
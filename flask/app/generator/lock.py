@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from ..models.generator_state import GeneratorState
+
+
+log = logging.getLogger(__name__)
+
+
+class GeneratorLock:
+    """
+    A lease stored in the `generator_state` table, so that only one
+    generator runs at a time across processes, containers and hosts.
+
+    The holder refreshes its heartbeat every `ttl / 3` seconds; a lease
+    whose heartbeat is older than `ttl` seconds may be taken over.
+    """
+
+    def __init__(self, engine: Engine, ttl: int, name: str = "lock"):
+        self.engine = engine
+        self.ttl = ttl
+        self.name = name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free, stale or already ours."""
+
+        now = datetime.now()
+
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(GeneratorState).values(name=self.name, owner=self.owner, heartbeat_at=now))
+            self.held = True
+
+        except IntegrityError:
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    update(GeneratorState)
+                    .where(GeneratorState.name == self.name)
+                    .where(or_(
+                        GeneratorState.owner == self.owner,
+                        GeneratorState.owner.is_(None),
+                        GeneratorState.heartbeat_at < now - timedelta(seconds=self.ttl),
+                    ))
+                    .values(owner=self.owner, heartbeat_at=now)
+                )
+            self.held = result.rowcount == 1
+
+        if self.held:
+            log.info(f"Generator lock acquired by {self.owner}")
+
+        return self.held
+
+
+    def refresh(self) -> bool:
+        """Renew the heartbeat. Returns `False` if the lease was lost."""
+
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(GeneratorState)
+                .where(GeneratorState.name == self.name, GeneratorState.owner == self.owner)
+                .values(heartbeat_at=datetime.now())
+            )
+
+        self.held = result.rowcount == 1
+        return self.held
+
+
+    def release(self) -> None:
+        if not self.held:
+            return
+
+        with self.engine.begin() as conn:
+            conn.execute(delete(GeneratorState).where(GeneratorState.name == self.name, GeneratorState.owner == self.owner))
+
+        self.held = False
+        log.info(f"Generator lock released by {self.owner}")
+
+
+    async def keep_alive(self) -> None:
+        """Refresh the lease until it is lost; returns only when it is."""
+
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+
+            if not self.refresh():
+                log.error(f"Generator lock lost by {self.owner}")
+                return
@@ -0,0 +1,193 @@
+import logging
+from functools import lru_cache
+
+
+log = logging.getLogger(__name__)
+
+PUNCTUATION = ".,!?;:\"'()[]“”‘’。，！？；：「」"
+
+# Similarities below this are not computed exactly; `check()` rejects them anyway.
+MIN_SIMILARITY = 0.5
+
+# An inflected form of the target scores just below the exact form.
+INFLECTION_SCORE = 0.95
+
+# Suffixes stripped by `stem()`, longest first, with what replaces them.
+SUFFIXES = [
+    ("ies", "y"),
+    ("ied", "y"),
+    ("ing", ""),
+    ("es", ""),
+    ("ed", ""),
+    ("'s", ""),
+    ("s", ""),
+]
+
+VOWELS = set("aeiou")
+
+
+def clean(word: str) -> str:
+    return word.strip(PUNCTUATION)
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Reduce a word to a rough stem, so that regular inflections of a word
+    share its stem: "abandoned" and "abandons" -> "abandon", "making" and
+    "make" -> "mak", "stopped" -> "stop", "studies" and "study" -> "study".
+
+    This is not a real lemmatizer; it only has to map the forms an LLM uses
+    in a test sentence onto the same key as the word being tested.
+    """
+
+    word = word.lower()
+
+    for suffix, replacement in SUFFIXES:
+        if len(word) - len(suffix) >= 3 and word.endswith(suffix) and not word.endswith("ss"):
+            word = word[:-len(suffix)] + replacement
+            break
+
+    # "make" -> "mak", "agree" and "agreed" -> "agr".
+    while len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+
+    # "stopp" -> "stop", "planned" -> "plan", but keep "ll"/"ss" roots like "fill".
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in VOWELS and word[-1] not in "ls":
+        word = word[:-1]
+
+    return word
+
+
+def bounded_distance(a: str, b: str, bound: int) -> int:
+    """
+    Levenshtein distance between `a` and `b`, or `bound + 1` as soon as it
+    is known to be larger than `bound`. Only a band of `2 * bound + 1`
+    cells around the diagonal is computed.
+    """
+
+    if a == b:
+        return 0
+
+    if len(a) > len(b):
+        a, b = b, a
+
+    if len(b) - len(a) > bound:
+        return bound + 1
+
+    too_far = bound + 1
+    previous = list(range(len(b) + 1))
+
+    for i in range(1, len(a) + 1):
+        low = max(1, i - bound)
+        high = min(len(b), i + bound)
+
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= bound else too_far
+        row_min = current[0]
+
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            cost = min(cost, previous[j] + 1, current[j - 1] + 1)
+            current[j] = cost if cost <= bound else too_far
+
+            if cost < row_min:
+                row_min = cost
+
+        if row_min > bound:
+            return too_far
+
+        previous = current
+
+    return previous[len(b)]
+
+
+def similarity(a: str, b: str, min_similarity: float = MIN_SIMILARITY) -> float:
+    """
+    Case-insensitive edit similarity in [0, 1].
+
+    Pairs that cannot reach `min_similarity` return 0.0 without computing
+    the full distance.
+    """
+
+    a, b = a.lower(), b.lower()
+    longest = max(len(a), len(b))
+
+    if longest == 0:
+        return 1.0
+
+    bound = int(longest * (1 - min_similarity))
+    distance = bounded_distance(a, b, bound)
+
+    if distance > bound:
+        return 0.0
+
+    return 1 - distance / longest
+
+
+def word_score(word: str, target: str, target_stem: str, min_similarity: float = MIN_SIMILARITY) -> float:
+    if word.lower() == target.lower():
+        return 1.0
+
+    if stem(word) == target_stem:
+        return INFLECTION_SCORE
+
+    return similarity(word, target, min_similarity)
+
+
+def best_match(text: str, target_phrase: str) -> tuple[str, float, list[int]]:
+    """
+    Find where `target_phrase` (or an inflected form of it) appears in `text`.
+
+    Every window of as many words as the phrase is scored word by word:
+    1.0 for the exact word, `INFLECTION_SCORE` for the same stem, else the
+    edit similarity. The window score is the mean of its word scores.
+
+    Parameters
+    ----------
+    text: :type:`str`
+        The sentence to search.
+    target_phrase: :type:`str`
+        The word or phrase to find.
+
+    Returns
+    -------
+    :type:`tuple[str, float, list[int]]`
+        The matching words without punctuation, the score, and the indexes
+        of the matching words in `text.split()`.
+    """
+
+    words = [clean(word) for word in text.split()]
+    targets = target_phrase.split()
+    target_stems = [stem(target) for target in targets]
+    size = len(targets)
+
+    best_phrase = ""
+    best_score = 0.0
+    best_positions: list[int] = []
+
+    if size == 0:
+        return best_phrase, best_score, best_positions
+
+    scores = [
+        [word_score(word, target, target_stem) for target, target_stem in zip(targets, target_stems)]
+        for word in words
+    ] if size > 1 else None
+
+    for i in range(len(words) - size + 1):
+        if size == 1:
+            # Only a better word matters, which narrows the distance bound.
+            score = word_score(words[i], targets[0], target_stems[0], max(MIN_SIMILARITY, best_score))
+        else:
+            score = sum(scores[i + k][k] for k in range(size)) / size
+
+        if score > best_score:
+            best_score = score
+            best_phrase = " ".join(words[i:i + size])
+            best_positions = list(range(i, i + size))
+
+            if score == 1.0:
+                break
+
+    return best_phrase, best_score, best_positions
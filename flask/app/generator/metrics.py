@@ -0,0 +1,197 @@
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from ..config import DATETIME_FORMAT
+from ..models.generator_state import GeneratorState
+
+if TYPE_CHECKING:
+    from .api_key_manager import ApiKeyManager
+    from .limiter import AdaptiveLimiter
+
+
+log = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, in seconds.
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+class Histogram:
+    """A fixed-bucket histogram, cheap enough to update on every call."""
+
+    def __init__(self, buckets: list[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The upper bound of the bucket holding the `q` quantile (the maximum past the last bucket)."""
+
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return self.max
+
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {
+                f"le_{bound}": count for bound, count in zip(self.buckets + ["inf"], self.counts)
+            },
+        }
+
+
+class GeneratorMetrics:
+    """
+    Counters and latency histograms of the questions generator.
+
+    Everything is counted per provider: API calls by outcome, call latency,
+    generated sentences by outcome, rejections by `GenerationError.reason`,
+    and rate limits per API key. The generator process publishes snapshots
+    to the `generator_state` table, where the admin API reads them.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.calls: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.latency: dict[str, Histogram] = defaultdict(Histogram)
+        self.sentences: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.rejections: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.key_rate_limits: dict[str, int] = defaultdict(int)
+        self.last_pass: Optional[dict] = None
+
+
+    def call(self, provider: str, outcome: str, seconds: Optional[float] = None) -> None:
+        """Count an API call: `outcome` is "ok", "cached" or an error reason."""
+
+        self.calls[provider][outcome] += 1
+
+        if seconds is not None:
+            self.latency[provider].observe(seconds)
+
+
+    def rate_limited(self, key: Optional[str]) -> None:
+        if key is not None:
+            self.key_rate_limits[key] += 1
+
+
+    def accepted(self, provider: str) -> None:
+        self.sentences[provider]["accepted"] += 1
+
+
+    def rejected(self, provider: str, reason: str) -> None:
+        self.sentences[provider]["rejected"] += 1
+        self.rejections[provider][reason] += 1
+
+
+    def snapshot(self, api_key_managers: Iterable["ApiKeyManager"] = (), limiters: Mapping[str, "AdaptiveLimiter"] = {}) -> dict:
+        """
+        A JSON-serializable view of the metrics, with the usage of the keys of
+        `api_key_managers` and the concurrency limits of the providers.
+        """
+
+        api_key_managers = list(api_key_managers)
+
+        providers = {}
+
+        for provider in sorted(set(self.calls) | set(self.sentences)):
+            accepted = self.sentences[provider]["accepted"]
+            rejected = self.sentences[provider]["rejected"]
+
+            providers[provider] = {
+                "calls": dict(self.calls[provider]),
+                "latency": self.latency[provider].to_dict(),
+                "sentences": {"accepted": accepted, "rejected": rejected},
+                "accept_rate": accepted / (accepted + rejected) if accepted + rejected else None,
+                "rejections": dict(self.rejections[provider]),
+            }
+
+        return {
+            "started_at": self.started_at.strftime(DATETIME_FORMAT),
+            "providers": providers,
+            "keys": {label: usage for manager in api_key_managers for label, usage in self.key_usage(manager).items()},
+            "key_waits": {
+                name: sum(manager.acquire_waits[name] for manager in api_key_managers) for name in ("count", "seconds")
+            },
+            "limits": {provider: limiter.to_dict() for provider, limiter in limiters.items()},
+            "last_pass": self.last_pass,
+        }
+
+
+    def key_usage(self, manager: "ApiKeyManager") -> dict[str, dict]:
+        usage = {}
+
+        for key in list(manager.in_flight):
+            usage[f"...{key[-4:]}"] = {
+                "requests": manager.uses.get(key, 0),
+                "in_flight": manager.in_flight.get(key, 0),
+                "rate_limited": self.key_rate_limits.get(key, 0),
+                "cooldowns": manager.waits[key]["count"],
+                "cooldown_seconds": round(manager.waits[key]["seconds"], 3),
+                "quarantined": manager.quarantined.get(key),
+            }
+
+        return usage
+
+
+    def save(self, session_factory: sessionmaker, api_key_managers: Iterable["ApiKeyManager"] = (),
+             limiters: Mapping[str, "AdaptiveLimiter"] = {}) -> None:
+        """Publish a snapshot to the `metrics` row of the `generator_state` table."""
+
+        payload = self.snapshot(api_key_managers, limiters)
+
+        with session_factory() as session, session.begin():
+            result = session.execute(
+                update(GeneratorState).where(GeneratorState.name == "metrics")
+                .values(payload=payload, heartbeat_at=datetime.now())
+            )
+
+            if result.rowcount == 0:
+                session.add(GeneratorState("metrics", payload=payload))
+
+        log.debug("Generator metrics published")
+
+
+    def publish(self, session_factory: sessionmaker, api_key_managers: Iterable["ApiKeyManager"] = (),
+                limiters: Mapping[str, "AdaptiveLimiter"] = {}) -> None:
+        """`save()` that only logs failures, for use from the generation loop."""
+
+        try:
+            self.save(session_factory, api_key_managers, limiters)
+        except IntegrityError:
+            # Another process created the row first; the next publish updates it.
+            pass
+        except Exception as e:
+            log.error(f"Failed to publish generator metrics: {e}")
+
+
+metrics = GeneratorMetrics()
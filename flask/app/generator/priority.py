@@ -0,0 +1,252 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..config import API_PRIORITY, MAX_SENTENCES_PER_WORD
+from ..models.generation_queue import GenerationQueue
+from ..models.lexemes import Lexemes
+from ..models.libraries import Libraries
+from ..models.library_usage import LibraryUsage
+from ..models.users import Users
+from ..models.words import Words
+from .sweep import chunks, sentence_counts
+
+
+log = logging.getLogger(__name__)
+
+
+def library_scores(session: Session, now: datetime) -> dict[int, float]:
+    """
+    Score every library by how much it is used.
+
+    A library scores for every user that has it selected, for recent
+    selections and tests (halving every `usage_half_life_days`) and for
+    having been edited within `recent_edit_days`.
+
+    Parameters
+    ----------
+    session: :class:`Session`
+        The session used for reading.
+    now: :class:`datetime`
+        The reference time for decay and recency.
+
+    Returns
+    -------
+    :type:`dict[int, float]`
+        The score of each library, by library ID.
+    """
+
+    scores: dict[int, float] = defaultdict(float)
+
+    selected = (
+        session.query(Libraries.id, func.count(Users.id))
+        .join(Users, Users.current_library == Libraries.name)
+        .group_by(Libraries.id)
+        .all()
+    )
+    for library_id, count in selected:
+        scores[library_id] += API_PRIORITY["selected_weight"] * count
+
+    half_life = timedelta(days=API_PRIORITY["usage_half_life_days"])
+    for usage in session.query(LibraryUsage).all():
+        decay = 0.5 ** ((now - usage.last_used_at) / half_life)
+        scores[usage.library_id] += API_PRIORITY["usage_weight"] * usage.hits * decay
+
+    recent = now - timedelta(days=API_PRIORITY["recent_edit_days"])
+    for (library_id,) in session.query(Libraries.id).filter(Libraries.updated_at >= recent).all():
+        scores[library_id] += API_PRIORITY["recent_edit_weight"]
+
+    return scores
+
+
+def merging_insert(session: Session, requeue: bool):
+    """
+    An insert into the generation queue that merges into the existing rows
+    of its words, keeping the higher boost and priority, for the web
+    requests and the generator that write the queue concurrently. With
+    `requeue`, the existing rows also take the new `created_at`. `None` if
+    the database has no `ON CONFLICT` clause.
+    """
+
+    dialect = session.get_bind().dialect.name
+
+    if dialect not in ("postgresql", "sqlite"):
+        return None
+
+    greatest = func.greatest if dialect == "postgresql" else func.max
+    statement = (postgresql if dialect == "postgresql" else sqlite).insert(GenerationQueue)
+    merged = {
+        "boost": greatest(GenerationQueue.boost, statement.excluded.boost),
+        "priority": greatest(GenerationQueue.priority, statement.excluded.priority),
+        "updated_at": statement.excluded.updated_at,
+    }
+
+    if requeue:
+        merged["created_at"] = statement.excluded.created_at
+
+    return statement.on_conflict_do_update(index_elements=["word_english"], set_=merged)
+
+
+def prioritize(session: Session, deficits: list[tuple[Words, int]], max_sentences: int = MAX_SENTENCES_PER_WORD) -> list[tuple[Words, int]]:
+    """
+    Order the words that need sentences by priority and persist the queue.
+
+    A word's priority is the sum of the scores of the libraries containing
+    it, plus a bonus for missing sentences, plus the boost stored in its
+    `GenerationQueue` row. The queue table is rewritten in one transaction
+    so the order survives restarts (see `stored_order()`).
+
+    Parameters
+    ----------
+    session: :class:`Session`
+        The generator's session.
+    deficits: :type:`list[tuple[Words, int]]`
+        The words that need sentences, as returned by `word_deficits()`.
+    max_sentences: :type:`int`
+        The number of sentences a word should have.
+
+    Returns
+    -------
+    :type:`list[tuple[Words, int]]`
+        The same words, highest priority first.
+    """
+
+    now = datetime.now()
+    scores = library_scores(session, now)
+
+    libraries_by_word: dict[str, set[int]] = defaultdict(set)
+    for english, library_id in session.query(Words.english, Words._library_id).filter(Words._library_id.isnot(None)).all():
+        libraries_by_word[english].add(library_id)
+
+    queued = {
+        english: (boost, created_at)
+        for english, boost, created_at in session.query(GenerationQueue.word_english, GenerationQueue.boost, GenerationQueue.created_at).all()
+    }
+    boosts: dict[str, float] = {english: boost for english, (boost, _) in queued.items()}
+    priorities: dict[str, float] = {}
+
+    for word, deficit in deficits:
+        priorities[word.english] = (
+            sum(scores.get(library_id, 0.0) for library_id in libraries_by_word[word.english])
+            + API_PRIORITY["deficit_weight"] * deficit / max_sentences
+            + boosts.get(word.english, 0.0)
+        )
+
+    session.execute(delete(GenerationQueue))
+
+    if priorities:
+        # Words queued by a request since the delete keep their row, merged with this one.
+        statement = merging_insert(session, requeue=False)
+        session.execute(insert(GenerationQueue) if statement is None else statement, [{
+            "word_english": english,
+            "priority": priority,
+            "boost": boosts.get(english, 0.0),
+            # Kept from the existing row: it is when `enqueue()` asked for the word.
+            "created_at": queued[english][1] if english in queued else now,
+            "updated_at": now,
+        } for english, priority in priorities.items()])
+
+    session.commit()
+    log.debug(f"Generation queue rebuilt with {len(priorities)} words")
+
+    return sorted(deficits, key=lambda item: priorities[item[0].english], reverse=True)
+
+
+def stored_order(session: Session, deficits: list[tuple[Words, int]]) -> list[tuple[Words, int]]:
+    """
+    Order the words of a targeted pass (an incremental sweep, the fast path
+    or a pass resumed after a restart) by the priority `prioritize()` stored
+    in the queue, without rebuilding it. Words that are not queued go last,
+    in their given order.
+    """
+
+    priorities: dict[str, float] = {}
+    for chunk in chunks({word.english for word, _ in deficits}):
+        priorities.update(
+            session.query(GenerationQueue.word_english, GenerationQueue.priority)
+            .filter(GenerationQueue.word_english.in_(chunk))
+            .all()
+        )
+
+    return sorted(deficits, key=lambda item: priorities.get(item[0].english, float("-inf")), reverse=True)
+
+
+def enqueue(session: Session, words: Iterable[str], boost: float = API_PRIORITY["new_word_boost"]) -> None:
+    """
+    Ask the generator for sentences for `words` as soon as possible.
+
+    The words are put in the queue with `boost` (existing rows keep the
+    higher of the two) and a fresh `created_at`. The generator's fast path
+    polls for boosted rows, and the pass that handles them clears the boost.
+    The caller commits, so the words are queued in the same transaction that
+    adds them.
+
+    Parameters
+    ----------
+    session: :class:`Session`
+        The session adding the words.
+    words: :type:`Iterable[str]`
+        The english words, e.g. the ones just added to a library.
+    boost: :type:`float`
+        The priority boost of the words.
+    """
+
+    now = datetime.now()
+    words = set(words)
+
+    if not words:
+        return
+
+    if (statement := merging_insert(session, requeue=True)) is not None:
+        session.execute(statement, [
+            {"word_english": english, "priority": boost, "boost": boost, "created_at": now, "updated_at": now} for english in words
+        ])
+
+    else:
+        existing: dict[str, GenerationQueue] = {}
+        for chunk in chunks(words):
+            existing.update((row.word_english, row) for row in session.query(GenerationQueue).filter(GenerationQueue.word_english.in_(chunk)))
+
+        for english in words:
+            if (row := existing.get(english)) is not None:
+                row.boost = max(row.boost, boost)
+                row.priority = max(row.priority, boost)
+                row.created_at = now
+            else:
+                row = GenerationQueue(english, priority=boost, boost=boost)
+                row.created_at = now
+                session.add(row)
+
+    log.debug(f"Enqueued {len(words)} words for generation")
+
+
+def dequeue(session: Session, words: list[str], max_sentences: int = MAX_SENTENCES_PER_WORD) -> None:
+    """
+    Settle the queue after a pass over `words`: words that have all their
+    sentences leave the queue, the others stay for the next sweep without
+    their boost, so it is not applied again.
+    """
+
+    if not words:
+        return
+
+    counts = sentence_counts(session, words)
+    done = [english for english in words if counts.get(Lexemes.normalize(english), 0) >= max_sentences]
+    left = [english for english in words if counts.get(Lexemes.normalize(english), 0) < max_sentences]
+
+    for chunk in chunks(done):
+        session.execute(delete(GenerationQueue).where(GenerationQueue.word_english.in_(chunk)))
+
+    for chunk in chunks(left):
+        session.execute(
+            update(GenerationQueue)
+            .where(GenerationQueue.word_english.in_(chunk), GenerationQueue.boost != 0)
+            .values(boost=0.0)
+        )
+
+    session.commit()
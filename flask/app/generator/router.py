@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from .english_helper import APIError, EnglishHelper
+
+
+log = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """
+    Recent behaviour of one provider: exponentially weighted request
+    latency and error rate (errors include 429s), plus the latencies of
+    the last `window` questions for the hedging threshold.
+    """
+
+    def __init__(self, latency_alpha: float, error_alpha: float, window: int):
+        self.latency_alpha = latency_alpha
+        self.error_alpha = error_alpha
+        self.latency = 1.0  # Seconds; an optimistic guess until measured
+        self.error_rate = 0.0
+        self.question_latencies: deque[float] = deque(maxlen=window)
+
+
+    def observe_call(self, outcome: str, seconds: float) -> None:
+        failed = outcome != "ok"
+        self.error_rate += self.error_alpha * (failed - self.error_rate)
+
+        if not failed:
+            self.latency += self.latency_alpha * (seconds - self.latency)
+
+
+    def observe_question(self, seconds: float) -> None:
+        self.question_latencies.append(seconds)
+
+
+    def p95(self) -> Optional[float]:
+        if not self.question_latencies:
+            return None
+
+        ordered = sorted(self.question_latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+    @property
+    def weight(self) -> float:
+        """Roughly the share of useful answers per second this provider gives."""
+        return (1 - self.error_rate) ** 2 / max(self.latency, 0.01)
+
+
+class ProviderRouter:
+    """
+    Spread questions over several providers, each with its own helper.
+
+    A provider is picked at random, weighted by `ProviderStats.weight`, so
+    fast and healthy providers get most of the traffic while slow or
+    throttled ones get less until they recover. With `hedge` enabled, a
+    question that takes longer than its provider's p95 (or `hedge_delay`
+    seconds before enough samples exist) is also sent to a second
+    provider, and the first good answer wins.
+
+    It has the same `question()`, `questions()`, `question_set()` and
+    `close()` as an `EnglishHelper`, so `generate()` can use either.
+    """
+
+    def __init__(self, helpers: dict[str, EnglishHelper], *, hedge: bool = False, hedge_delay: float = 5.0,
+                 hedge_min_samples: int = 20, latency_alpha: float = 0.2, error_alpha: float = 0.2, window: int = 200):
+        if not helpers:
+            raise APIError("No providers with API keys to route to")
+
+        self.helpers = helpers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.stats = {provider: ProviderStats(latency_alpha, error_alpha, window) for provider in helpers}
+        self.hedges = {"sent": 0, "won": 0}
+
+        for provider, helper in helpers.items():
+            helper.on_call = self.stats[provider].observe_call
+
+
+    @property
+    def connection_stats(self) -> dict[str, int]:
+        return {
+            name: sum(getattr(helper, "connection_stats", {}).get(name, 0) for helper in self.helpers.values())
+            for name in ("created", "reused")
+        }
+
+
+    def available(self, exclude: Optional[str] = None) -> list[str]:
+        return [
+            provider for provider, helper in self.helpers.items()
+            if provider != exclude and helper.api_key_manager.api_keys
+        ]
+
+
+    def pick(self, exclude: Optional[str] = None) -> Optional[str]:
+        providers = self.available(exclude)
+
+        if not providers:
+            return None
+
+        return random.choices(providers, weights=[self.stats[provider].weight for provider in providers])[0]
+
+
+    def hedge_after(self, provider: str) -> float:
+        stats = self.stats[provider]
+
+        if len(stats.question_latencies) < self.hedge_min_samples:
+            return self.hedge_delay
+
+        return stats.p95()
+
+
+    async def _ask(self, provider: str, call: Callable[[EnglishHelper], Awaitable], useful: Callable[[Any], bool]):
+        start = time.monotonic()
+        result = await call(self.helpers[provider])
+
+        if useful(result):
+            self.stats[provider].observe_question(time.monotonic() - start)
+
+        return result
+
+
+    async def route(self, call: Callable[[EnglishHelper], Awaitable], useful: Callable[[Any], bool]):
+        """
+        Run `call(helper)` on a picked provider, hedged on a second one if
+        enabled. Returns the first useful result, else the last result.
+        """
+
+        primary = self.pick()
+
+        if primary is None:
+            raise APIError("No usable API keys left on any provider")
+
+        first = asyncio.create_task(self._ask(primary, call, useful))
+
+        if not self.hedge or (secondary := self.pick(exclude=primary)) is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after(primary))
+
+        if done:
+            return first.result()
+
+        log.debug(f"Hedging a slow {primary} request with {secondary}")
+        self.hedges["sent"] += 1
+        second = asyncio.create_task(self._ask(secondary, call, useful))
+        pending = {first, second}
+        result = None
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+
+                    result = task.result()
+
+                    if useful(result):
+                        if task is second:
+                            self.hedges["won"] += 1
+                        return result
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if result is None and error is not None:
+            raise error
+
+        return result
+
+
+    async def question(self, phrase: str) -> Optional[dict[str, str]]:
+        return await self.route(lambda helper: helper.question(phrase), lambda result: result is not None)
+
+
+    async def questions(self, phrases: list[str]) -> dict[str, Optional[dict[str, str]]]:
+        # A batch is a useful answer if any phrase got a question.
+        results = await self.route(
+            lambda helper: helper.questions(phrases),
+            lambda result: result is not None and any(question is not None for question in result.values()),
+        )
+
+        return results if results is not None else {phrase: None for phrase in phrases}
+
+
+    async def question_set(self, phrase: str, limit: int) -> Optional[list[dict[str, str]]]:
+        return await self.route(lambda helper: helper.question_set(phrase, limit), bool)
+
+
+    def pop_failure(self, phrase: str) -> Optional[str]:
+        """The failure reason of `phrase` from any provider, cleared from all of them."""
+
+        reasons = [helper.pop_failure(phrase) for helper in self.helpers.values()]
+        return next((reason for reason in reasons if reason is not None), None)
+
+
+    async def close(self) -> None:
+        for helper in self.helpers.values():
+            await helper.close()
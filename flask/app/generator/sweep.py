@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Collection, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import DATETIME_FORMAT, API_FULL_SWEEP_INTERVAL
+from ..models.generation_queue import GenerationQueue
+from ..models.generator_state import GeneratorState
+from ..models.lexemes import Lexemes
+from ..models.sentences import Sentences
+from ..models.words import Words
+
+
+log = logging.getLogger(__name__)
+
+SWEEP_STATE = "sweep"
+
+# Keeps `IN (...)` lists well under the bound-parameter limits of the databases.
+CHUNK_SIZE = 500
+
+
+def chunks(values: Collection) -> list[list]:
+    values = list(values)
+    return [values[i:i + CHUNK_SIZE] for i in range(0, len(values), CHUNK_SIZE)]
+
+
+def sentence_counts(session: Session, words: Optional[Collection[str]] = None) -> dict[str, int]:
+    """
+    The number of sentences of every lexeme, from `GROUP BY` queries.
+
+    Parameters
+    ----------
+    session: :class:`Session`
+        The session used for reading.
+    words: :type:`Optional[Collection[str]]`
+        The english words to count, all of them if `None`.
+
+    Returns
+    -------
+    :type:`dict[str, int]`
+        The counts by lexeme, i.e. by `Lexemes.normalize()`d english word;
+        lexemes without sentences are missing.
+    """
+
+    query = (
+        session.query(Lexemes.english, func.count(Sentences.id))
+        .join(Sentences, Sentences.lexeme_id == Lexemes.id)
+        .group_by(Lexemes.english)
+    )
+
+    if words is None:
+        return dict(query.all())
+
+    counts: dict[str, int] = {}
+
+    for chunk in chunks({Lexemes.normalize(english) for english in words}):
+        counts.update(query.filter(Lexemes.english.in_(chunk)).all())
+
+    return counts
+
+
+def sweep_candidates(session: Session, now: datetime, full: bool = False) -> Optional[set[str]]:
+    """
+    The english words the next sweep has to check.
+
+    An incremental sweep checks the words added since the last sweep (their
+    IDs are past its `last_word_id` marker) and the words still left in the
+    generation queue. Every `full_sweep_interval` seconds, or without a
+    marker, all words are checked instead, which also catches sentences
+    removed behind the generator's back.
+
+    Parameters
+    ----------
+    session: :class:`Session`
+        The session used for reading.
+    now: :class:`datetime`
+        The reference time for the full sweep interval.
+    full: :type:`bool`
+        Check all words regardless of the marker.
+
+    Returns
+    -------
+    :type:`Optional[set[str]]`
+        The words to check, or `None` for all of them.
+    """
+
+    state = session.get(GeneratorState, SWEEP_STATE)
+    payload = state.payload if state is not None and state.payload else None
+
+    if full or payload is None:
+        return None
+
+    full_sweep_at = datetime.strptime(payload["full_sweep_at"], DATETIME_FORMAT)
+    if now - full_sweep_at >= timedelta(seconds=API_FULL_SWEEP_INTERVAL):
+        return None
+
+    added = session.query(Words.english).filter(Words.id > payload["last_word_id"], Words._library_id.isnot(None))
+    queued = session.query(GenerationQueue.word_english)
+
+    return {english for (english,) in added.all()} | {english for (english,) in queued.all()}
+
+
+def mark_swept(session: Session, last_word_id: int, started_at: datetime, full: bool) -> None:
+    """
+    Move the sweep marker to `last_word_id`, the highest word ID that
+    existed when the sweep started.
+    """
+
+    state = session.get(GeneratorState, SWEEP_STATE)
+
+    if state is None:
+        state = GeneratorState(SWEEP_STATE)
+        session.add(state)
+
+    full_sweep_at = started_at.strftime(DATETIME_FORMAT) if full or not state.payload else state.payload["full_sweep_at"]
+    state.payload = {
+        "last_word_id": last_word_id,
+        "full_sweep_at": full_sweep_at,
+        "checked_at": started_at.strftime(DATETIME_FORMAT),
+    }
+    state.heartbeat_at = datetime.now()
+    session.commit()
+
+
+def enqueued(session: Session) -> list[str]:
+    """
+    The words put in the generation queue by `enqueue()` that no pass has
+    handled yet: `dequeue()` clears their boost once one has.
+    """
+
+    rows = session.query(GenerationQueue.word_english).filter(GenerationQueue.boost > 0).all()
+    return [english for (english,) in rows]
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import API_DB_POOL_SIZE, DATABASE_POOL_RECYCLE, MAX_SENTENCES_PER_WORD
+from ..models import db
+from ..models.lexemes import Lexemes
+from ..models.sentences import Sentences
+from ..models.words import Words
+from .dedupe import SimilarityIndex
+from .sweep import chunks
+
+if TYPE_CHECKING:
+    from .checkpoint import PassCheckpoint
+
+
+log = logging.getLogger(__name__)
+
+_engine: Optional[Engine] = None
+
+
+def get_engine() -> Engine:
+    """
+    Get the generator's own engine.
+
+    It points at the same database as the app but has a small pool of its
+    own, so the generator never takes connections from request threads.
+    Must be called inside an app context the first time.
+    """
+
+    global _engine
+
+    if _engine is None or _engine.url != db.engine.url:
+        options = {"pool_recycle": DATABASE_POOL_RECYCLE, "pool_pre_ping": True}
+
+        if db.engine.url.get_backend_name() != "sqlite":
+            options.update(pool_size=API_DB_POOL_SIZE, max_overflow=0)
+
+        _engine = create_engine(db.engine.url, **options)
+        log.debug(f"Generator engine created for {db.engine.url.render_as_string(hide_password=True)}")
+
+    return _engine
+
+
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(bind=get_engine(), autoflush=False, expire_on_commit=False)
+
+
+def lock_lexemes(session: Session, lexeme_ids: list[int]) -> None:
+    """
+    Serialize writers of the same lexemes until the end of the transaction.
+
+    On PostgreSQL this takes an advisory lock per lexeme ID, in sorted order
+    so two writers cannot deadlock. SQLite already allows a single writer at
+    a time, so there is nothing to do.
+    """
+
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            text("SELECT pg_advisory_xact_lock(id) FROM unnest(CAST(:ids AS bigint[])) AS id ORDER BY id"),
+            {"ids": sorted(lexeme_ids)},
+        )
+
+
+class SentenceWriter:
+    """
+    Buffer generated sentences and write them with bulk inserts.
+
+    The buffer is flushed when it holds `batch_size` rows, when its oldest
+    row is `flush_interval` seconds old, or when `flush()` is called, so a
+    pass costs a handful of transactions instead of one per sentence.
+
+    Every flush locks the lexemes of its words, then drops rows that nearly
+    copy a sentence of the same lexeme (see `SimilarityIndex`) and rows
+    past `max_sentences`, so concurrent writers cannot overshoot the cap.
+    Words that differ only in case or surrounding spaces have one lexeme,
+    so they share their sentences and their cap.
+
+    With a `checkpoint`, the words settled with `done()` and `failed()` are
+    marked in the same transaction as their sentences, so a resumed pass
+    never skips a word whose sentences were lost. A word settled with
+    `failed()` counts as done if any of its sentences was written; the
+    sentences it is still missing are left to the next sweep. When a flush
+    fails, a word settled with `done()` whose sentences it lost is left
+    unsettled, and the other words are settled with the next flush.
+    """
+
+    def __init__(self, session_factory: sessionmaker, batch_size: int, flush_interval: float,
+                 max_sentences: int = MAX_SENTENCES_PER_WORD, dedupe: bool = True,
+                 checkpoint: Optional["PassCheckpoint"] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_sentences = max_sentences
+        self.dedupe = dedupe
+        self.checkpoint = checkpoint
+
+        self.rows: list[dict] = []
+        self.written: list[str] = []
+        self.written_words: set[str] = set()
+        self.settled: dict[str, Optional[str]] = {}  # Failure reason by word (`None` if done), for the words settled since the last flush
+        self.failed_words = 0
+        self.write_failures = 0  # Sentences lost to failed transactions
+        self.duplicates = 0
+        self.capped = 0
+        self.transactions = 0
+        self._oldest: Optional[float] = None
+
+
+    def add(self, word: Words, english: str, chinese: str) -> None:
+        if not self.rows:
+            self._oldest = time.monotonic()
+
+        self.rows.append({
+            "chinese": chinese,
+            "english": english,
+            "word_chinese": word.chinese,
+            "word_english": word.english,
+        })
+
+        if len(self.rows) >= self.batch_size or time.monotonic() - self._oldest >= self.flush_interval:
+            self.flush()
+
+
+    def done(self, word: Words) -> None:
+        """Mark `word` finished in the checkpoint with the next flush."""
+
+        if self.checkpoint is not None:
+            self._settle(word, None)
+
+
+    def failed(self, word: Words, reason: str) -> None:
+        """Mark `word` failed with the next flush, unless some of its sentences were written."""
+
+        self._settle(word, reason)
+
+
+    def _settle(self, word: Words, reason: Optional[str]) -> None:
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+        self.settled[word.english] = reason
+
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.rows) or bool(self.settled)
+
+
+    def flush(self) -> None:
+        """Write the buffered rows and checkpoint marks in one transaction."""
+
+        if not self.pending:
+            return
+
+        rows, self.rows = self.rows, []
+        settled, self.settled = self.settled, {}
+        self._oldest = None
+        duplicates = capped = 0
+
+        try:
+            with self.session_factory() as session, session.begin():
+                if rows:
+                    rows, duplicates, capped = self._admit(session, rows)
+
+                if rows:
+                    session.execute(insert(Sentences), rows)
+
+                # The rows of a word are added before it is settled, so they were all admitted by now.
+                admitted = self.written_words | {row["word_english"] for row in rows}
+                failed = {english: reason for english, reason in settled.items() if reason is not None and english not in admitted}
+
+                if self.checkpoint is not None:
+                    for english in settled:
+                        if english in failed:
+                            self.checkpoint.failed(english, failed[english])
+                        else:
+                            self.checkpoint.done(english)
+
+                    self.checkpoint.write(session)
+
+        except SQLAlchemyError as e:
+            # The words keep their deficit, so the next pass retries them.
+            log.error(f"Failed to write {len(rows)} sentences, dropping them... ({e})")
+            self.write_failures += len(rows)
+
+            if self.checkpoint is not None:
+                self.checkpoint.pending.clear()
+
+            # A finished word whose sentences were lost stays unsettled, so a resumed pass generates it again.
+            lost = {row["word_english"] for row in rows}
+            self.settled = {
+                **{english: reason for english, reason in settled.items() if reason is not None or english not in lost},
+                **self.settled,
+            }
+            return
+
+        self.transactions += 1
+        self.duplicates += duplicates
+        self.capped += capped
+        self.failed_words += len(failed)
+        self.written.extend(row["word_english"] for row in rows)
+        self.written_words.update(row["word_english"] for row in rows)
+        log.debug(f"Wrote {len(rows)} sentences ({duplicates} near-duplicates, {capped} over the cap dropped)")
+
+
+    def _admit(self, session: Session, rows: list[dict]) -> tuple[list[dict], int, int]:
+        """
+        The rows that are neither near-duplicates nor over the cap, with the
+        counts of both. Sets the `lexeme_id` of every row.
+        """
+
+        lexemes = Lexemes.resolve(session, {row["word_english"] for row in rows})
+        lexeme_ids = list(set(lexemes.values()))
+        lock_lexemes(session, lexeme_ids)
+
+        index = SimilarityIndex()
+        counts: dict[int, int] = {}
+
+        for chunk in chunks(lexeme_ids):
+            existing = session.query(Sentences.lexeme_id, Sentences.english).filter(Sentences.lexeme_id.in_(chunk))
+
+            for lexeme_id, english in existing:
+                counts[lexeme_id] = counts.get(lexeme_id, 0) + 1
+                index.add(lexeme_id, english)
+
+        admitted: list[dict] = []
+        duplicates = capped = 0
+
+        for row in rows:
+            lexeme_id = row["lexeme_id"] = lexemes[row["word_english"]]
+
+            if counts.get(lexeme_id, 0) >= self.max_sentences:
+                capped += 1
+            elif self.dedupe and not index.check_and_add(lexeme_id, row["english"]):
+                duplicates += 1
+            else:
+                counts[lexeme_id] = counts.get(lexeme_id, 0) + 1
+                admitted.append(row)
+
+        return admitted, duplicates, capped
+
+
+    async def autoflush(self) -> None:
+        """Flush rows that waited `flush_interval` seconds, until cancelled."""
+
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval:
+                self.flush()
@@ -10,5 +10,14 @@ from .users import Users
 from .words import Words
 from .sentences import Sentences
 from .libraries import Libraries
+from .library_usage import LibraryUsage
+from .generation_queue import GenerationQueue
+from .generator_state import GeneratorState
+from .generation_checkpoint import GenerationCheckpoint
+from .lexemes import Lexemes
+from .login_events import LoginEvents, LoginRollups
 
-__all__ = ["db", "migrate", "Users", "Words", "Sentences", "Libraries"]
\ No newline at end of file
+__all__ = [
+    "db", "migrate", "Users", "Words", "Sentences", "Libraries", "LibraryUsage", "GenerationQueue", "GeneratorState",
+    "GenerationCheckpoint", "Lexemes", "LoginEvents", "LoginRollups",
+]
\ No newline at end of file
@@ -0,0 +1,35 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, DateTime, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import db
+
+
+log = logging.getLogger(__name__)
+
+
+class GenerationCheckpoint(db.Model):
+    __tablename__ = "generation_checkpoints"
+    __table_args__ = (UniqueConstraint("pass_id", "word_english"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    pass_id: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
+    word_english: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False) # "done" or "failed"
+    reason: Mapped[Optional[str]] = mapped_column(String(32), nullable=True) # The `GenerationError` reason of a failure
+    retry_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True) # Skip the word until then
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, onupdate=datetime.now, default=datetime.now, nullable=False)
+
+    def __init__(self, pass_id: str, word_english: str, status: str, reason: Optional[str] = None, retry_at: Optional[datetime] = None):
+        self.pass_id = pass_id
+        self.word_english = word_english
+        self.status = status
+        self.reason = reason
+        self.retry_at = retry_at
+
+    def __repr__(self) -> str:
+        return f"<Pass {self.pass_id}: {self.word_english} {self.status}>"
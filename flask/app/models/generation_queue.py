@@ -0,0 +1,29 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, Float
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import db
+
+
+log = logging.getLogger(__name__)
+
+
+class GenerationQueue(db.Model):
+    __tablename__ = "generation_queue"
+
+    word_english: Mapped[str] = mapped_column(String(32), primary_key=True)
+    priority: Mapped[float] = mapped_column(Float, default=0.0, nullable=False, index=True)
+    boost: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, onupdate=datetime.now, default=datetime.now, nullable=False)
+
+    def __init__(self, word_english: str, priority: float = 0.0, boost: float = 0.0):
+        self.word_english = word_english
+        self.priority = priority
+        self.boost = boost
+
+    def __repr__(self) -> str:
+        return f"<{self.word_english}: priority {self.priority:.2f}>"
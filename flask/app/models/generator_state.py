@@ -0,0 +1,28 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import db
+
+
+log = logging.getLogger(__name__)
+
+
+class GeneratorState(db.Model):
+    __tablename__ = "generator_state"
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    owner: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    payload: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+    def __init__(self, name: str, owner: Optional[str] = None, payload: Optional[dict] = None):
+        self.name = name
+        self.owner = owner
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return f"<Generator state '{self.name}' (owner={self.owner})>"
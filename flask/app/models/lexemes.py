@@ -0,0 +1,87 @@
+import logging
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import String, DateTime, Integer, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from . import db
+
+
+log = logging.getLogger(__name__)
+
+# Keeps `IN (...)` lists well under the bound-parameter limits of the databases.
+CHUNK_SIZE = 500
+
+
+class Lexemes(db.Model):
+    """One row per distinct english headword, shared by the words of every library and their sentences."""
+
+    __tablename__ = "lexemes"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    english: Mapped[str] = mapped_column(String(32), unique=True, index=True, nullable=False) # `normalize()`d
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+
+    def __init__(self, english: str):
+        self.english = self.normalize(english)
+
+    def __repr__(self) -> str:
+        return f"<Lexeme {self.english} (id={self.id})>"
+
+    @staticmethod
+    def normalize(english: str) -> str:
+        return english.strip().lower()
+
+    @staticmethod
+    def resolve(session: Session, englishes: Iterable[str]) -> dict[str, int]:
+        """
+        Get the lexeme ID of every english word, creating the missing lexemes.
+
+        Concurrent callers may create the same lexeme, so the insert skips
+        rows that already exist instead of failing on the unique index.
+
+        Parameters
+        ----------
+        session : Session
+            The session used, inside the caller's transaction.
+        englishes : Iterable[str]
+            The english words, as written in the words or sentences.
+
+        Returns
+        -------
+        dict[str, int]
+            The lexeme IDs, by english word as given.
+        """
+
+        keys = {english: Lexemes.normalize(english) for english in englishes}
+        wanted = sorted(set(keys.values()))
+        ids: dict[str, int] = {}
+
+        def load(values: list[str]) -> None:
+            for i in range(0, len(values), CHUNK_SIZE):
+                ids.update(session.execute(
+                    select(Lexemes.english, Lexemes.id).where(Lexemes.english.in_(values[i:i + CHUNK_SIZE]))
+                ).tuples().all())
+
+        load(wanted)
+
+        if missing := [english for english in wanted if english not in ids]:
+            dialect = session.get_bind().dialect.name
+
+            if dialect == "postgresql":
+                statement = postgresql.insert(Lexemes).on_conflict_do_nothing(index_elements=["english"])
+            elif dialect == "sqlite":
+                statement = sqlite.insert(Lexemes).on_conflict_do_nothing(index_elements=["english"])
+            else:
+                statement = insert(Lexemes)
+
+            now = datetime.now()
+            session.execute(statement, [{"english": english, "created_at": now} for english in missing])
+            load(missing)
+
+            log.debug(f"Created {len(missing)} lexemes")
+
+        return {english: ids[key] for english, key in keys.items()}
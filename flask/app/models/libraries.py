@@ -1,14 +1,14 @@
 import logging
 from datetime import datetime
-from typing import Optional, TYPE_CHECKING
+from typing import Iterable, Optional, TYPE_CHECKING
 
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Table
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Index, Table, func, or_, select, text, update
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import db
+from .words import Words
 
 if TYPE_CHECKING:
-    from .words import Words
     from .users import Users
 
 log = logging.getLogger(__name__)
@@ -23,11 +23,22 @@ favorites_table = Table(
 
 class Libraries(db.Model):
     __tablename__ = "libraries"
+    __table_args__ = (
+        # Libraries of a user, and the public ones of a user for the profile page
+        Index("ix_libraries_author_id_public", "author_id", "public"),
+        # Partial: the public listing only ever reads the public rows
+        Index("ix_libraries_public", "public", postgresql_where=text("public"), sqlite_where=text("public = 1")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(64), nullable=False)
+    name: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)
     description: Mapped[Optional[str]] = mapped_column(String(256), nullable=True)
     public: Mapped[bool] = mapped_column(Boolean, default=False)
+    
+    # Kept in step with `words` and `favorite_users` by `change_counts()`, so listings never load them
+    word_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    favorite_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    
     words: Mapped[list["Words"]] = relationship("Words", back_populates="library", cascade="all, delete-orphan", single_parent=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
@@ -44,4 +55,64 @@ class Libraries(db.Model):
         self.author_id = author_id
 
     def __repr__(self):
-        return f"<{'Public' if self.public else 'Private'} {self.name} (id={self.id})>"
\ No newline at end of file
+        return f"<{'Public' if self.public else 'Private'} {self.name} (id={self.id})>"
+    
+    @staticmethod
+    def change_counts(library_ids: Iterable[int], words: int = 0, favorites: int = 0) -> None:
+        """
+        Add to the counters of libraries, in the caller's transaction.
+        
+        The counters are incremented in place rather than set, so concurrent
+        changes to the same library do not overwrite each other.
+        
+        Parameters
+        ----------
+        library_ids : Iterable[int]
+            The IDs of the libraries to change.
+        words : int
+            The number of words added, negative for removed ones.
+        favorites : int
+            The number of favorites added, negative for removed ones.
+        """
+        
+        library_ids = list(library_ids)
+        
+        if library_ids and (words or favorites):
+            db.session.execute(
+                update(Libraries)
+                .where(Libraries.id.in_(library_ids))
+                .values(word_count=Libraries.word_count + words, favorite_count=Libraries.favorite_count + favorites)
+            )
+    
+    @staticmethod
+    def repair_counts(dry_run: bool = False) -> list[str]:
+        """
+        Recompute the counters of every library from its words and favorites.
+        
+        Parameters
+        ----------
+        dry_run : bool
+            Only find the libraries with wrong counters.
+        
+        Returns
+        -------
+        list[str]
+            The names of the libraries whose counters were wrong.
+        """
+        
+        words = select(func.count(Words.id)).where(Words._library_id == Libraries.id).scalar_subquery()
+        favorites = (
+            select(func.count()).select_from(favorites_table)
+            .where(favorites_table.c.library_id == Libraries.id).scalar_subquery()
+        )
+        stale = or_(Libraries.word_count != words, Libraries.favorite_count != favorites)
+        
+        names = list(db.session.execute(select(Libraries.name).where(stale)).scalars())
+        
+        if names and not dry_run:
+            db.session.execute(update(Libraries).where(stale).values(word_count=words, favorite_count=favorites))
+            db.session.commit()
+            
+        log.info(f"Library counters {'to repair' if dry_run else 'repaired'}: {len(names)} libraries")
+        
+        return names
\ No newline at end of file
@@ -0,0 +1,80 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, ForeignKey, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import db
+
+
+log = logging.getLogger(__name__)
+
+
+class LibraryUsage(db.Model):
+    __tablename__ = "library_usage"
+
+    library_id: Mapped[int] = mapped_column(ForeignKey("libraries.id", ondelete="CASCADE"), primary_key=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+
+    def __init__(self, library_id: int, hits: int = 0):
+        self.library_id = library_id
+        self.hits = hits
+        
+    def __repr__(self) -> str:
+        return f"<Library {self.library_id}: {self.hits} hits>"
+    
+    @staticmethod
+    def record(library_id: int) -> None:
+        """
+        Count one use of a library (a selection or a test).
+        
+        Concurrent requests may count the first use of the same library, so
+        the insert adds to the existing row instead of failing on the key.
+        
+        Parameters
+        ----------
+        library_id : int
+            The ID of the library that was used.
+        """
+        
+        now = datetime.now()
+        dialect = db.session.get_bind().dialect.name
+        
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql if dialect == "postgresql" else sqlite).insert(LibraryUsage).values(
+                library_id=library_id, hits=1, last_used_at=now,
+            )
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=["library_id"],
+                set_={"hits": LibraryUsage.hits + 1, "last_used_at": now},
+            ))
+            
+        else:
+            result = db.session.execute(
+                update(LibraryUsage)
+                .where(LibraryUsage.library_id == library_id)
+                .values(hits=LibraryUsage.hits + 1, last_used_at=now)
+            )
+            
+            if result.rowcount == 0:
+                db.session.add(LibraryUsage(library_id=library_id, hits=1))
+            
+        db.session.commit()
+    
+    @staticmethod
+    def forget(library_id: int) -> None:
+        """
+        Delete the usage of a library that is about to be deleted, in the
+        caller's transaction. SQLite does not enforce the foreign keys, so
+        `ondelete="CASCADE"` alone would leave the row to a later library
+        that gets the same ID.
+        
+        Parameters
+        ----------
+        library_id : int
+            The ID of the library.
+        """
+        
+        db.session.execute(delete(LibraryUsage).where(LibraryUsage.library_id == library_id))
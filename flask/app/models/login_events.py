@@ -0,0 +1,98 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import String, Date, DateTime, Integer, ForeignKey, Index, delete, func, select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import db
+from ..config import LOGIN_HISTORY
+
+
+log = logging.getLogger(__name__)
+
+
+class LoginEvents(db.Model):
+    """One row per login, appended by `Users.update_login_info()`."""
+
+    __tablename__ = "login_events"
+    __table_args__ = (Index("ix_login_events_user_id_time", "user_id", "time"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    ip: Mapped[Optional[str]] = mapped_column(String(45), nullable=True)
+    time: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False, index=True)
+
+    def __init__(self, user_id: int, ip: Optional[str], time: Optional[datetime] = None):
+        self.user_id = user_id
+        self.ip = ip
+        self.time = time or datetime.now()
+
+    def __repr__(self) -> str:
+        return f"<Login of user {self.user_id} from {self.ip} at {self.time}>"
+
+    @staticmethod
+    def prune(now: Optional[datetime] = None, retention_days: int = LOGIN_HISTORY["retention_days"],
+              rollup: bool = LOGIN_HISTORY["rollup"]) -> int:
+        """
+        Delete the login events older than the retention period, first adding
+        them to the per-day counts of `LoginRollups` if `rollup` is set.
+
+        Parameters
+        ----------
+        now : Optional[datetime]
+            The reference time, the current time if `None`.
+        retention_days : int
+            The number of days the events are kept.
+        rollup : bool
+            Count the deleted events per user and day.
+
+        Returns
+        -------
+        int
+            The number of deleted events.
+        """
+
+        cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+        expired = LoginEvents.time < cutoff
+
+        if rollup:
+            day = func.date(LoginEvents.time)
+            rows = db.session.execute(
+                select(LoginEvents.user_id, day, func.count()).where(expired).group_by(LoginEvents.user_id, day)
+            ).all()
+
+            for user_id, login_day, count in rows:
+                # SQLite returns the day as text
+                if isinstance(login_day, str):
+                    login_day = date.fromisoformat(login_day)
+
+                if (existing := db.session.get(LoginRollups, (user_id, login_day))) is None:
+                    db.session.add(LoginRollups(user_id, login_day, count))
+                else:
+                    existing.logins += count
+
+        deleted = db.session.execute(delete(LoginEvents).where(expired)).rowcount
+        db.session.commit()
+
+        log.info(f"Pruned {deleted} login events older than {cutoff:%Y-%m-%d}" + (" into daily counts" if rollup else ""))
+
+        return deleted
+
+
+class LoginRollups(db.Model):
+    """The number of logins of a user on a day, for the days past the retention of `LoginEvents`."""
+
+    __tablename__ = "login_rollups"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    logins: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    def __init__(self, user_id: int, day: date, logins: int = 0):
+        self.user_id = user_id
+        self.day = day
+        self.logins = logins
+
+    def __repr__(self) -> str:
+        return f"<User {self.user_id}: {self.logins} logins on {self.day}>"
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, DateTime, Integer
+from sqlalchemy import String, DateTime, Integer, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import db
@@ -18,7 +18,8 @@ class Sentences(db.Model):
     chinese: Mapped[str] = mapped_column(String(256), nullable=False)
     english: Mapped[str] = mapped_column(String(256), nullable=False)
     word_chinese: Mapped[str] = mapped_column(String(32), nullable=False)
-    word_english: Mapped[str] = mapped_column(String(32), nullable=False)
+    word_english: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    lexeme_id: Mapped[Optional[int]] = mapped_column(ForeignKey("lexemes.id"), index=True, nullable=True) # Of `word_english`
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, onupdate=datetime.now, default=datetime.now, nullable=False)
@@ -4,23 +4,21 @@ import os
 import requests
 import hashlib
 from datetime import datetime
-from typing import Optional, TYPE_CHECKING
+from typing import Optional
 
 from flask import url_for, request
 from flask_login import UserMixin
-from sqlalchemy import String, Boolean, DateTime, PickleType
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Boolean, DateTime, delete, select
+from sqlalchemy.orm import DynamicMapped, Mapped, mapped_column, relationship
 from werkzeug.datastructures import FileStorage
 
 from . import db
-from ..config import BASEDIR, DATETIME_FORMAT, DEFAULT_LOCALE, DEFAULT_AVATAR, DEFAULT_AVATAR_FOLDER
+from .libraries import Libraries, favorites_table
+from .login_events import LoginEvents, LoginRollups
+from ..config import BASEDIR, DEFAULT_LOCALE, DEFAULT_AVATAR, DEFAULT_AVATAR_FOLDER
 from ..utils.secret import hash_password, check_password
 from ..utils.image_processing import process_image
 
-if TYPE_CHECKING:
-    from .libraries import Libraries
-
-
 log = logging.getLogger(__name__)
 
 
@@ -31,7 +29,7 @@ class Users(db.Model, UserMixin):
 
     username: Mapped[str] = mapped_column(String(32), nullable=False)
     password: Mapped[str] = mapped_column(String(64), nullable=True)
-    email: Mapped[str] = mapped_column(String(64), nullable=False)
+    email: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
     unlimited_access: Mapped[bool] = mapped_column(Boolean, default=False)
     bio: Mapped[Optional[str]] = mapped_column(String(75), nullable=True)
@@ -41,7 +39,8 @@ class Users(db.Model, UserMixin):
 
     locale: Mapped[str] = mapped_column(String(8), nullable=False, default=DEFAULT_LOCALE)
     avatar_url: Mapped[Optional[str]] = mapped_column(String(256), nullable=True)
-    logins: Mapped[list] = mapped_column(PickleType, nullable=False, default=list)
+    # Never loaded with the user; query it, e.g. `user.logins.limit(10)`
+    logins: DynamicMapped["LoginEvents"] = relationship("LoginEvents", lazy="dynamic", passive_deletes=True, order_by="desc(LoginEvents.time)")
 
     current_library: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     libraries: Mapped[list["Libraries"]] = relationship("Libraries", back_populates="user", cascade="save-update")
@@ -161,14 +160,48 @@ class Users(db.Model, UserMixin):
     
     
     def update_login_info(self) -> None:
-
-        if not self.logins:
-            self.logins = []
-            
-        self.logins.append({
-            "ip": request.remote_addr,
-            "time": datetime.now().strftime(DATETIME_FORMAT),
-        })
+        """
+        Record a login from the current request, as one `LoginEvents` row.
+        The caller commits.
+        """
+        
+        db.session.add(LoginEvents(self.id, request.remote_addr))
+    
+    
+    @staticmethod
+    def forget_favorites(user_id: int) -> None:
+        """
+        Take the favorites of a user that is about to be deleted off the
+        library counters, in the caller's transaction.
+        
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user.
+        """
+        
+        library_ids = db.session.execute(
+            select(favorites_table.c.library_id).where(favorites_table.c.user_id == user_id)
+        ).scalars().all()
+        
+        Libraries.change_counts(library_ids, favorites=-1)
+    
+    
+    @staticmethod
+    def forget_logins(user_id: int) -> None:
+        """
+        Delete the login history of a user that is about to be deleted, in
+        the caller's transaction. SQLite does not enforce the foreign keys,
+        so `ondelete="CASCADE"` alone would leave the rows behind.
+        
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user.
+        """
+        
+        db.session.execute(delete(LoginEvents).where(LoginEvents.user_id == user_id))
+        db.session.execute(delete(LoginRollups).where(LoginRollups.user_id == user_id))
     
     
     def update(self, data: dict) -> None:
@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING
 
 from sqlalchemy import String, DateTime, Integer, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from . import db
 
 if TYPE_CHECKING:
+    from .lexemes import Lexemes
     from .libraries import Libraries
 
 
@@ -24,8 +25,12 @@ class Words(db.Model):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, onupdate=datetime.now, default=datetime.now, nullable=False)
     
-    _library_id: Mapped[int] = mapped_column("library_id", ForeignKey("libraries.id"), nullable=True)
+    _library_id: Mapped[int] = mapped_column("library_id", ForeignKey("libraries.id"), index=True, nullable=True)
     library: Mapped["Libraries"] = relationship("Libraries", back_populates="words")
+    
+    # Set from `english` with `Lexemes.resolve()`; sentences are found through it
+    lexeme_id: Mapped[Optional[int]] = mapped_column(ForeignKey("lexemes.id"), index=True, nullable=True)
+    lexeme: Mapped[Optional["Lexemes"]] = relationship("Lexemes")
 
     def __init__(self, chinese: str, english: str):
         self.chinese = chinese
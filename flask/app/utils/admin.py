@@ -5,7 +5,7 @@ from flask_admin import Admin, AdminIndexView
 from flask_admin.contrib.sqla import ModelView
 from flask_admin.menu import MenuLink
 
-from ..models import db, Libraries, Sentences, Users, Words
+from ..models import db, Lexemes, Libraries, LibraryUsage, Sentences, Users, Words
 from ..utils.login_manager import current_user
 from .secret import hash_password
 
@@ -60,6 +60,8 @@ class UsersModelView(SecureModelView):
     def delete_model(self, model):
         if model.id == self.SYSTEM_USER_ID:
             return False
+        Users.forget_favorites(model.id)
+        Users.forget_logins(model.id)
         return super().delete_model(model)
     
     
@@ -74,6 +76,17 @@ class WordsModelView(SecureModelView):
     
     form_columns = ["chinese", "english", "library"]
     
+    def on_model_change(self, form, model: Words, is_created):
+        model.lexeme_id = Lexemes.resolve(self.session, [model.english])[model.english]
+        if is_created and model.library is not None:
+            Libraries.change_counts([model.library.id], words=1)
+        return super().on_model_change(form, model, is_created)
+    
+    def on_model_delete(self, model: Words):
+        if model._library_id is not None:
+            Libraries.change_counts([model._library_id], words=-1)
+        return super().on_model_delete(model)
+    
     
 class LibrariesModelView(SecureModelView):
     can_create = True
@@ -86,6 +99,10 @@ class LibrariesModelView(SecureModelView):
     
     form_columns = ["name", "description", "public", "user"]
     
+    def on_model_delete(self, model: Libraries):
+        LibraryUsage.forget(model.id)
+        return super().on_model_delete(model)
+    
     
 class SentencesModelView(SecureModelView):
     can_create = True
@@ -97,6 +114,10 @@ class SentencesModelView(SecureModelView):
     column_filters = ["id", "created_at", "updated_at"]
     
     form_columns = ["chinese", "english", "word_chinese", "word_english"]
+    
+    def on_model_change(self, form, model: Sentences, is_created):
+        model.lexeme_id = Lexemes.resolve(self.session, [model.word_english])[model.word_english]
+        return super().on_model_change(form, model, is_created)
         
 
 def init_admin(app):
@@ -0,0 +1,36 @@
+import logging
+from typing import Optional
+
+import click
+from flask.cli import with_appcontext
+
+from ..config import LOGIN_HISTORY
+
+
+log = logging.getLogger(__name__)
+
+
+@click.command("repair-library-counts")
+@click.option("--dry-run", is_flag=True, help="Only report the libraries with wrong counters.")
+@with_appcontext
+def repair_library_counts_command(dry_run: bool) -> None:
+    """Recompute the word and favorite counters of every library."""
+    
+    from ..models import Libraries
+    
+    names = Libraries.repair_counts(dry_run=dry_run)
+    
+    click.echo(f"{len(names)} libraries {'have wrong counters' if dry_run else 'repaired'}" + (f": {', '.join(names)}" if names else ""))
+
+
+@click.command("prune-login-events")
+@click.option("--days", default=None, type=int, help="Keep this many days of events instead of `security.login_history.retention_days`.")
+@with_appcontext
+def prune_login_events_command(days: Optional[int]) -> None:
+    """Delete old login events, counting them per day first if `security.login_history.rollup` is set."""
+    
+    from ..models import LoginEvents
+    
+    deleted = LoginEvents.prune(retention_days=days if days is not None else LOGIN_HISTORY["retention_days"])
+    
+    click.echo(f"{deleted} login events pruned")
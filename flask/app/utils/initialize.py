@@ -8,7 +8,7 @@ from ..config import (
     BASEDIR,
     SYSTEM_USERNAME, SYSTEM_EMAIL, SYSTEM_PASSWORD
 )
-from ..models import db, Libraries, Users, Words
+from ..models import db, Lexemes, Libraries, Users, Words
 from .checker import library_checker
 
 
@@ -83,6 +83,8 @@ def load_libraries() -> None:
         
         log.debug(f"Added library {library.name} to the database. ID: {library.id}")
         
+        lexemes = Lexemes.resolve(db.session, [word["English"] for word in library_json["words"] if word.get("English")])
+        
         for word in library_json["words"]:
             
             chinese = word.get("Chinese")
@@ -97,8 +99,10 @@ def load_libraries() -> None:
                 english=english
             )
             word_instance._library_id = library.id
+            word_instance.lexeme_id = lexemes[english]
             
             db.session.add(word_instance)
+            library.word_count += 1
             
 
         db.session.commit()
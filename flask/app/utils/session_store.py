@@ -0,0 +1,168 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from flask import Flask, Request
+from flask.sessions import SessionMixin
+from flask_session.base import ServerSideSession, ServerSideSessionInterface
+from itsdangerous import BadSignature
+
+
+log = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, expiry REAL NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_sessions_expiry ON sessions (expiry)",
+)
+
+
+class SqliteSession(ServerSideSession):
+    """A server-side session that knows when its stored copy expires."""
+
+    def __init__(self, initial: Optional[dict[str, Any]] = None, sid: Optional[str] = None,
+                 permanent: Optional[bool] = None, expiry: Optional[float] = None):
+        super().__init__(initial, sid, permanent)
+        self.expiry = expiry
+
+
+class SqliteSessionInterface(ServerSideSessionInterface):
+    """
+    Server-side sessions in a local SQLite file in WAL mode, so every worker
+    of the host reads and writes the same sessions without blocking each other.
+
+    - Static files get a null session, without a lookup.
+    - Empty sessions are never stored and get no cookie.
+    - An unchanged session is only written back once half of its lifetime
+      has passed, to push its expiry back.
+    - Expired sessions are deleted `sweep_batch_size` at a time, one batch
+      per worker every `sweep_interval` seconds, or one per request while
+      a full batch keeps coming back. `flask session_cleanup` deletes them all.
+    """
+
+    session_class = SqliteSession
+    ttl = False
+
+    def __init__(self, app: Flask, path: str, sweep_interval: float, sweep_batch_size: int, **kwargs):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self._local = threading.local()
+        self._next_sweep = 0.0
+
+        # Without `cleanup_n_requests` the base class registers `flask session_cleanup`.
+        super().__init__(app, cleanup_n_requests=None, **kwargs)
+
+        connection = self._connection()
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+        log.info(f"Session file: {path}")
+
+
+    def _connection(self) -> sqlite3.Connection:
+        """The connection of this thread, opened again after a fork."""
+
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+
+        return self._local.connection
+
+
+    def _sweep(self) -> int:
+        """Delete one batch of expired sessions. Returns how many were deleted."""
+
+        return self._connection().execute(
+            "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE expiry <= ? LIMIT ?)",
+            (time.time(), self.sweep_batch_size),
+        ).rowcount
+
+
+    def _sweep_if_due(self) -> None:
+        now = time.monotonic()
+
+        if now < self._next_sweep:
+            return
+
+        self._next_sweep = now + self.sweep_interval
+
+        if self._sweep() >= self.sweep_batch_size:
+            self._next_sweep = now
+
+
+    def _delete_expired_sessions(self) -> None:
+        deleted = 0
+
+        while (batch := self._sweep()) > 0:
+            deleted += batch
+
+            if batch < self.sweep_batch_size:
+                break
+
+        log.info(f"{deleted} expired sessions deleted")
+
+
+    def _retrieve_session(self, store_id: str) -> Optional[tuple[dict, float]]:
+        row = self._connection().execute(
+            "SELECT data, expiry FROM sessions WHERE id = ? AND expiry > ?", (store_id, time.time()),
+        ).fetchone()
+
+        return None if row is None else (self.serializer.decode(row[0]), row[1])
+
+
+    def _retrieve_session_data(self, store_id: str) -> Optional[dict]:
+        saved = self._retrieve_session(store_id)
+        return None if saved is None else saved[0]
+
+
+    def _delete_session(self, store_id: str) -> None:
+        self._connection().execute("DELETE FROM sessions WHERE id = ?", (store_id,))
+
+
+    def _upsert_session(self, session_lifetime: timedelta, session: SqliteSession, store_id: str) -> None:
+        expiry = time.time() + session_lifetime.total_seconds()
+
+        self._connection().execute(
+            "INSERT INTO sessions (id, data, expiry) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET data = excluded.data, expiry = excluded.expiry",
+            (store_id, self.serializer.encode(session), expiry),
+        )
+        session.expiry = expiry
+
+
+    def should_set_storage(self, app: Flask, session: SqliteSession) -> bool:
+        if session.modified:
+            return True
+
+        if not app.config["SESSION_REFRESH_EACH_REQUEST"]:
+            return False
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        return session.expiry is None or session.expiry - time.time() < lifetime / 2
+
+
+    def open_session(self, app: Flask, request: Request) -> SessionMixin:
+        if app.static_url_path and request.path.startswith(f"{app.static_url_path}/"):
+            return self.make_null_session(app)
+
+        self._sweep_if_due()
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+
+        if sid and self.use_signer:
+            try:
+                sid = self._unsign(app, sid)
+            except BadSignature:
+                sid = None
+
+        if sid and (saved := self._retrieve_session(self._get_store_id(sid))) is not None:
+            data, expiry = saved
+            return self.session_class(data, sid=sid, expiry=expiry)
+
+        return self.session_class(sid=self._generate_sid(self.sid_length), permanent=self.permanent)
@@ -105,6 +105,8 @@ def login():
         
         if user.check_password(password):
             login_user(user, remember=form.remember.data)
+            user.update_login_info()
+            db.session.commit()
             log.debug(f"User {email} logged in successfully, remember={form.remember.data}")
             resp = redirect("/")
             resp.delete_cookie("current_library")
@@ -262,6 +264,8 @@ def callback():
     db.session.add(user)
     db.session.commit()
     login_user(user, remember=True)
+    user.update_login_info()
+    db.session.commit()
     log.debug(f"User {user.email} logged in via OAuth successfully")
     
     if user.password is not None:
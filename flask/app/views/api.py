@@ -3,12 +3,14 @@ from datetime import datetime
 
 from flask import Blueprint, Response, jsonify
 from flask_login import logout_user
+from sqlalchemy import delete, insert
 from werkzeug.exceptions import HTTPException
 
-from ..models import db, Libraries, Users
+from ..models import db, GeneratorState, Libraries, LibraryUsage, Users
+from ..models.libraries import favorites_table
 from ..utils.login_manager import current_user
 from ..utils.rate_limiter import rate_limiter
-from ..config import DATETIME_FORMAT
+from ..config import DATETIME_FORMAT, API_GENERATOR_LOCK_TTL
 
 
 log = logging.getLogger(__name__)
@@ -65,6 +67,8 @@ def delete_current_user():
     if not user:
         return "User not found.", 404
     
+    Users.forget_favorites(user.id)
+    Users.forget_logins(user.id)
     db.session.delete(user)
     db.session.commit()
     
@@ -85,9 +89,11 @@ def change_user_library(library: str):
     if not isinstance(library, str):
         return "Invalid library name.", 400
     
-    if Libraries.query.filter_by(name=library) is None:
+    if (library_model := Libraries.query.filter_by(name=library).first()) is None:
         return "Library not found.", 404
     
+    LibraryUsage.record(library_model.id)
+    
     if not current_user.is_authenticated:
         resp = Response("Library changed successfully.", 200)
         resp.set_cookie("current_library", library, max_age=60*60*24*30)
@@ -115,6 +121,7 @@ def delete_library(library_name: str):
     if library.author_id != current_user.id and not current_user.is_admin:
         return "Permission denied.", 403
     
+    LibraryUsage.forget(library.id)
     db.session.delete(library)
     db.session.commit()
     
@@ -148,12 +155,19 @@ def toggle_favorite(library_name: str):
     if not library:
         return "Library not found.", 404
     
-    if current_user in library.favorite_users:
-        library.favorite_users.remove(current_user)
+    # On the association row itself, so neither side's collection is loaded.
+    removed = db.session.execute(
+        delete(favorites_table)
+        .where(favorites_table.c.user_id == current_user.id, favorites_table.c.library_id == library.id)
+    ).rowcount
+    
+    if removed:
+        Libraries.change_counts([library.id], favorites=-removed)
         msg = "Removed from favorites."
     
     else:
-        library.favorite_users.append(current_user)
+        db.session.execute(insert(favorites_table).values(user_id=current_user.id, library_id=library.id))
+        Libraries.change_counts([library.id], favorites=1)
         msg = "Added to favorites."
     
     db.session.commit()
@@ -186,3 +200,28 @@ def get_rate_limit_stats():
         "total_banned_ips": len(rate_limiter.banned_ips),
         "rate_limiting_enabled": rate_limiter.enabled
     })
+
+
+@api.route("/admin/generator_stats", methods=["GET"])
+def get_generator_stats():
+    """
+    Get the questions generator's metrics, as last published by the generator process (admin only).
+    """
+    
+    if not current_user.is_authenticated or not current_user.is_admin:
+        return "Permission denied.", 403
+    
+    lock = db.session.get(GeneratorState, "lock")
+    state = db.session.get(GeneratorState, "metrics")
+    
+    running = (
+        lock is not None and lock.owner is not None
+        and (datetime.now() - lock.heartbeat_at).total_seconds() < API_GENERATOR_LOCK_TTL
+    )
+    
+    return jsonify({
+        "running": running,
+        "owner": lock.owner if lock is not None else None,
+        "updated_at": state.heartbeat_at.strftime(DATETIME_FORMAT) if state is not None else None,
+        "metrics": state.payload if state is not None else None,
+    })
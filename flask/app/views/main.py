@@ -2,17 +2,22 @@ import logging
 import json
 import os
 import random
+import time
 
 from flask import Blueprint, Response, abort, render_template, redirect, make_response, url_for, flash, request, session, g
 from flask_babel import _, refresh
+from sqlalchemy import or_, select, true
+from sqlalchemy.orm import joinedload
 
 from ..config import (
     BASEDIR, DATETIME_FORMAT, DEFAULT_ITEMS_PER_PAGE,
     GITHUB_LINK, DISCORD_LINK, TWITTER_LINK, FACEBOOK_LINK, INSTAGRAM_LINK,
     SUPPORTED_LANGUAGES, DEFAULT_LOCALE,
-    FALLBACK_QUOTES
+    FALLBACK_QUOTES, API_PRIORITY
 )
-from ..models import db, Libraries, Sentences, Users, Words
+from ..models import db, Lexemes, Libraries, LibraryUsage, Sentences, Users, Words
+from ..models.libraries import favorites_table
+from ..generator.priority import enqueue
 from ..utils.forms import LibraryForm
 from ..utils.login_manager import current_user
 from ..utils.checker import word_checker
@@ -96,19 +101,47 @@ def word_test():
     return render_template("word_test.html", current_user=current_user, words=words)
 
 
+def record_usage(library_id: int) -> None:
+    """
+    Count a use of the library once per `usage_record_minutes` in the
+    session, so reloading a test page does not write on every view.
+    """
+    
+    now = time.time()
+    interval = API_PRIORITY["usage_record_minutes"] * 60
+    # Keys are strings, the session is stored as JSON. Expired entries are dropped to keep the cookie small.
+    previous = session.get("library_usage", {})
+    recorded = {key: at for key, at in previous.items() if now - at < interval}
+    
+    if str(library_id) not in recorded:
+        LibraryUsage.record(library_id)
+        recorded[str(library_id)] = now
+        
+    if recorded != previous:
+        session["library_usage"] = recorded
+
+
 @main.route("/sentence_test", methods=["GET"])
 def sentence_test():
     
-    if Libraries.query.filter_by(name=current_user.current_library).first() is None:
+    if (selected_library := Libraries.query.filter_by(name=current_user.current_library).first()) is None:
         flash(_("Please choose a library first."), "warning")
         return redirect(url_for("main.library"))
     
+    record_usage(selected_library.id)
+    
     skipping = 0
     questions = []
-    words: list[Words] = Words.query.join(Libraries).filter(Libraries.name == current_user.current_library).all()
+    words: list[Words] = Words.query.filter_by(_library_id=selected_library.id).all()
+    
+    # All sentences of the library in one integer join, shared with every library that has the word.
+    sentences_by_lexeme: dict[int, list[Sentences]] = {}
+    
+    for s in Sentences.query.join(Words, Words.lexeme_id == Sentences.lexeme_id).filter(Words._library_id == selected_library.id).distinct():
+        sentences_by_lexeme.setdefault(s.lexeme_id, []).append(s)
     
     for w in words:
-        sentences = Sentences.query.filter_by(word_english=w.english).all()
+        sentences = sentences_by_lexeme.get(w.lexeme_id, [])
         
         if len(sentences) == 0:
             questions.append({
@@ -141,16 +174,26 @@ def sentence_test():
 @main.route("/library", methods=["GET"])
 def library():
     
+    # The counters and the author come with the libraries; no words or favorites are loaded.
+    query = Libraries.query.options(joinedload(Libraries.user))
+    favorite_ids: set[int] = set()
+    
+    if current_user.is_authenticated:
+        favorite_ids = set(db.session.execute(
+            select(favorites_table.c.library_id).where(favorites_table.c.user_id == current_user.id)
+        ).scalars())
+    
     if current_user.is_authenticated and current_user.is_admin:
-        library_models: list[Libraries] = Libraries.query.all()
+        library_models: list[Libraries] = query.all()
         
     elif current_user.is_authenticated:
-        library_models: list[Libraries] = Libraries.query.filter(
-            Libraries.public | (Libraries.author_id == current_user.id)
+        # `public = true` rather than a bare `public`, so both sides can use an index.
+        library_models: list[Libraries] = query.filter(
+            or_(Libraries.public == true(), Libraries.author_id == current_user.id)
         ).all()
         
     else:
-        library_models: list[Libraries] = Libraries.query.filter_by(public=True).all()
+        library_models: list[Libraries] = query.filter_by(public=True).all()
     
     libraries: list[dict] = [{
         "name": library.name,
@@ -158,9 +201,9 @@ def library():
         "author": library.user.username,
         "created_at": library.created_at.strftime(DATETIME_FORMAT),
         "updated_at": library.updated_at.strftime(DATETIME_FORMAT),
-        "count": len(library.words),
-        "favorite_count": len(library.favorite_users),
-        "is_favorited": (current_user in library.favorite_users) if current_user.is_authenticated else False,
+        "count": library.word_count,
+        "favorite_count": library.favorite_count,
+        "is_favorited": library.id in favorite_ids,
         "is_public": library.public,
         "is_owner": (library.author_id == current_user.id) if current_user.is_authenticated else False
     } for library in library_models]
@@ -202,7 +245,7 @@ def select_library_to_edit():
     libraries = [{
         "name": lib.name,
         "description": lib.description,
-        "count": len(lib.words),
+        "count": lib.word_count,
         "public": lib.public,
     } for lib in owned]
 
@@ -277,6 +320,8 @@ def create_library():
         db.session.add(library)
         db.session.commit()
         
+        lexemes = Lexemes.resolve(db.session, [word["English"] for word in words_json if "English" in word])
+        
         for word in words_json:
             if "Chinese" not in word or "English" not in word:
                 log.error("Missing 'Chinese' or 'English' key in words JSON.")
@@ -287,10 +332,13 @@ def create_library():
                 chinese=word["Chinese"],
                 english=word["English"]
             )
+            word_instance.lexeme_id = lexemes[word["English"]]
             # Associate the word with the created library
             word_instance.library = library
             db.session.add(word_instance)
         
+        library.word_count = len(words_json)
+        enqueue(db.session, [word["English"] for word in words_json])
         current_user.current_library = library.name
         db.session.commit()
         log.info(f"Library '{library.name}' created by user '{current_user.username}'.")
@@ -372,7 +420,9 @@ def edit_library(library_name: str):
         library.description = form.description.data.strip() if form.description.data else ""
         library.public = form.public.data
         
+        old_words = {word.english for word in library.words}
         Words.query.filter_by(_library_id=library.id).delete()
+        lexemes = Lexemes.resolve(db.session, [word["English"] for word in words_json if "English" in word])
         
         for word in words_json:
             if "Chinese" not in word or "English" not in word:
@@ -383,9 +433,13 @@ def edit_library(library_name: str):
                 chinese=word["Chinese"],
                 english=word["English"]
             )
+            word_instance.lexeme_id = lexemes[word["English"]]
             word_instance.library = library
             db.session.add(word_instance)
         
+        # All the words were replaced in this transaction.
+        library.word_count = len(words_json)
+        enqueue(db.session, {word["English"] for word in words_json} - old_words)
         db.session.commit()
         log.info(f"Library '{library.name}' updated by user '{current_user.username}'.")
         
@@ -0,0 +1,128 @@
+"""
+Generator throughput benchmark against the local stand-in LLM.
+
+Runs one `generate()` pass over the bundled libraries with a throwaway
+SQLite database and a `LocalEnglishHelper` pointed at an in-process
+`LocalLLM`, then reports sentences/second, the accept rate (sentences per
+sentence the LLM was asked for and answered, i.e. not rate limited), the
+LLM calls per stored sentence and the time spent waiting for API keys.
+
+Needs the same environment (`.env`) as the app. Run from the `flask`
+directory, e.g.:
+
+    python benchmarks/bench_generator.py --words 300 --keys 4 --latency 0.2 --rate-limit-rate 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app import create_app  # noqa: E402
+from app.config import Config  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--words", type=int, default=300, help="Number of words to generate for.")
+    parser.add_argument("--keys", type=int, default=4, help="Number of fake API keys.")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--max-in-flight-per-key", type=int, default=2)
+    parser.add_argument("--max-in-flight-per-provider", type=int, default=8)
+    parser.add_argument("--requests-per-minute", type=float, default=None, help="Per-key limit; none by default.")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--candidates", type=int, default=1, help="Sentences asked for per prompt (with --batch-size 1).")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--capacity", type=int, default=None, help="Requests the LLM serves at once; more get a 429.")
+    parser.add_argument("--adaptive", action="store_true", help="Use the AIMD concurrency limiter.")
+    return parser.parse_args()
+
+
+class BenchConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+
+
+async def bench(args: argparse.Namespace) -> None:
+    import app.generator as generator
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.english_helper import LocalEnglishHelper
+    from app.generator.limiter import AdaptiveLimiter
+    from app.generator.local_llm import LocalLLM
+    from app.models import db, Sentences, Words
+
+    keep = {english for (english,) in db.session.query(Words.english).distinct().order_by(Words.english).limit(args.words)}
+    Words.query.filter(Words.english.notin_(keep)).delete(synchronize_session=False)
+    db.session.commit()
+
+    llm = LocalLLM(
+        latency=args.latency, jitter=args.jitter, rate_limit_rate=args.rate_limit_rate,
+        malformed_rate=args.malformed_rate, retry_after=args.retry_after, seed=0, capacity=args.capacity,
+    )
+    url = await llm.start()
+
+    keys = ApiKeyManager(
+        [f"local_{i}" for i in range(args.keys)], "local_",
+        max_in_flight_per_key=args.max_in_flight_per_key, requests_per_minute=args.requests_per_minute,
+    )
+    limiter = AdaptiveLimiter(max_limit=args.max_in_flight_per_provider) if args.adaptive else None
+    helper = LocalEnglishHelper(
+        keys, model_name="local", retry_delay=0.1, max_retry_delay=5, candidates=args.candidates, limiter=limiter,
+        max_in_flight=args.max_in_flight_per_provider,
+    )
+    helper.API_URL = url
+
+    generator.ai_helper = helper
+    generator.API_CANDIDATES = args.candidates
+
+    start = time.monotonic()
+    try:
+        await generator.generate(max_in_flight=args.max_in_flight, batch_size=args.batch_size)
+    finally:
+        elapsed = time.monotonic() - start
+        await helper.close()
+        await llm.stop()
+
+    sentences = Sentences.query.count()
+    answered = llm.stats["phrases"]
+    waits = keys.acquire_waits
+    cooldowns = sum(wait["seconds"] for wait in keys.waits.values())
+
+    print(f"words:           {len(keep)}")
+    print(f"elapsed:         {elapsed:.2f}s")
+    print(f"throughput:      {sentences / elapsed:.2f} sentences/s")
+    print(f"LLM requests:    {llm.stats['requests']} ({llm.stats['rate_limited']} rate limited, {llm.stats['malformed']} malformed)")
+    print(f"accept rate:     {sentences / answered if answered else 0.0:.1%} of answered sentences")
+    print(f"calls/sentence:  {llm.stats['requests'] / sentences if sentences else 0.0:.2f}")
+    print(f"key waits:       {waits['count']} waits, {waits['seconds']:.2f}s total, "
+          f"{waits['seconds'] / waits['count'] if waits['count'] else 0.0:.3f}s mean")
+    print(f"key cooldowns:   {cooldowns:.2f}s total")
+    print(f"HTTP:            {helper.connection_stats['created']} connections created, {helper.connection_stats['reused']} reused")
+    print(f"LLM concurrency: peak {llm.stats['peak_in_flight']}")
+
+    if limiter is not None:
+        print(f"adaptive limit:  {int(limiter.limit)} at the end, {limiter.stats['cuts']} cuts, "
+              f"{len(limiter.history)} changes")
+
+
+def main() -> None:
+    args = parse_args()
+    logging.disable(logging.WARNING)
+
+    app = create_app(BenchConfig)
+
+    with app.app_context():
+        asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
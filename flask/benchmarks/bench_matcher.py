@@ -0,0 +1,127 @@
+"""
+Microbenchmark for the phrase matcher used to blank out the tested word.
+
+Compares `app.generator.matcher.best_match` with the previous
+`difflib.SequenceMatcher` sliding window on:
+
+- sample generator output in `data/sentences.jsonl`, and
+- one sentence per word of `app/library/*.json`, in several inflections.
+
+A case counts as found when the match points at the tested word and scores
+at least 0.5, the bar `EnglishHelper.check()` applies.
+
+Run from the `flask` directory:
+
+    python benchmarks/bench_matcher.py [-v]
+
+`-v` lists the sentences each matcher missed.
+"""
+
+import glob
+import importlib.util
+import json
+import os
+import sys
+import timeit
+from difflib import SequenceMatcher
+
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+APPDIR = os.path.join(BASEDIR, "..", "app")
+
+# Load the module on its own: importing the `app` package needs the full environment.
+spec = importlib.util.spec_from_file_location("matcher", os.path.join(APPDIR, "generator", "matcher.py"))
+matcher = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(matcher)
+
+TEMPLATES = [
+    "I think we should {} it today.",
+    "She {} the whole thing yesterday, didn't she?",
+    "They were {} together when the bell rang.",
+    "Everyone knows that he {} every weekend.",
+]
+
+
+def legacy_best_match(text: str, target_phrase: str) -> tuple[str, float, list[int]]:
+    words = text.split()
+    target_words = target_phrase.split()
+    target_len = len(target_words)
+
+    best_similarity = 0.0
+    best_match = ""
+    best_positions = []
+
+    if target_len == 1:
+        for i, word in enumerate(words):
+            clean_word = word.strip(".,!?;:。，！？；：")
+            sim = SequenceMatcher(None, clean_word.lower(), target_phrase.lower()).ratio()
+            if sim > best_similarity:
+                best_similarity, best_match, best_positions = sim, clean_word, [i]
+    else:
+        for i in range(len(words) - target_len + 1):
+            chunk = " ".join(words[i:i + target_len])
+            sim = SequenceMatcher(None, chunk.lower(), target_phrase.lower()).ratio()
+            if sim > best_similarity:
+                best_similarity, best_match, best_positions = sim, chunk, list(range(i, i + target_len))
+
+    return best_match, best_similarity, best_positions
+
+
+def inflect(word: str) -> list[str]:
+    if word.endswith("e"):
+        return [word, word + "d", word[:-1] + "ing", word + "s"]
+    if word.endswith("y") and word[-2:-1] not in "aeiou":
+        return [word, word[:-1] + "ied", word + "ing", word[:-1] + "ies"]
+    return [word, word + "ed", word + "ing", word + "s"]
+
+
+def load_cases() -> dict[str, list[tuple[str, str, int]]]:
+    """Return (sentence, word, index of the word) cases, by source."""
+
+    recorded = []
+    with open(os.path.join(BASEDIR, "data", "sentences.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            english = item["sentence"].split("|", 1)[0].strip()
+            stem = item["word"].lower()[:4]
+            index = next(i for i, w in enumerate(english.split()) if w.lower().startswith(stem))
+            recorded.append((english, item["word"], index))
+
+    library = []
+    for path in sorted(glob.glob(os.path.join(APPDIR, "library", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            words = [w["English"].strip() for w in json.load(f)["words"]]
+
+        for word in words:
+            if " " in word or not word.isalpha():
+                continue
+
+            for template, form in zip(TEMPLATES, inflect(word)):
+                sentence = template.format(form)
+                library.append((sentence, word, sentence.split().index(form)))
+
+    return {"recorded": recorded, "library": library}
+
+
+def run(name: str, func, cases: list[tuple[str, str, int]]) -> None:
+    found = 0
+    for sentence, word, index in cases:
+        _, score, positions = func(sentence, word)
+        if positions == [index] and score >= 0.5:
+            found += 1
+        elif "-v" in sys.argv:
+            print(f"    missed: {word!r} in {sentence!r} -> {positions}, {score:.2f}")
+
+    seconds = min(timeit.repeat(lambda: [func(s, w) for s, w, _ in cases], number=1, repeat=3))
+    print(f"  {name:<8} {seconds / len(cases) * 1e6:8.1f} us/match   found {found}/{len(cases)} ({found / len(cases):.1%})")
+
+
+def main() -> None:
+    for source, cases in load_cases().items():
+        print(f"{source} ({len(cases)} sentences)")
+        run("difflib", legacy_best_match, cases)
+        run("matcher", matcher.best_match, cases)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Request latency of the session backends.
+
+Serves the same requests through the test client with each backend of
+`session.backend`, with a throwaway database and session file:
+
+- static:    a static file, with the cookie of a stored session,
+- anonymous: a view reading the session, without a cookie,
+- read:      the same view with the cookie of a stored session,
+- write:     a view changing the session on every request,
+
+and reports the mean, median and 95th percentile latency of each, and the
+sessions left in storage (the anonymous requests should not add any).
+
+Needs the same environment (`.env`) as the app. Run from the `flask`
+directory, e.g.:
+
+    python benchmarks/bench_sessions.py --requests 2000
+
+`--database-url` benchmarks the "sqlalchemy" backend against another
+database, e.g. a scratch PostgreSQL database, which gets the app's tables.
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask, session  # noqa: E402
+from flask_session.sqlalchemy import SqlAlchemySessionInterface  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config import Config, SESSION_SWEEP_BATCH_SIZE, SESSION_SWEEP_INTERVAL  # noqa: E402
+from app.utils.session_store import SqliteSessionInterface  # noqa: E402
+
+
+TEMPDIR = tempfile.mkdtemp()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario and backend.")
+    parser.add_argument("--database-url", default=None, help="Database of the app and the sqlalchemy backend.")
+    return parser.parse_args()
+
+
+def backends(app: Flask) -> dict:
+    """Both session interfaces, created before the first request like `create_app()` does."""
+
+    common = {
+        "key_prefix": app.config["SESSION_KEY_PREFIX"],
+        "use_signer": app.config["SESSION_USE_SIGNER"],
+        "permanent": app.config["SESSION_PERMANENT"],
+    }
+
+    from app.models import db
+
+    return {
+        "sqlalchemy": SqlAlchemySessionInterface(app, client=db, **common),
+        "sqlite": SqliteSessionInterface(
+            app, os.path.join(TEMPDIR, "sessions.sqlite3"), SESSION_SWEEP_INTERVAL, SESSION_SWEEP_BATCH_SIZE, **common,
+        ),
+    }
+
+
+def stored_sessions(name: str, interface) -> int:
+    if name == "sqlite":
+        return interface._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    from app.models import db
+
+    return db.session.execute(text("SELECT COUNT(*) FROM sessions")).scalar()
+
+
+def timed(requests: int, send) -> list[float]:
+    latencies = []
+
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+
+    return latencies
+
+
+def bench(app: Flask, args: argparse.Namespace) -> None:
+
+    @app.route("/_bench/read")
+    def bench_read():
+        return str(session.get("n", 0))
+
+    @app.route("/_bench/write")
+    def bench_write():
+        session["n"] = session.get("n", 0) + 1
+        return str(session["n"])
+
+    interfaces = backends(app)
+
+    print(f"{'backend':<12}{'scenario':<12}{'mean':>10}{'p50':>10}{'p95':>10}")
+
+    for name, interface in interfaces.items():
+        app.session_interface = interface
+
+        anonymous = app.test_client(use_cookies=False)
+        user = app.test_client()
+        user.get("/_bench/write")
+
+        scenarios = {
+            "static": lambda: user.get(f"{app.static_url_path}/assets/tos.pdf"),
+            "anonymous": lambda: anonymous.get("/_bench/read"),
+            "read": lambda: user.get("/_bench/read"),
+            "write": lambda: user.get("/_bench/write"),
+        }
+
+        for scenario, send in scenarios.items():
+            send()
+            latencies = sorted(timed(args.requests, send))
+            print(
+                f"{name:<12}{scenario:<12}"
+                f"{statistics.mean(latencies) * 1000:>8.3f}ms"
+                f"{statistics.median(latencies) * 1000:>8.3f}ms"
+                f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.3f}ms"
+            )
+
+        print(f"{name:<12}{'stored':<12}{stored_sessions(name, interface):>10}")
+
+
+def main() -> None:
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    class BenchConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = args.database_url or "sqlite:///" + os.path.join(TEMPDIR, "bench.sqlite3")
+
+    app = create_app(BenchConfig)
+
+    with app.app_context():
+        bench(app, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Generation queue and library usage: the generator's priority inputs
+
+Revision ID: 1d7e3b9c2a60
+Revises:
+Create Date: 2026-10-17 07:00:00.000000
+
+Creates generation_queue and library_usage if `db.create_all()` did not
+already. The queue is rebuilt by the next full generation pass and usage
+starts counting from now, so there is nothing to backfill.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d7e3b9c2a60'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('generation_queue'):
+        op.create_table(
+            'generation_queue',
+            sa.Column('word_english', sa.String(32), primary_key=True),
+            sa.Column('priority', sa.Float, nullable=False),
+            sa.Column('boost', sa.Float, nullable=False),
+            sa.Column('created_at', sa.DateTime, nullable=False),
+            sa.Column('updated_at', sa.DateTime, nullable=False),
+        )
+    op.create_index('ix_generation_queue_priority', 'generation_queue', ['priority'], if_not_exists=True)
+
+    if not inspector.has_table('library_usage'):
+        op.create_table(
+            'library_usage',
+            sa.Column('library_id', sa.Integer, sa.ForeignKey('libraries.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('hits', sa.Integer, nullable=False),
+            sa.Column('last_used_at', sa.DateTime, nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table('library_usage')
+    op.drop_table('generation_queue')
@@ -0,0 +1,59 @@
+"""Indexes for the hot lookup columns, unique library names and user emails
+
+Revision ID: 4b1e0c7d9a21
+Revises: 8e6b1f0d3c95
+Create Date: 2026-10-17 10:00:00.000000
+
+The tables themselves are created by `db.create_all()` at startup, which
+also creates these indexes on a new database, so every index is only
+created if it does not exist yet.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1e0c7d9a21'
+down_revision = '8e6b1f0d3c95'
+branch_labels = None
+depends_on = None
+
+
+def check_unique(table: str, column: str) -> None:
+    """Refuse to make `column` unique while it holds duplicates; they need a human decision."""
+
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT {column} FROM {table} GROUP BY {column} HAVING COUNT(*) > 1"
+    )).scalars().all()
+
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot make {table}.{column} unique, these values are used more than once: "
+            f"{', '.join(map(repr, duplicates[:20]))}{' ...' if len(duplicates) > 20 else ''}"
+        )
+
+
+def upgrade():
+    op.create_index('ix_sentences_word_english', 'sentences', ['word_english'], if_not_exists=True)
+    op.create_index('ix_words_library_id', 'words', ['library_id'], if_not_exists=True)
+
+    check_unique('libraries', 'name')
+    op.create_index('ix_libraries_name', 'libraries', ['name'], unique=True, if_not_exists=True)
+    op.create_index('ix_libraries_author_id_public', 'libraries', ['author_id', 'public'], if_not_exists=True)
+    op.create_index(
+        'ix_libraries_public', 'libraries', ['public'], if_not_exists=True,
+        postgresql_where=sa.text('public'), sqlite_where=sa.text('public = 1'),
+    )
+
+    check_unique('users', 'email')
+    op.create_index('ix_users_email', 'users', ['email'], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_users_email', table_name='users', if_exists=True)
+    op.drop_index('ix_libraries_public', table_name='libraries', if_exists=True)
+    op.drop_index('ix_libraries_author_id_public', table_name='libraries', if_exists=True)
+    op.drop_index('ix_libraries_name', table_name='libraries', if_exists=True)
+    op.drop_index('ix_words_library_id', table_name='words', if_exists=True)
+    op.drop_index('ix_sentences_word_english', table_name='sentences', if_exists=True)
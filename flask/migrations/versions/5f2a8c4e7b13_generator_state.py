@@ -0,0 +1,33 @@
+"""Generator state: the generator lock and other named state of the worker
+
+Revision ID: 5f2a8c4e7b13
+Revises: 1d7e3b9c2a60
+Create Date: 2026-10-17 08:00:00.000000
+
+Creates generator_state if `db.create_all()` did not already.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a8c4e7b13'
+down_revision = '1d7e3b9c2a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('generator_state'):
+        op.create_table(
+            'generator_state',
+            sa.Column('name', sa.String(32), primary_key=True),
+            sa.Column('owner', sa.String(128), nullable=True),
+            sa.Column('heartbeat_at', sa.DateTime, nullable=False),
+            sa.Column('payload', sa.JSON, nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table('generator_state')
@@ -0,0 +1,39 @@
+"""Generation checkpoints: the progress of the running generation pass
+
+Revision ID: 8e6b1f0d3c95
+Revises: 5f2a8c4e7b13
+Create Date: 2026-10-17 09:00:00.000000
+
+Creates generation_checkpoints if `db.create_all()` did not already.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e6b1f0d3c95'
+down_revision = '5f2a8c4e7b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('generation_checkpoints'):
+        op.create_table(
+            'generation_checkpoints',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('pass_id', sa.String(32), nullable=False),
+            sa.Column('word_english', sa.String(32), nullable=False),
+            sa.Column('status', sa.String(16), nullable=False),
+            sa.Column('reason', sa.String(32), nullable=True),
+            sa.Column('retry_at', sa.DateTime, nullable=True),
+            sa.Column('updated_at', sa.DateTime, nullable=False),
+            sa.UniqueConstraint('pass_id', 'word_english'),
+        )
+    op.create_index('ix_generation_checkpoints_pass_id', 'generation_checkpoints', ['pass_id'], if_not_exists=True)
+    op.create_index('ix_generation_checkpoints_word_english', 'generation_checkpoints', ['word_english'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_table('generation_checkpoints')
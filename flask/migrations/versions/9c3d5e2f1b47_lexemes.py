@@ -0,0 +1,96 @@
+"""Lexemes: words and sentences point to their english headword by ID
+
+Revision ID: 9c3d5e2f1b47
+Revises: 4b1e0c7d9a21
+Create Date: 2026-10-17 11:00:00.000000
+
+Creates the lexemes table and the lexeme_id columns if `db.create_all()`
+did not already, then backfills them from words.english and
+sentences.word_english.
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d5e2f1b47'
+down_revision = '4b1e0c7d9a21'
+branch_labels = None
+depends_on = None
+
+
+def normalize(english: str) -> str:
+    # `Lexemes.normalize()` at the time of this revision
+    return english.strip().lower()
+
+
+def backfill() -> None:
+    bind = op.get_bind()
+    lexemes = sa.table('lexemes', sa.column('id', sa.Integer), sa.column('english', sa.String), sa.column('created_at', sa.DateTime))
+
+    englishes = set(bind.execute(sa.text('SELECT DISTINCT english FROM words WHERE lexeme_id IS NULL')).scalars())
+    englishes |= set(bind.execute(sa.text('SELECT DISTINCT word_english FROM sentences WHERE lexeme_id IS NULL')).scalars())
+
+    if not englishes:
+        return
+
+    existing = set(bind.execute(sa.select(lexemes.c.english)).scalars())
+    new = sorted({normalize(english) for english in englishes} - existing)
+
+    if new:
+        now = datetime.now()
+        bind.execute(lexemes.insert(), [{'english': english, 'created_at': now} for english in new])
+
+    ids = dict(bind.execute(sa.select(lexemes.c.english, lexemes.c.id)).tuples().all())
+
+    # The mapping of every stored spelling, so each table is updated in one statement.
+    mapping = op.create_table(
+        'lexeme_backfill',
+        sa.Column('english', sa.String(32), primary_key=True),
+        sa.Column('lexeme_id', sa.Integer, nullable=False),
+    )
+    bind.execute(mapping.insert(), [{'english': english, 'lexeme_id': ids[normalize(english)]} for english in englishes])
+
+    for table, column in (('words', 'english'), ('sentences', 'word_english')):
+        bind.execute(sa.text(
+            f'UPDATE {table} SET lexeme_id = (SELECT lexeme_id FROM lexeme_backfill WHERE lexeme_backfill.english = {table}.{column}) '
+            f'WHERE lexeme_id IS NULL'
+        ))
+
+    op.drop_table('lexeme_backfill')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('lexemes'):
+        op.create_table(
+            'lexemes',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('english', sa.String(32), nullable=False),
+            sa.Column('created_at', sa.DateTime, nullable=False),
+        )
+    op.create_index('ix_lexemes_english', 'lexemes', ['english'], unique=True, if_not_exists=True)
+
+    for table in ('words', 'sentences'):
+        if 'lexeme_id' not in {column['name'] for column in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('lexeme_id', sa.Integer, nullable=True))
+                batch_op.create_foreign_key(f'fk_{table}_lexeme_id_lexemes', 'lexemes', ['lexeme_id'], ['id'])
+
+        op.create_index(f'ix_{table}_lexeme_id', table, ['lexeme_id'], if_not_exists=True)
+
+    backfill()
+
+
+def downgrade():
+    for table in ('sentences', 'words'):
+        op.drop_index(f'ix_{table}_lexeme_id', table_name=table, if_exists=True)
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('lexeme_id')
+
+    op.drop_table('lexemes')
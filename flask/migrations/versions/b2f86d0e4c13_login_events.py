@@ -0,0 +1,104 @@
+"""Login events: move the pickled users.logins lists to their own table
+
+Revision ID: b2f86d0e4c13
+Revises: e7a4c1d2b935
+Create Date: 2026-10-17 13:00:00.000000
+
+Creates login_events and login_rollups if `db.create_all()` did not
+already, copies every user's pickled login history into login_events and
+drops users.logins.
+
+"""
+import logging
+import pickle
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f86d0e4c13'
+down_revision = 'e7a4c1d2b935'
+branch_labels = None
+depends_on = None
+
+log = logging.getLogger('alembic.runtime.migration')
+
+# `defaults.datetime_format` at the time of this revision, used by the pickled entries
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+login_events = sa.table(
+    'login_events',
+    sa.column('user_id', sa.Integer), sa.column('ip', sa.String), sa.column('time', sa.DateTime),
+)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('login_events'):
+        op.create_table(
+            'login_events',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('ip', sa.String(45), nullable=True),
+            sa.Column('time', sa.DateTime, nullable=False),
+        )
+    op.create_index('ix_login_events_user_id_time', 'login_events', ['user_id', 'time'], if_not_exists=True)
+    op.create_index('ix_login_events_time', 'login_events', ['time'], if_not_exists=True)
+
+    if not inspector.has_table('login_rollups'):
+        op.create_table(
+            'login_rollups',
+            sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('day', sa.Date, primary_key=True),
+            sa.Column('logins', sa.Integer, nullable=False),
+        )
+
+    if 'logins' not in {column['name'] for column in inspector.get_columns('users')}:
+        return
+
+    bind = op.get_bind()
+    moved = 0
+
+    for user_id, blob in bind.execute(sa.text('SELECT id, logins FROM users WHERE logins IS NOT NULL')).tuples():
+        events = []
+
+        for entry in pickle.loads(blob) or []:
+            try:
+                events.append({'user_id': user_id, 'ip': entry.get('ip'), 'time': datetime.strptime(entry['time'], DATETIME_FORMAT)})
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+
+        if events:
+            bind.execute(login_events.insert(), events)
+            moved += len(events)
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('logins')
+
+    log.info(f'Moved {moved} login events out of users.logins')
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('logins', sa.LargeBinary, nullable=True))
+
+    bind = op.get_bind()
+    histories: dict[int, list[dict]] = {}
+
+    for user_id, ip, time in bind.execute(
+        sa.select(login_events.c.user_id, login_events.c.ip, login_events.c.time).order_by(login_events.c.time)
+    ).tuples():
+        if isinstance(time, str):
+            time = datetime.fromisoformat(time)
+        histories.setdefault(user_id, []).append({'ip': ip, 'time': time.strftime(DATETIME_FORMAT)})
+
+    users = sa.table('users', sa.column('id', sa.Integer), sa.column('logins', sa.LargeBinary))
+
+    for user_id, *_ in bind.execute(sa.select(users.c.id)).tuples():
+        bind.execute(users.update().where(users.c.id == user_id).values(logins=pickle.dumps(histories.get(user_id, []))))
+
+    op.drop_table('login_rollups')
+    op.drop_table('login_events')
@@ -0,0 +1,39 @@
+"""Library word and favorite counters
+
+Revision ID: e7a4c1d2b935
+Revises: 9c3d5e2f1b47
+Create Date: 2026-10-17 12:00:00.000000
+
+Adds libraries.word_count and libraries.favorite_count if `db.create_all()`
+did not already, and fills them from the words and favorites tables.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4c1d2b935'
+down_revision = '9c3d5e2f1b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('libraries')}
+
+    for column in ('word_count', 'favorite_count'):
+        if column not in columns:
+            op.add_column('libraries', sa.Column(column, sa.Integer, server_default='0', nullable=False))
+
+    op.execute(
+        'UPDATE libraries SET '
+        'word_count = (SELECT COUNT(*) FROM words WHERE words.library_id = libraries.id), '
+        'favorite_count = (SELECT COUNT(*) FROM favorites WHERE favorites.library_id = libraries.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('libraries') as batch_op:
+        batch_op.drop_column('favorite_count')
+        batch_op.drop_column('word_count')
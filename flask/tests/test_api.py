@@ -1,4 +1,4 @@
-from flask import testing
+from flask import Flask, testing
 
 from app.models.libraries import Libraries
 
@@ -26,6 +26,43 @@ def test_change_user_library_valid(logged_in_client: testing.FlaskClient):
     assert resp.status_code == 200
 
 
+def test_anonymous_user_changes_library_with_csrf_enabled(app: Flask, monkeypatch):
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", True)
+    client = app.test_client()
+    client.get("/logout")  # Ensure no user is logged in
+    lib = Libraries.query.first()
+
+    resp = client.put(f"/api/change_user_library/{lib.name}")
+    assert resp.status_code == 200
+    assert resp.headers["Set-Cookie"].startswith("current_library=")
+
+    # Forms still need their token.
+    assert client.post("/login", data={"email": "someone@example.com", "password": "x"}).status_code == 400
+
+
+def test_api_changes_state_only_with_preflighted_methods(app: Flask):
+    # The API is exempt from CSRF protection only because browsers preflight these methods cross-site.
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint.startswith("api."):
+            assert rule.methods <= {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}, rule
+
+
+def test_deleting_a_library_deletes_its_usage(logged_in_client: testing.FlaskClient):
+    from app.models import db, LibraryUsage
+
+    lib = Libraries(name="UsedThenDeleted", description="t", public=True, author_id=1)
+    db.session.add(lib)
+    db.session.commit()
+    library_id = lib.id
+
+    assert logged_in_client.put(f"/api/change_user_library/{lib.name}").status_code == 200
+    assert db.session.get(LibraryUsage, library_id).hits == 1
+
+    assert logged_in_client.delete(f"/api/library/{lib.name}").status_code == 200
+    db.session.expire_all()
+    assert db.session.get(LibraryUsage, library_id) is None
+
+
 def test_toggle_favorite_and_favorites(logged_in_client: testing.FlaskClient):
     lib = Libraries.query.first()
     assert lib is not None
@@ -35,3 +72,81 @@ def test_toggle_favorite_and_favorites(logged_in_client: testing.FlaskClient):
     assert resp2.status_code == 200
     data = resp2.get_json()
     assert "favorite_ids" in data
+
+
+def test_generator_stats_admin_only(logged_in_client: testing.FlaskClient):
+    from app.config import SYSTEM_EMAIL
+    from app.generator.metrics import GeneratorMetrics
+    from app.generator.writer import get_sessionmaker
+    from app.models import db, Users
+
+    resp = logged_in_client.get("/api/admin/generator_stats")
+    assert resp.status_code == 403
+
+    recorded = GeneratorMetrics()
+    recorded.call("groq", "ok", 0.3)
+    recorded.call("groq", "rate_limited", 0.1)
+    recorded.rejected("groq", "low_similarity")
+    recorded.accepted("groq")
+    recorded.save(get_sessionmaker())
+
+    user = Users.query.filter_by(email=SYSTEM_EMAIL).first()
+    user.is_admin = True
+    db.session.commit()
+
+    try:
+        resp = logged_in_client.get("/api/admin/generator_stats")
+    finally:
+        user.is_admin = False
+        db.session.commit()
+
+    assert resp.status_code == 200
+    groq = resp.get_json()["metrics"]["providers"]["groq"]
+    assert groq["calls"] == {"ok": 1, "rate_limited": 1}
+    assert groq["rejections"] == {"low_similarity": 1}
+    assert groq["accept_rate"] == 0.5
+    assert groq["latency"]["p50"] == 0.1 and groq["latency"]["p95"] == 0.5
+
+
+def test_library_counters_follow_favorites_and_can_be_repaired(logged_in_client: testing.FlaskClient, runner):
+    from sqlalchemy import event
+
+    from app.models import db
+
+    lib = Libraries.query.filter(Libraries.word_count > 0).first()
+    assert lib is not None
+    assert lib.word_count == len(lib.words)
+    favorites = lib.favorite_count
+
+    resp = logged_in_client.put(f"/api/favorites/{lib.name}")
+    assert resp.status_code == 200
+    db.session.refresh(lib)
+    toggled = lib.favorite_count
+    assert abs(toggled - favorites) == 1 and toggled == len(lib.favorite_users)
+
+    # The listing reads the counters, not the words or the favorite users of every library.
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        assert logged_in_client.get("/library").status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert not [statement for statement in statements if "FROM words" in statement]
+    assert not [statement for statement in statements if "favorites.library_id =" in statement]
+
+    lib.word_count = 0
+    db.session.commit()
+
+    result = runner.invoke(args=["repair-library-counts", "--dry-run"])
+    assert f"1 libraries have wrong counters: {lib.name}" in result.output
+
+    result = runner.invoke(args=["repair-library-counts"])
+    assert "1 libraries repaired" in result.output
+    db.session.refresh(lib)
+    assert lib.word_count == len(lib.words)
+
+    logged_in_client.put(f"/api/favorites/{lib.name}")
+    db.session.refresh(lib)
+    assert lib.favorite_count == favorites
@@ -30,3 +30,46 @@ def test_logout(logged_in_client: testing.FlaskClient):
     resp = logged_in_client.get("/logout", follow_redirects=False)
     assert resp.status_code == 302
     assert resp.headers.get("Location", "").endswith("/login")
+
+
+def test_logins_are_recorded_and_rolled_up(client: testing.FlaskClient, runner):
+    from datetime import datetime, timedelta
+
+    from app.models import db, LoginEvents, LoginRollups, Users
+
+    user = Users.query.filter_by(email=SYSTEM_EMAIL).first()
+    before = user.logins.count()
+
+    resp = client.post("/login", data={"email": SYSTEM_EMAIL, "password": SYSTEM_PASSWORD}, follow_redirects=True)
+    assert resp.status_code == 200
+    assert user.logins.count() == before + 1
+    assert user.logins.first().ip == "127.0.0.1"
+
+    old = datetime.now() - timedelta(days=400)
+    db.session.add_all([LoginEvents(user.id, "10.0.0.1", old), LoginEvents(user.id, "10.0.0.2", old + timedelta(hours=1))])
+    db.session.commit()
+
+    result = runner.invoke(args=["prune-login-events"])
+    assert "2 login events pruned" in result.output
+    assert user.logins.count() == before + 1
+    assert db.session.get(LoginRollups, (user.id, old.date())).logins == 2
+
+
+def test_deleting_a_user_deletes_the_login_history(client: testing.FlaskClient):
+    from datetime import date
+
+    from app.models import db, LoginEvents, LoginRollups, Users
+
+    client.post("/register", data={"username": "leaving", "email": "leaving@example.com", "password": "pw12345", "confirm": "pw12345"})
+    client.post("/login", data={"email": "leaving@example.com", "password": "pw12345"})
+
+    user_id = Users.query.filter_by(email="leaving@example.com").first().id
+    db.session.add(LoginRollups(user_id, date(2024, 1, 1), 3))
+    db.session.commit()
+    assert LoginEvents.query.filter_by(user_id=user_id).count() == 1
+
+    resp = client.delete("/api/user")
+    assert resp.status_code == 200
+    # SQLite does not enforce the foreign keys, so nothing cascades on its own.
+    assert LoginEvents.query.filter_by(user_id=user_id).count() == 0
+    assert LoginRollups.query.filter_by(user_id=user_id).count() == 0
@@ -1,5 +1,7 @@
 import asyncio
 
+import pytest
+
 from flask import Flask
 
 from app.models import db
@@ -32,6 +34,20 @@ def test_helper_pure_functions():
     assert positions == [3, 4]
 
 
+def test_matcher_finds_inflections():
+    from app.generator.matcher import best_match, bounded_distance, similarity
+
+    assert best_match("The sailors abandoned the ship.", "abandon") == ("abandoned", 0.95, [2])
+    assert best_match("She studies English every morning.", "study")[2] == [1]
+    assert best_match("He is taking care of it.", "take care of")[2] == [2, 3, 4]
+    # The exact form wins over an inflected one.
+    assert best_match("Stopped buses stop here.", "stop")[2] == [2]
+
+    assert bounded_distance("kitten", "sitting", 5) == 3
+    assert bounded_distance("kitten", "sitting", 2) == 3
+    assert similarity("absorb", "table") == 0.0
+
+
 def test_generate_adds_sentences(app: Flask, monkeypatch):
     # Prepare a small library and word
     with app.app_context():
@@ -66,3 +82,895 @@ def test_generate_adds_sentences(app: Flask, monkeypatch):
         assert s is None or (s.english == "Hello" and s.chinese == "你好")
 
 
+
+
+def test_generate_bounds_in_flight_questions(app: Flask, monkeypatch):
+    import app.generator.__init__ as gen_mod
+
+    # Earlier passes fill every word, so give this one fresh words.
+    with app.app_context():
+        lib = Libraries(name="InFlightLib", description="t", public=True, author_id=1)
+        db.session.add(lib)
+        for english in ["rhubarb", "marmot", "kestrel", "bramble"]:
+            word = Words(chinese="字", english=english)
+            word.library = lib
+            db.session.add(word)
+        db.session.commit()
+
+    class FakeAI:
+        def __init__(self):
+            self.in_flight = 0
+            self.peak = 0
+
+        async def question(self, phrase: str):
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            await asyncio.sleep(0)
+            self.in_flight -= 1
+            return {"sentence": "Hello | 你好", "appear": phrase.lower()}
+
+    fake = FakeAI()
+    monkeypatch.setattr(gen_mod, "ai_helper", fake)
+
+    asyncio.get_event_loop().run_until_complete(gen_mod.generate(max_in_flight=3))
+
+    assert 1 < fake.peak <= 3
+
+
+def test_batched_questions_isolate_bad_items():
+    from opencc import OpenCC
+    from app.generator.english_helper import EnglishHelper
+
+    class FakeHelper(EnglishHelper):
+        async def request_api(self, prompt: str) -> str:
+            self.prompts.append(prompt)
+            return (
+                "Here you go:\n"
+                '[{"phrase": "apple", "sentence": "I eat an apple every day. | 我每天吃一顆蘋果。"},'
+                ' {"phrase": "river", "sentence": "河流 is long. | 河流很長。"},'
+                ' {"phrase": "unknown", "sentence": "Nothing here. | 這裡沒有東西。"}]'
+            )
+
+    helper = FakeHelper.__new__(FakeHelper)
+    helper.max_retry_attempts = 1
+    helper.retry_delay = 0
+    helper.cc = OpenCC("s2t")
+    helper.cache = None
+    helper.limiter = None
+    helper.max_in_flight = None
+    helper.prompts = []
+
+    results = asyncio.get_event_loop().run_until_complete(helper.questions(["apple", "river", "book"]))
+
+    assert len(helper.prompts) == 1
+    assert results["apple"]["sentence"].startswith("I eat an a____e every day.")
+    assert results["river"] is None  # non-ASCII English part
+    assert results["book"] is None  # missing from the response
+
+
+def test_mistral_helper_reuses_pooled_connection():
+    from aiohttp import web
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.english_helper import MistralEnglishHelper
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        return web.json_response({"choices": [{"message": {"content": "Hi there. | 你好。"}}]})
+
+    async def main():
+        server = web.Application()
+        server.router.add_post("/v1/chat/completions", chat_completions)
+        runner = web.AppRunner(server)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        helper = MistralEnglishHelper(ApiKeyManager(["plain_key"], None), model_name="test")
+        helper.API_URL = f"http://127.0.0.1:{port}/v1/chat/completions"
+
+        try:
+            for _ in range(3):
+                assert await helper.request_api("prompt") == "Hi there. | 你好。"
+        finally:
+            await helper.close()
+            await runner.cleanup()
+
+        return helper
+
+    helper = asyncio.get_event_loop().run_until_complete(main())
+
+    assert helper.connection_stats == {"created": 1, "reused": 2}
+    assert helper._session is None
+
+
+def test_word_deficits_dedupes_and_counts(app: Flask):
+    from app.generator import word_deficits
+    from app.models.lexemes import Lexemes
+    from app.models.sentences import Sentences
+
+    with app.app_context():
+        for name in ["DeficitLibA", "DeficitLibB"]:
+            lib = Libraries(name=name, description="t", public=True, author_id=1)
+            db.session.add(lib)
+            for english, chinese in [("zebra crossing", "斑馬線"), ("quokka", "短尾矮袋鼠")]:
+                word = Words(chinese=chinese, english=english)
+                word.library = lib
+                db.session.add(word)
+        lexemes = Lexemes.resolve(db.session, ["zebra crossing", "quokka"])
+        for i in range(2):
+            sentence = Sentences(chinese="斑馬線", english=f"Use the z____g {i}.", word_chinese="斑馬線", word_english="zebra crossing")
+            sentence.lexeme_id = lexemes["zebra crossing"]
+            db.session.add(sentence)
+        for i in range(3):
+            sentence = Sentences(chinese="袋鼠", english=f"A q____a {i}.", word_chinese="短尾矮袋鼠", word_english="quokka")
+            sentence.lexeme_id = lexemes["quokka"]
+            db.session.add(sentence)
+        # Another spelling of a word counts the same sentences.
+        word = Words(chinese="短尾矮袋鼠", english="Quokka")
+        word.library = lib
+        db.session.add(word)
+        db.session.commit()
+
+        result = word_deficits(db.session, max_sentences=3)
+
+    englishes = [word.english for word, _ in result]
+    deficits = {word.english: deficit for word, deficit in result}
+    assert englishes.count("zebra crossing") == 1
+    assert deficits["zebra crossing"] == 1
+    assert "quokka" not in deficits and "Quokka" not in deficits
+
+
+def test_prioritize_puts_used_libraries_first(app: Flask):
+    from datetime import datetime, timedelta
+    from app.generator.priority import prioritize, stored_order
+    from app.models import GenerationQueue, LibraryUsage
+
+    with app.app_context():
+        words = {}
+        for name, english in [("PriorityQuiet", "obscure"), ("PriorityBusy", "popular")]:
+            lib = Libraries(name=name, description="t", public=True, author_id=1)
+            lib.updated_at = datetime.now() - timedelta(days=365)
+            db.session.add(lib)
+            words[english] = Words(chinese="字", english=english)
+            words[english].library = lib
+            db.session.add(words[english])
+        db.session.commit()
+
+        busy = Libraries.query.filter_by(name="PriorityBusy").first()
+        for _ in range(3):
+            LibraryUsage.record(busy.id)
+        assert db.session.get(LibraryUsage, busy.id).hits == 3
+
+        ordered = prioritize(db.session, [(words["obscure"], 5), (words["popular"], 1)])
+
+        assert [word.english for word, _ in ordered] == ["popular", "obscure"]
+        queued = {row.word_english: row.priority for row in GenerationQueue.query.all()}
+        assert queued["popular"] > queued["obscure"] > 0
+
+        # After a restart, targeted passes follow the stored priorities; unqueued words go last.
+        unqueued = Words(chinese="字", english="unqueued")
+        restored = stored_order(db.session, [(unqueued, 5), (words["obscure"], 5), (words["popular"], 1)])
+        assert [word.english for word, _ in restored] == ["popular", "obscure", "unqueued"]
+
+
+def test_retry_after_hints_are_parsed():
+    from app.generator.backoff import BackoffPolicy, parse_retry_after
+
+    assert parse_retry_after({"Retry-After": "7"}) == 7
+    assert parse_retry_after({"x-ratelimit-reset-requests": "1m30.5s"}) == 90.5
+    assert parse_retry_after({"x-ratelimit-reset-tokens": "250ms"}) == 0.25
+    assert parse_retry_after({"Content-Type": "application/json"}) is None
+
+    policy = BackoffPolicy(base=1, cap=10)
+    assert 7 <= policy.delay(1, hint=7) <= 7.7
+    assert policy.delay(1, hint=600) == 10
+    assert all(2 <= policy.delay(3) <= 4 for _ in range(20))
+    assert all(5 <= policy.delay(10) <= 10 for _ in range(20))
+
+
+def test_retry_cools_down_the_throttled_key():
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.english_helper import EnglishHelper, RateLimitError
+
+    class ThrottledHelper(EnglishHelper):
+        async def request_api(self, prompt: str) -> str:
+            async with self.api_key_manager.lease() as key:
+                self.keys.append(key)
+                if len(self.keys) == 1:
+                    raise RateLimitError("Rate limit exceeded", retry_after=30, key=key)
+                return "I like to read a book. | 我喜歡讀書。"
+
+    manager = ApiKeyManager(["gsk_a", "gsk_b"], "gsk_")
+    helper = ThrottledHelper(manager, model_name="test", retry_delay=1, max_retry_delay=60)
+    helper.keys = []
+
+    result = asyncio.get_event_loop().run_until_complete(helper.question("book"))
+
+    assert result is not None
+    assert helper.keys[0] != helper.keys[1]  # retried right away on the other key
+    assert manager.waits[helper.keys[0]]["count"] == 1
+    assert manager.waits[helper.keys[0]]["seconds"] >= 30
+
+
+def test_generator_lock_allows_a_single_holder(app: Flask):
+    from datetime import datetime, timedelta
+    from app.generator.lock import GeneratorLock
+    from app.models import GeneratorState
+
+    with app.app_context():
+        first = GeneratorLock(db.engine, ttl=60, name="test-lock")
+        second = GeneratorLock(db.engine, ttl=60, name="test-lock")
+
+        assert first.acquire()
+        assert not second.acquire()
+        assert first.refresh()
+
+        # A lease whose heartbeat is older than the ttl can be taken over.
+        db.session.query(GeneratorState).filter_by(name="test-lock").update(
+            {"heartbeat_at": datetime.now() - timedelta(seconds=120)}
+        )
+        db.session.commit()
+
+        assert second.acquire()
+        assert not first.refresh()
+
+        second.release()
+        assert GeneratorState.query.filter_by(name="test-lock").first() is None
+
+
+def test_generate_command_runs_one_pass(app: Flask, runner, monkeypatch):
+    # The command imports from the package, so patch the package itself.
+    import app.generator as gen_mod
+
+    calls = []
+
+    async def fake_generate(**kwargs):
+        calls.append(True)
+
+    async def fake_close():
+        pass
+
+    monkeypatch.setattr(gen_mod, "generate", fake_generate)
+    monkeypatch.setattr(gen_mod.ai_helper, "close", fake_close)
+
+    result = runner.invoke(args=["generate", "--once"])
+
+    assert result.exit_code == 0, result.output
+    assert calls == [True]
+
+
+def test_sentence_writer_batches_inserts(app: Flask):
+    from app.generator.writer import SentenceWriter, get_engine, get_sessionmaker
+    from app.models.sentences import Sentences
+
+    word = Words(chinese="批次", english="BatchWord")
+    writer = SentenceWriter(get_sessionmaker(), batch_size=3, flush_interval=60, max_sentences=10)
+
+    for i in range(7):
+        writer.add(word, f"Batch sentence {i}.", "批次")
+
+    assert writer.transactions == 2 and len(writer.rows) == 1
+
+    writer.flush()
+
+    assert writer.transactions == 3
+    assert writer.written == ["BatchWord"] * 7
+    assert Sentences.query.filter_by(word_english="BatchWord").count() == 7
+    # The generator does not borrow connections from the app's pool.
+    assert get_engine() is not db.engine
+
+
+def test_response_cache_records_and_replays(tmp_path):
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.cache import ResponseCache, variant
+    from app.generator.english_helper import CacheMissError, EnglishHelper
+
+    class FakeHelper(EnglishHelper):
+        PROVIDER = "fake"
+        calls = 0
+
+        async def request_api(self, prompt: str) -> str:
+            FakeHelper.calls += 1
+            return f"I like apples. | 我喜歡蘋果。 ({FakeHelper.calls})"
+
+    def helper(mode: str) -> FakeHelper:
+        cache = ResponseCache(str(tmp_path), max_bytes=10_000_000, mode=mode)
+        return FakeHelper(ApiKeyManager(["gsk_a"], "gsk_"), model_name="m", max_retry_attempts=1, cache=cache)
+
+    async def main():
+        recorded = await helper("on").get_sentence("apple")
+        replayed = await helper("replay").get_sentence("apple")
+
+        # Another sentence for the same word is a different entry.
+        with variant("4"):
+            fresh = await helper("on").get_sentence("apple")
+
+        with pytest.raises(CacheMissError):
+            await helper("replay").get_sentence("banana")
+
+        return recorded, replayed, fresh
+
+    recorded, replayed, fresh = asyncio.run(main())
+
+    assert recorded == replayed
+    assert fresh != recorded
+    assert FakeHelper.calls == 2
+
+
+def test_passes_call_the_provider_again_when_the_cache_is_off(tmp_path):
+    import app.generator.__init__ as gen_mod
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.cache import ResponseCache, variant
+    from app.generator.english_helper import EnglishHelper
+
+    class FakeHelper(EnglishHelper):
+        PROVIDER = "fake"
+        calls = 0
+
+        async def request_api(self, prompt: str) -> str:
+            FakeHelper.calls += 1
+            return "I like apples. | 我喜歡蘋果。"
+
+    # A cached answer would be replayed to every later pass, even after the writer rejected it.
+    assert gen_mod.response_cache.mode == "off"
+
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000_000, mode="off")
+    helper = FakeHelper(ApiKeyManager(["gsk_a"], "gsk_"), model_name="m", max_retry_attempts=1, cache=cache)
+
+    async def main():
+        # Two passes over a word still missing the same number of sentences.
+        for _ in range(2):
+            with variant("3"):
+                await helper.get_sentence("apple")
+
+    asyncio.run(main())
+
+    assert FakeHelper.calls == 2
+    assert cache.stats == {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    assert not list(tmp_path.iterdir())
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    import os
+    import time
+    from app.generator.cache import ResponseCache
+
+    cache = ResponseCache(str(tmp_path), max_bytes=1000, mode="on")
+    keys = [cache.key("p", "m", f"prompt {i}") for i in range(8)]
+
+    for i, key in enumerate(keys):
+        cache.put(key, "p", "m", f"prompt {i}", "x" * 100)
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time()))
+
+    assert cache.stats["evictions"] > 0
+    assert cache._total <= 1000
+    assert cache.get(keys[-1]) is not None
+    assert cache.get(keys[0]) is None
+
+
+def test_local_provider_round_trip():
+    from app.generator.api_config import API_INFO
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.local_llm import LocalLLM
+
+    async def main():
+        llm = LocalLLM(latency=0, jitter=0, seed=1)
+        helper = API_INFO["local"]["helper_class"](
+            ApiKeyManager(["local_a", "gsk_b"], API_INFO["local"]["prefix"]), model_name="local", max_retry_attempts=2,
+        )
+        helper.API_URL = await llm.start()
+
+        try:
+            single = await helper.question("abandon")
+            batch = await helper.questions(["absorb", "cube"])
+        finally:
+            await helper.close()
+            await llm.stop()
+
+        return single, batch, llm.stats
+
+    single, batch, stats = asyncio.run(main())
+
+    assert single["appear"] == "abandon" and "a____n" in single["sentence"]
+    assert all(result is not None for result in batch.values())
+    assert stats["requests"] == 2 and stats["phrases"] == 3
+
+
+def test_helpers_bound_their_own_in_flight_requests():
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.english_helper import EnglishHelper
+
+    in_flight = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0, "total": 0}
+
+    class SlowHelper(EnglishHelper):
+        async def request_api(self, prompt: str) -> str:
+            name = self.model_name
+            in_flight[name] += 1
+            peak[name] = max(peak[name], in_flight[name])
+            peak["total"] = max(peak["total"], sum(in_flight.values()))
+            await asyncio.sleep(0.01)
+            in_flight[name] -= 1
+            return prompt
+
+    helpers = {
+        name: SlowHelper(ApiKeyManager([f"gsk_{name}"], "gsk_"), model_name=name, max_in_flight=2)
+        for name in ("a", "b")
+    }
+
+    async def main():
+        try:
+            # Each provider gets its own two slots, so together four requests run.
+            await asyncio.gather(*(helper.timed_request_api("hi") for helper in helpers.values() for _ in range(6)))
+        finally:
+            for helper in helpers.values():
+                await helper.close()
+
+    asyncio.run(main())
+
+    assert peak["a"] == 2 and peak["b"] == 2
+    assert peak["total"] == 4
+
+
+def test_router_prefers_fast_provider_and_hedges_slow_one():
+    import random
+    import time
+
+    from app.generator.api_config import API_INFO
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.local_llm import LocalLLM
+    from app.generator.router import ProviderRouter
+
+    async def main():
+        llms = {"fast": LocalLLM(latency=0.01, jitter=0, seed=1), "slow": LocalLLM(latency=0.3, jitter=0, seed=2)}
+        helpers = {}
+
+        for name, llm in llms.items():
+            helpers[name] = API_INFO["local"]["helper_class"](
+                ApiKeyManager([f"local_{name}"], API_INFO["local"]["prefix"]), model_name="local", max_retry_attempts=1,
+            )
+            helpers[name].API_URL = await llm.start()
+
+        router = ProviderRouter(helpers, hedge_delay=0.05, hedge_min_samples=100)
+
+        try:
+            random.seed(0)
+            for _ in range(15):
+                assert await router.question("abandon") is not None
+
+            weights = {name: stats.weight for name, stats in router.stats.items()}
+            requests = {name: llm.stats["requests"] for name, llm in llms.items()}
+
+            # Make the slow provider look fast, so it is picked and hedged.
+            router.hedge = True
+            router.stats["slow"].latency = 0.001
+            start = time.monotonic()
+            results = [await router.question("abandon") for _ in range(3)]
+            elapsed = time.monotonic() - start
+        finally:
+            await router.close()
+            for llm in llms.values():
+                await llm.stop()
+
+        return weights, requests, results, elapsed, router.hedges
+
+    weights, requests, results, elapsed, hedges = asyncio.run(main())
+
+    assert weights["fast"] > weights["slow"]
+    assert requests["fast"] > requests["slow"]
+    assert all(result is not None for result in results)
+    assert hedges["won"] >= 1 and hedges["won"] <= hedges["sent"]
+    assert elapsed < 0.9
+
+
+def test_enqueue_merges_into_rows_queued_concurrently(app: Flask):
+    from app.generator.priority import enqueue
+    from app.generator.writer import get_sessionmaker
+    from app.models import GenerationQueue
+
+    with app.app_context():
+        # Queued by another request between this request's reads and its insert.
+        with get_sessionmaker()() as other, other.begin():
+            other.add(GenerationQueue("wapiti", priority=5, boost=300))
+
+        enqueue(db.session, ["wapiti", "dhole"], boost=100)
+        db.session.commit()
+
+        rows = {row.word_english: (row.priority, row.boost) for row in GenerationQueue.query.filter(GenerationQueue.word_english.in_(["wapiti", "dhole"]))}
+        assert rows == {"wapiti": (100, 300), "dhole": (100, 100)}
+
+
+def test_enqueued_words_take_the_fast_path(app: Flask, monkeypatch):
+    from datetime import datetime, timedelta
+    from itertools import cycle
+    import app.generator.__init__ as gen_mod
+    from app.generator.priority import enqueue
+    from app.generator.sweep import mark_swept, sweep_candidates
+    from app.models import GenerationQueue
+    from app.models.sentences import Sentences
+
+    templates = cycle([
+        "The {} swam under the ice.", "Scientists tagged a {} last spring.", "My sister drew a {} for art class.",
+        "Have you ever seen a {} at the aquarium?", "A {} tusk can grow very long.",
+    ])
+
+    class FakeAI:
+        async def question(self, phrase: str):
+            return {"sentence": f"{next(templates).format(phrase)} | 一隻獨角鯨。", "appear": phrase}
+
+    monkeypatch.setattr(gen_mod, "ai_helper", FakeAI())
+
+    with app.app_context():
+        mark_swept(db.session, db.session.query(db.func.max(Words.id)).scalar(), datetime.now(), full=True)
+
+        lib = Libraries(name="FastPathLib", description="t", public=True, author_id=1)
+        db.session.add(lib)
+        word = Words(chinese="獨角鯨", english="narwhal")
+        word.library = lib
+        db.session.add(word)
+        enqueue(db.session, ["narwhal"])
+        # Stamped before a poll of the fast path, committed after it.
+        db.session.get(GenerationQueue, "narwhal").created_at = datetime.now() - timedelta(minutes=5)
+        db.session.commit()
+
+        assert db.session.get(GenerationQueue, "narwhal").boost > 0
+        candidates = sweep_candidates(db.session, datetime.now())
+        assert candidates is not None and "narwhal" in candidates
+        assert len(candidates) < Words.query.count() // 2
+
+    asyncio.run(gen_mod.fast_path())
+
+    with app.app_context():
+        assert Sentences.query.filter_by(word_english="narwhal").count() == 5
+        assert db.session.get(GenerationQueue, "narwhal") is None
+        assert GenerationQueue.query.filter(GenerationQueue.boost > 0).count() == 0
+
+
+def test_gemini_helper_uses_a_client_per_key(monkeypatch):
+    from google.ai import generativelanguage as glm
+    from google.api_core import exceptions
+    from google.protobuf.duration_pb2 import Duration
+    from google.rpc.error_details_pb2 import RetryInfo
+
+    import app.generator.english_helper as helper_mod
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.english_helper import GeminiEnglishHelper, RateLimitError
+
+    class FakeTransport:
+        async def close(self):
+            pass
+
+    class FakeClient:
+        created = []
+        requests = []
+
+        def __init__(self, client_options):
+            self.api_key = client_options["api_key"]
+            self.transport = FakeTransport()
+            FakeClient.created.append(self.api_key)
+
+        async def generate_content(self, request, **kwargs):
+            FakeClient.requests.append(request)
+            await asyncio.sleep(0.01)
+            if self.api_key == "AIzaSy_throttled":
+                raise exceptions.TooManyRequests("quota", details=[RetryInfo(retry_delay=Duration(seconds=7))])
+            return glm.GenerateContentResponse(candidates=[{"content": {"parts": [{"text": self.api_key}]}}])
+
+    monkeypatch.setattr(helper_mod, "GenerativeServiceAsyncClient", FakeClient)
+
+    async def main():
+        helper = GeminiEnglishHelper(
+            ApiKeyManager(["AIzaSy_a", "AIzaSy_b"], "AIzaSy", max_in_flight_per_key=2), model_name="gemini-test",
+        )
+        try:
+            answers = await asyncio.gather(*(helper.request_api("prompt") for _ in range(8)))
+
+        finally:
+            await helper.close()
+
+        throttled = GeminiEnglishHelper(ApiKeyManager(["AIzaSy_throttled"], "AIzaSy"), model_name="gemini-test")
+        try:
+            with pytest.raises(RateLimitError) as error:
+                await throttled.request_api("prompt")
+        finally:
+            await throttled.close()
+
+        return answers, error.value, throttled.key_quota
+
+    answers, error, quota = asyncio.run(main())
+
+    # Every answer came from the client of the key that was leased for it.
+    assert set(answers) == {"AIzaSy_a", "AIzaSy_b"}
+    assert sorted(FakeClient.created) == ["AIzaSy_a", "AIzaSy_b", "AIzaSy_throttled"]
+    assert all(request.model == "models/gemini-test" for request in FakeClient.requests)
+    assert FakeClient.requests[0].contents[0].parts[0].text == "prompt"
+    assert error.retry_after == 7 and error.key == "AIzaSy_throttled"
+    assert quota["AIzaSy_throttled"]["rate_limited"] == 1
+
+
+def test_writer_rejects_near_duplicates_and_caps_sentences(app: Flask, runner):
+    from app.generator.dedupe import SimilarityIndex
+    from app.generator.writer import SentenceWriter, get_sessionmaker
+    from app.models.sentences import Sentences
+
+    index = SimilarityIndex(threshold=0.7)
+    index.add(1, "The otter floated on its back in the bay.")
+    assert index.find_duplicate(1, "The otter floated on its back in the bay today.") is not None
+    assert index.find_duplicate(1, "An otter cracked a clam with a small stone.") is None
+    assert index.find_duplicate(2, "The otter floated on its back in the bay.") is None
+
+    word = Words(chinese="水獺", english="otter")
+    writer = SentenceWriter(get_sessionmaker(), batch_size=100, flush_interval=60, max_sentences=3)
+    for english in [
+        "The otter floated on its back in the bay.",
+        "The otter floated on its back in the bay!",
+        "An otter cracked a clam with a small stone.",
+        "Two otters held paws while they slept.",
+        "We watched an otter dive for sea urchins.",
+    ]:
+        writer.add(word, english, "水獺")
+    writer.flush()
+
+    assert Sentences.query.filter_by(word_english="otter").count() == 3
+    assert writer.duplicates == 1 and writer.capped == 1
+
+    # Another spelling of the word has the same lexeme, so the same cap.
+    writer.add(Words(chinese="水獺", english="Otter"), "Sea otters wrap themselves in kelp.", "水獺")
+    writer.flush()
+    assert writer.capped == 2
+
+    # Rows written around the writer are pruned by the compaction command.
+    db.session.add(Sentences(chinese="水獺", english="An otter cracked a clam with a small stone!", word_chinese="水獺", word_english="otter"))
+    db.session.add(Sentences(chinese="水獺", english="Otters live in rivers and along coasts.", word_chinese="水獺", word_english="otter"))
+    db.session.commit()
+
+    result = runner.invoke(args=["compact-sentences", "--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert Sentences.query.filter_by(word_english="otter").count() == 5
+
+    result = runner.invoke(args=["compact-sentences"])
+    assert result.exit_code == 0, result.output
+    assert [s.english for s in Sentences.query.filter_by(word_english="otter").order_by(Sentences.id)] == [
+        "The otter floated on its back in the bay.",
+        "An otter cracked a clam with a small stone.",
+        "Two otters held paws while they slept.",
+        "Otters live in rivers and along coasts.",
+    ]
+
+
+def test_question_set_keeps_the_best_candidates():
+    from app.generator.api_key_manager import ApiKeyManager
+    from app.generator.english_helper import EnglishHelper
+
+    class CannedHelper(EnglishHelper):
+        requests = 0
+
+        async def request_api(self, prompt: str) -> str:
+            CannedHelper.requests += 1
+            assert "Make *4* different short sentences" in prompt
+            return "\n".join([
+                "Here are four sentences:",
+                "1. The crew had to abandon the ship. | 船員們不得不棄船。",
+                "2. They abandoned the old car. | 他們拋棄了那輛舊車。",
+                "3. Ｔhe dog was left alone. | 狗被留下了。",
+                "- Do not abandon your dreams. | 不要放棄你的夢想。",
+            ])
+
+    helper = CannedHelper(ApiKeyManager(["key"], None), model_name="test", candidates=4)
+
+    questions = asyncio.run(helper.question_set("abandon", 2))
+
+    # Exact matches beat the inflected form; the non-ASCII line and the chatter are dropped.
+    assert [question["sentence"].split("|")[0] for question in questions] == [
+        "The crew had to a____n the ship.",
+        "Do not a____n your dreams.",
+    ]
+    assert CannedHelper.requests == 1
+
+
+def test_adaptive_limiter_grows_and_cuts_once_per_window():
+    from app.generator.limiter import AdaptiveLimiter
+
+    async def main():
+        limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=4)
+        first, second = await limiter.acquire(), await limiter.acquire()
+
+        third = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not third.done()
+
+        # Both in-flight calls are rate limited; only the first one cuts the limit.
+        limiter.overload(first)
+        limiter.overload(second)
+        assert int(limiter.limit) == 1 and limiter.stats["cuts"] == 1
+
+        limiter.release()
+        limiter.release()
+        ticket = await third
+
+        for _ in range(20):
+            limiter.success()
+        limiter.release()
+
+        # A call started after the cut may cut again.
+        limiter.overload(ticket)
+        return limiter
+
+    limiter = asyncio.run(main())
+
+    assert limiter.stats == {"successes": 20, "overloads": 3, "cuts": 2}
+    assert [entry["reason"] for entry in limiter.history][:2] == ["initial", "rate_limited"]
+    assert "increase" in [entry["reason"] for entry in limiter.history]
+    assert limiter.in_flight == 0 and 1 <= limiter.limit <= 4
+
+
+def test_interrupted_pass_resumes_and_skips_deterministic_failures(app: Flask, monkeypatch):
+    from datetime import datetime
+    from itertools import cycle
+    import app.generator.__init__ as gen_mod
+    from app.config import DATETIME_FORMAT
+    from app.generator.checkpoint import PassCheckpoint, blocked_words
+    from app.generator.writer import get_sessionmaker
+    from app.models.sentences import Sentences
+
+    templates = cycle([
+        "The {} hid behind the tall trees.", "We saw an {} at the zoo yesterday.", "Her favorite animal is the {}.",
+        "Is a {} bigger than a cat?", "A photo of a {} won the prize.",
+    ])
+    asked = []
+
+    class FakeAI:
+        async def question(self, phrase: str):
+            asked.append(phrase)
+            return {"sentence": f"{next(templates).format(phrase)} | 一種動物。", "appear": phrase}
+
+    monkeypatch.setattr(gen_mod, "ai_helper", FakeAI())
+
+    with app.app_context():
+        lib = Libraries(name="CheckpointLib", description="t", public=True, author_id=1)
+        db.session.add(lib)
+        for chinese, english in [("㺢㹢狓", "okapi"), ("六角恐龍", "axolotl"), ("短尾矮袋鼠", "quokka")]:
+            word = Words(chinese=chinese, english=english)
+            word.library = lib
+            db.session.add(word)
+        db.session.commit()
+
+        session_factory = get_sessionmaker()
+
+    # A pass that stopped after finishing one word and failing another for a deterministic reason.
+    interrupted = PassCheckpoint(session_factory, meta={
+        "last_word_id": 0, "started_at": datetime.now().strftime(DATETIME_FORMAT), "full": False,
+    })
+    interrupted.start(["okapi", "axolotl", "quokka"])
+    interrupted.done("okapi")
+    interrupted.failed("axolotl", "low_similarity")
+
+    with session_factory() as session, session.begin():
+        interrupted.write(session)
+
+    resumed = PassCheckpoint.load(session_factory)
+    assert resumed.pass_id == interrupted.pass_id
+    assert resumed.remaining() == ["quokka"]
+
+    asyncio.run(gen_mod.sweep())
+
+    assert set(asked) == {"quokka"}
+    assert PassCheckpoint.load(session_factory) is None
+
+    with session_factory() as session:
+        assert blocked_words(session, datetime.now()) == {"axolotl"}
+        assert session.query(Sentences).filter_by(word_english="quokka").count() == 5
+
+    # The next pass retries the finished-but-short word, not the blocked one.
+    asked.clear()
+    asyncio.run(gen_mod.sweep(full=True))
+
+    assert "okapi" in asked
+    assert "axolotl" not in asked
+
+
+def test_failed_words_are_settled_without_aborting_the_pass(app: Flask, monkeypatch):
+    from itertools import count
+    import app.generator.__init__ as gen_mod
+    from app.generator.checkpoint import PassCheckpoint
+    from app.generator.metrics import metrics
+    from app.generator.writer import get_sessionmaker
+    from app.models.generation_checkpoint import GenerationCheckpoint
+
+    calls = count()
+    asked: dict[str, int] = {}
+
+    class FakeAI:
+        async def question(self, phrase: str):
+            asked[phrase] = asked.get(phrase, 0) + 1
+
+            # "lynx" always fails, "ibex" only gets its first sentence.
+            if phrase == "lynx" or (phrase == "ibex" and asked[phrase] > 1):
+                return None
+
+            return {"sentence": f"Sentence {next(calls)} about the {phrase} tells story {next(calls)}. | 一種動物。", "appear": phrase}
+
+    monkeypatch.setattr(gen_mod, "ai_helper", FakeAI())
+
+    with app.app_context():
+        lib = Libraries(name="FailureLib", description="t", public=True, author_id=1)
+        db.session.add(lib)
+        for chinese, english in [("猞猁", "lynx"), ("羱羊", "ibex"), ("袋熊", "wombat")]:
+            word = Words(chinese=chinese, english=english)
+            word.library = lib
+            db.session.add(word)
+        db.session.commit()
+
+        session_factory = get_sessionmaker()
+
+    checkpoint = PassCheckpoint(session_factory)
+    asyncio.run(gen_mod.generate(words=["lynx", "ibex", "wombat"], checkpoint=checkpoint))
+
+    with session_factory() as session:
+        marks = session.query(GenerationCheckpoint.word_english, GenerationCheckpoint.status).filter_by(pass_id=checkpoint.pass_id)
+        assert dict(marks.all()) == {"lynx": "failed", "ibex": "done", "wombat": "done"}
+
+    assert metrics.last_pass["failures"] == 1
+    assert metrics.last_pass["failed_requests"] == 5 + 4
+    assert metrics.last_pass["sentences"] == 5 + 1
+
+
+def test_failed_flush_leaves_its_words_unfinished(app: Flask):
+    from datetime import datetime
+    from sqlalchemy import event
+    from sqlalchemy.exc import OperationalError
+    from app.generator.checkpoint import PassCheckpoint
+    from app.generator.writer import SentenceWriter, get_engine, get_sessionmaker
+    from app.models.generation_checkpoint import GenerationCheckpoint
+
+    session_factory = get_sessionmaker()
+    checkpoint = PassCheckpoint(session_factory, meta={"started_at": datetime.now().isoformat()})
+    checkpoint.start(["gecko", "tapir"])
+    writer = SentenceWriter(session_factory, batch_size=100, flush_interval=60, checkpoint=checkpoint)
+
+    def fail_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO sentences"):
+            raise OperationalError(statement, parameters, Exception("disk I/O error"))
+
+    writer.add(Words(chinese="壁虎", english="gecko"), "A gecko can walk up a wall.", "壁虎可以爬上牆。")
+    writer.done(Words(chinese="壁虎", english="gecko"))
+    writer.failed(Words(chinese="貘", english="tapir"), "api_error")
+
+    event.listen(get_engine(), "before_cursor_execute", fail_inserts)
+    try:
+        writer.flush()
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", fail_inserts)
+
+    assert writer.write_failures == 1
+    assert checkpoint.remaining() == ["gecko", "tapir"]
+
+    # The next flush settles the failed word, but the lost sentence never marks its word done.
+    writer.flush()
+
+    with session_factory() as session:
+        marks = dict(session.query(GenerationCheckpoint.word_english, GenerationCheckpoint.status).filter_by(pass_id=checkpoint.pass_id).all())
+
+    assert marks == {"tapir": "failed"}
+    assert checkpoint.remaining() == ["gecko"]
+    checkpoint.finish()
+
+
+def test_library_words_share_sentences_through_their_lexeme(app: Flask):
+    from app.generator.writer import SentenceWriter, get_sessionmaker
+    from app.models import Lexemes, Sentences
+
+    with app.app_context():
+        lexemes = Lexemes.resolve(db.session, ["Pangolin", "pangolin ", "tapir"])
+        db.session.commit()
+
+        assert lexemes["Pangolin"] == lexemes["pangolin "] != lexemes["tapir"]
+        assert Lexemes.resolve(db.session, ["PANGOLIN"]) == {"PANGOLIN": lexemes["Pangolin"]}
+
+        word = Words(chinese="穿山甲", english="Pangolin")
+        writer = SentenceWriter(get_sessionmaker(), batch_size=10, flush_interval=60)
+        writer.add(word, "A p______n eats ants.", "穿山甲吃螞蟻。")
+        writer.flush()
+
+        sentence = Sentences.query.filter_by(word_english="Pangolin").one()
+        assert sentence.lexeme_id == lexemes["pangolin "]
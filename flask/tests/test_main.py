@@ -36,3 +36,29 @@ def test_social_redirects(client: testing.FlaskClient):
     for path in ["/github", "/discord", "/twitter", "/facebook", "/instagram"]:
         resp = client.get(path, follow_redirects=False)
         assert resp.status_code in (302, 303)
+
+
+def test_sentence_test_records_usage_once_per_interval(logged_in_client: testing.FlaskClient):
+    from app.models import db, Libraries, LibraryUsage
+
+    lib = Libraries(name="ReloadedTest", description="t", public=True, author_id=1)
+    db.session.add(lib)
+    db.session.commit()
+    library_id = lib.id
+
+    assert logged_in_client.put(f"/api/change_user_library/{lib.name}").status_code == 200
+
+    for _ in range(3):
+        assert logged_in_client.get("/sentence_test", follow_redirects=True).status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(LibraryUsage, library_id).hits == 2
+
+    # Once the interval has passed, the next view counts again.
+    with logged_in_client.session_transaction() as session:
+        session["library_usage"] = {str(library_id): 0}
+
+    assert logged_in_client.get("/sentence_test", follow_redirects=True).status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(LibraryUsage, library_id).hits == 3
@@ -0,0 +1,204 @@
+import importlib.util
+import os
+from typing import Callable
+
+import pytest
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+
+from app.models import db
+
+
+VERSIONS = os.path.join(os.path.dirname(__file__), "..", "migrations", "versions")
+
+
+def load_migration(name: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(VERSIONS, f"{name}.py"))
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def run(engine: Engine, step: Callable[[], None]) -> None:
+    """Run a migration's `upgrade()` or `downgrade()` on `engine`, without the Flask app."""
+
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    with engine.begin() as connection, Operations.context(MigrationContext.configure(connection)):
+        step()
+
+
+def test_index_migration_upgrades_an_existing_database(tmp_path):
+    migration = load_migration("4b1e0c7d9a21_hot_lookup_indexes")
+
+    indexes = [
+        ("sentences", "ix_sentences_word_english"), ("words", "ix_words_library_id"), ("libraries", "ix_libraries_name"),
+        ("libraries", "ix_libraries_author_id_public"), ("libraries", "ix_libraries_public"), ("users", "ix_users_email"),
+    ]
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+
+    # A database from before the indexes: `create_all()` never adds indexes to existing tables.
+    with engine.begin() as connection:
+        db.metadata.create_all(connection)
+        for _, index in indexes:
+            connection.execute(text(f"DROP INDEX {index}"))
+        connection.execute(text(
+            "INSERT INTO libraries (name, public, created_at, updated_at) VALUES "
+            "('Twice', 1, '2024-01-01', '2024-01-01'), ('Twice', 0, '2024-01-01', '2024-01-01')"
+        ))
+
+    with pytest.raises(RuntimeError, match="libraries.name"):
+        run(engine, migration.upgrade)
+
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE libraries SET name = 'Twice (private)' WHERE public = 0"))
+
+    run(engine, migration.upgrade)
+    run(engine, migration.upgrade)  # Already there: nothing to do
+
+    inspector = inspect(engine)
+    for table, index in indexes:
+        assert index in {item["name"] for item in inspector.get_indexes(table)}
+
+    assert {item["name"]: item["unique"] for item in inspector.get_indexes("users")}["ix_users_email"]
+    engine.dispose()
+
+
+def test_lexeme_migration_backfills_words_and_sentences(tmp_path):
+    migration = load_migration("9c3d5e2f1b47_lexemes")
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+
+    with engine.begin() as connection:
+        db.metadata.create_all(connection)
+
+    # Back to a database from before the lexemes, with the same word in two spellings.
+    run(engine, migration.downgrade)
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO words (chinese, english, created_at, updated_at) VALUES "
+            "('蘋果', 'apple', '2024-01-01', '2024-01-01'), ('蘋果', 'Apple ', '2024-01-01', '2024-01-01'), "
+            "('香蕉', 'banana', '2024-01-01', '2024-01-01')"
+        ))
+        connection.execute(text(
+            "INSERT INTO sentences (chinese, english, word_chinese, word_english, created_at, updated_at) VALUES "
+            "('我吃了一個蘋果。', 'I ate an a___e.', '蘋果', 'apple', '2024-01-01', '2024-01-01'), "
+            "('芒果很甜。', 'The m___o is sweet.', '芒果', 'mango', '2024-01-01', '2024-01-01')"
+        ))
+
+    run(engine, migration.upgrade)
+    run(engine, migration.upgrade)  # Already there: nothing to do
+
+    with engine.connect() as connection:
+        lexemes = dict(connection.execute(text("SELECT english, id FROM lexemes")).tuples().all())
+        words = dict(connection.execute(text("SELECT english, lexeme_id FROM words")).tuples().all())
+        sentences = dict(connection.execute(text("SELECT word_english, lexeme_id FROM sentences")).tuples().all())
+
+    assert sorted(lexemes) == ["apple", "banana", "mango"]
+    assert words == {"apple": lexemes["apple"], "Apple ": lexemes["apple"], "banana": lexemes["banana"]}
+    assert sentences == {"apple": lexemes["apple"], "mango": lexemes["mango"]}
+    assert not inspect(engine).has_table("lexeme_backfill")
+    engine.dispose()
+
+
+def test_library_counter_migration_fills_the_counters(tmp_path):
+    migration = load_migration("e7a4c1d2b935_library_counters")
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+
+    with engine.begin() as connection:
+        db.metadata.create_all(connection)
+
+    run(engine, migration.downgrade)
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO libraries (id, name, public, created_at, updated_at) VALUES "
+            "(1, 'Full', 1, '2024-01-01', '2024-01-01'), (2, 'Empty', 1, '2024-01-01', '2024-01-01')"
+        ))
+        connection.execute(text(
+            "INSERT INTO words (chinese, english, library_id, created_at, updated_at) VALUES "
+            "('蘋果', 'apple', 1, '2024-01-01', '2024-01-01'), ('香蕉', 'banana', 1, '2024-01-01', '2024-01-01')"
+        ))
+        # SQLite does not enforce the foreign keys here, so the users can be left out.
+        connection.execute(text("INSERT INTO favorites (user_id, library_id) VALUES (1, 1), (2, 1)"))
+
+    run(engine, migration.upgrade)
+    run(engine, migration.upgrade)  # Already there: the counters are only refreshed
+
+    with engine.connect() as connection:
+        counts = connection.execute(text("SELECT name, word_count, favorite_count FROM libraries ORDER BY id")).tuples().all()
+
+    assert counts == [("Full", 2, 2), ("Empty", 0, 0)]
+    engine.dispose()
+
+
+def test_login_events_migration_moves_the_pickled_histories(tmp_path):
+    import pickle
+
+    migration = load_migration("b2f86d0e4c13_login_events")
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+
+    with engine.begin() as connection:
+        db.metadata.create_all(connection)
+
+    run(engine, migration.downgrade)
+
+    history = [{"ip": "10.0.0.1", "time": "2024-01-01 08:00:00"}, {"ip": "10.0.0.2", "time": "2024-01-02 09:30:00"}, {"time": "bad"}]
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO users (id, username, email, is_admin, unlimited_access, created_at, updated_at, locale, "
+                "logins, email_verified) VALUES (1, 'a', 'a@example.com', 0, 0, '2024-01-01', '2024-01-01', 'en', :logins, 0)"
+            ),
+            {"logins": pickle.dumps(history)},
+        )
+
+    run(engine, migration.upgrade)
+    run(engine, migration.upgrade)  # Already there: nothing to do
+
+    with engine.connect() as connection:
+        events = connection.execute(text("SELECT user_id, ip, time FROM login_events ORDER BY time")).tuples().all()
+
+    assert [(user_id, ip) for user_id, ip, _ in events] == [(1, "10.0.0.1"), (1, "10.0.0.2")]
+    assert events[1][2].startswith("2024-01-02 09:30:00")
+    assert "logins" not in {column["name"] for column in inspect(engine).get_columns("users")}
+    engine.dispose()
+
+
+def test_generator_table_migrations_match_the_models(tmp_path):
+    migrations = [
+        load_migration(name)
+        for name in ["1d7e3b9c2a60_generation_queue", "5f2a8c4e7b13_generator_state", "8e6b1f0d3c95_generation_checkpoints"]
+    ]
+    tables = ["generation_queue", "library_usage", "generator_state", "generation_checkpoints"]
+
+    def schema(engine: Engine) -> dict:
+        inspector = inspect(engine)
+        return {
+            table: (
+                sorted((column["name"], str(column["type"]), column["nullable"]) for column in inspector.get_columns(table)),
+                sorted((index["name"], tuple(index["column_names"])) for index in inspector.get_indexes(table)),
+                sorted(tuple(constraint["column_names"]) for constraint in inspector.get_unique_constraints(table)),
+            )
+            for table in tables
+        }
+
+    expected = create_engine(f"sqlite:///{tmp_path / 'new.sqlite3'}")
+    db.metadata.create_all(expected)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+    db.metadata.create_all(engine)
+    for migration in reversed(migrations):
+        run(engine, migration.downgrade)
+    assert not any(inspect(engine).has_table(table) for table in tables)
+
+    for migration in migrations:
+        run(engine, migration.upgrade)
+        run(engine, migration.upgrade)  # Already there: nothing to do
+
+    assert schema(engine) == schema(expected)
+    engine.dispose()
+    expected.dispose()
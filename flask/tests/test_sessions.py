@@ -0,0 +1,86 @@
+import time
+
+from flask import Flask, session
+from flask.sessions import NullSession
+
+from app.utils.session_store import SqliteSessionInterface
+
+
+def make_app(tmp_path, sweep_batch_size: int = 100) -> tuple[Flask, SqliteSessionInterface]:
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = interface = SqliteSessionInterface(
+        app, str(tmp_path / "sessions.sqlite3"), sweep_interval=60, sweep_batch_size=sweep_batch_size,
+    )
+
+    @app.route("/read")
+    def read():
+        return str(session.get("n", 0))
+
+    @app.route("/write")
+    def write():
+        session["n"] = session.get("n", 0) + 1
+        return str(session["n"])
+
+    return app, interface
+
+
+def stored(interface: SqliteSessionInterface) -> list[tuple[str, float]]:
+    return interface._connection().execute("SELECT id, expiry FROM sessions").fetchall()
+
+
+def test_only_sessions_with_data_are_stored(tmp_path):
+    app, interface = make_app(tmp_path)
+
+    anonymous = app.test_client()
+    response = anonymous.get("/read")
+    assert "Set-Cookie" not in response.headers
+    assert stored(interface) == []
+
+    client = app.test_client()
+    assert client.get("/write").text == "1"
+    assert client.get("/write").text == "2"
+    assert client.get("/read").text == "2"
+    assert len(stored(interface)) == 1
+
+    with app.test_request_context("/static/style.css") as context:
+        assert isinstance(interface.open_session(app, context.request), NullSession)
+
+
+def test_unchanged_sessions_are_refreshed_at_half_their_lifetime(tmp_path):
+    app, interface = make_app(tmp_path)
+    client = app.test_client()
+    client.get("/write")
+    [(store_id, expiry)] = stored(interface)
+
+    client.get("/read")
+    assert stored(interface) == [(store_id, expiry)]
+
+    half_spent = time.time() + app.permanent_session_lifetime.total_seconds() / 2 - 1
+    interface._connection().execute("UPDATE sessions SET expiry = ?", (half_spent,))
+    client.get("/read")
+    assert stored(interface)[0][1] > half_spent
+
+
+def test_expired_sessions_are_swept_in_batches(tmp_path):
+    app, interface = make_app(tmp_path, sweep_batch_size=2)
+    connection = interface._connection()
+    connection.executemany(
+        "INSERT INTO sessions (id, data, expiry) VALUES (?, ?, ?)",
+        [(f"session:{i}", b"", time.time() - 1 if i < 5 else time.time() + 60) for i in range(6)],
+    )
+
+    client = app.test_client()
+    client.get("/read")
+    assert len(stored(interface)) == 4
+
+    # A full batch came back, so the next request sweeps again instead of waiting for the interval.
+    client.get("/read")
+    client.get("/read")
+    assert len(stored(interface)) == 1
+    client.get("/read")
+    assert len(stored(interface)) == 1
+
+    connection.execute("INSERT INTO sessions (id, data, expiry) VALUES ('session:old', x'', 0)")
+    interface._delete_expired_sessions()
+    assert [store_id for store_id, _ in stored(interface)] == ["session:5"]